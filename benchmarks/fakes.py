@@ -0,0 +1,479 @@
+"""
+Local stand-ins for the external services (benchmarks only, never imported by the app).
+
+    - FakeChatModel   : Gemini chat model (text, streaming, with_structured_output)
+    - FakeEmbeddings  : Gemini embeddings (deterministic vectors)
+    - FakeYouTube     : YouTube Data API v3 client (playlists, playlistItems, videos, search)
+    - FakeBlobServiceClient : Azure Blob Storage (in memory; Azurite can be used instead)
+
+Every fake sleeps according to a latency distribution:
+
+    fixed:0.5              always 0.5 s
+    uniform:0.2,0.8        uniform between 0.2 and 0.8 s
+    lognormal:0.6,0.5      median 0.6 s, sigma 0.5 (long tail, closest to real LLM calls)
+    0                      no latency
+
+Responses are deterministic (derived from the prompt), so two runs with the same seed
+do exactly the same work. `install_fakes()` plugs them in at the boundaries the app
+already has: LLM gateway, `get_youtube_service` and the Azure SDK client.
+"""
+import asyncio
+import hashlib
+import json
+import math
+import random
+import re
+import threading
+import time
+import types
+import typing
+from enum import Enum
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional
+
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.runnables import RunnableLambda
+from pydantic import BaseModel
+
+from src.cleeroute.metrics import track
+
+# Clé de compte Azurite publique (documentée par Microsoft), utilisable hors ligne pour signer les SAS
+AZURITE_CONNECTION_STRING = (
+    "DefaultEndpointsProtocol=http;AccountName=devstoreaccount1;"
+    "AccountKey=Eby8vdM02xNOcqFlqUwJPLlmEtlCDXJ1OUzFT50uSRZ6IFsuFq2UVErCz4I6tq/K1SZFPTOtr/KBHBeksoGMGw==;"
+    "BlobEndpoint=http://127.0.0.1:10000/devstoreaccount1;"
+)
+
+_rng = random.Random(42)
+_rng_lock = threading.Lock()
+
+
+def seed(value: int):
+    with _rng_lock:
+        _rng.seed(value)
+
+
+class Latency:
+    """Distribution de latence (secondes) parsée depuis une spec texte (voir le docstring du module)."""
+
+    def __init__(self, spec: str = "0"):
+        self.spec = spec
+        kind, _, raw = spec.partition(":")
+        values = [float(v) for v in raw.split(",") if v.strip()]
+        if kind in ("0", "none", ""):
+            self.kind, self.params = "fixed", (0.0,)
+        elif kind == "fixed" and len(values) == 1:
+            self.kind, self.params = kind, tuple(values)
+        elif kind in ("uniform", "lognormal") and len(values) == 2:
+            self.kind, self.params = kind, tuple(values)
+        else:
+            raise ValueError(f"Invalid latency spec '{spec}' (fixed:S | uniform:MIN,MAX | lognormal:MEDIAN,SIGMA)")
+
+    def sample(self) -> float:
+        if self.kind == "fixed":
+            return self.params[0]
+        with _rng_lock:
+            if self.kind == "uniform":
+                return _rng.uniform(*self.params)
+            median, sigma = self.params
+            return _rng.lognormvariate(math.log(median), sigma) if median > 0 else 0.0
+
+    async def asleep(self):
+        delay = self.sample()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def sleep(self):
+        delay = self.sample()
+        if delay > 0:
+            time.sleep(delay)
+
+    def __repr__(self):
+        return self.spec
+
+
+# Latences courantes, modifiables par `configure()` (lues à chaque appel)
+LATENCIES: Dict[str, Latency] = {
+    "llm": Latency("lognormal:0.8,0.4"),
+    "llm_token": Latency("fixed:0.01"),
+    "embedding": Latency("uniform:0.05,0.15"),
+    "youtube": Latency("uniform:0.1,0.3"),
+    "blob": Latency("uniform:0.02,0.08"),
+}
+# Longueur des réponses texte (mots) et nombre d'éléments des listes des sorties structurées
+RESPONSE_WORDS = 80
+LIST_ITEMS = 3
+EMBEDDING_DIM = 768
+VIDEOS_PER_PLAYLIST = 12
+
+
+def configure(latencies: Optional[Dict[str, str]] = None, response_words: Optional[int] = None,
+              list_items: Optional[int] = None, videos_per_playlist: Optional[int] = None, random_seed: Optional[int] = None):
+    global RESPONSE_WORDS, LIST_ITEMS, VIDEOS_PER_PLAYLIST
+    for name, spec in (latencies or {}).items():
+        if spec is not None:
+            LATENCIES[name] = Latency(spec)
+    if response_words is not None:
+        RESPONSE_WORDS = response_words
+    if list_items is not None:
+        LIST_ITEMS = list_items
+    if videos_per_playlist is not None:
+        VIDEOS_PER_PLAYLIST = videos_per_playlist
+    if random_seed is not None:
+        seed(random_seed)
+
+
+# --- Texte déterministe ---
+_WORDS = ("learning course module video concept practice example review lesson skill topic "
+          "exercise summary question answer context detail step method idea project").split()
+
+
+def _digest(text: str) -> int:
+    return int.from_bytes(hashlib.sha256(text.encode("utf-8", "ignore")).digest()[:8], "big")
+
+
+def lorem(key: str, words: int) -> str:
+    rnd = random.Random(_digest(key))
+    return " ".join(rnd.choice(_WORDS) for _ in range(words)).capitalize() + "."
+
+
+def _prompt_text(value: Any) -> str:
+    if isinstance(value, str):
+        return value
+    if hasattr(value, "to_string"):
+        return value.to_string()
+    if isinstance(value, BaseMessage):
+        return value.content if isinstance(value.content, str) else json.dumps(value.content, default=str)
+    if isinstance(value, (list, tuple)):
+        return "\n".join(_prompt_text(v) for v in value)
+    if isinstance(value, dict):
+        return json.dumps(value, default=str)
+    return str(value)
+
+
+def respond_text(prompt: str) -> str:
+    """Réponse texte selon le contrat attendu par l'appelant (balises, JSON...)."""
+    # Conversation de cadrage du syllabus : une question, puis fin de conversation au tour suivant
+    if "[CONVERSATION_FINISHED]" in prompt:
+        if re.search(r"Human: \S", prompt):
+            return "[CONVERSATION_FINISHED] Let's build your course!"
+        return "What is your current level, and how many hours per week can you dedicate to this?"
+    # Curation des playlists : JSON {"selected_ids": [...]} parmi les candidats du prompt
+    if "selected_ids" in prompt:
+        candidates = re.findall(r'"id": "([^"]+)"', prompt)
+        return json.dumps({"selected_ids": candidates[:LIST_ITEMS]})
+    return lorem(prompt, RESPONSE_WORDS)
+
+
+# --- Sorties structurées ---
+
+def _fill(annotation, name: str, key: str, index: int, prompt: str) -> Any:
+    origin = typing.get_origin(annotation)
+    args = typing.get_args(annotation)
+    if origin is typing.Union or origin is types.UnionType:
+        non_null = [a for a in args if a is not type(None)]
+        return _fill(non_null[0], name, key, index, prompt) if non_null else None
+    if origin is typing.Literal:
+        return args[0]
+    if origin in (list, List, tuple, set):
+        item_type = args[0] if args else str
+        return [_fill(item_type, name, key, i, prompt) for i in range(LIST_ITEMS)]
+    if origin in (dict, Dict):
+        return {}
+    if isinstance(annotation, type):
+        if issubclass(annotation, BaseModel):
+            return fill_model(annotation, f"{key}.{index}", prompt)
+        if issubclass(annotation, Enum):
+            return next(iter(annotation))
+        if issubclass(annotation, bool):
+            return False
+        if issubclass(annotation, int):
+            return 0
+        if issubclass(annotation, float):
+            return 0.5
+    if name.lower().endswith("id"):
+        return f"{name}_{_video_id(f'{key}.{name}.{index}')[:8]}"
+    return lorem(f"{key}.{name}.{index}", 8)
+
+
+def _section_ranges(prompt: str, count: int) -> List[tuple]:
+    # Les prompts de blueprint listent les vidéos sous la forme "[i] titre"
+    indices = [int(i) for i in re.findall(r"^\s*\[(\d+)\]", prompt, re.MULTILINE)]
+    start, end = (min(indices), max(indices)) if indices else (0, 0)
+    size = max(1, math.ceil((end - start + 1) / count))
+    ranges = []
+    for s in range(start, end + 1, size):
+        ranges.append((s, min(s + size - 1, end)))
+    return ranges or [(start, end)]
+
+
+def fill_model(schema: type, key: str, prompt: str) -> BaseModel:
+    values = {}
+    for index, (name, field) in enumerate(schema.model_fields.items()):
+        values[name] = _fill(field.annotation, name, key, index, prompt)
+    # Plans de sections (start_index / end_index) : plages valides couvrant la liste de vidéos du prompt
+    for name, field in schema.model_fields.items():
+        item_type = (typing.get_args(field.annotation) or [None])[0]
+        if isinstance(item_type, type) and issubclass(item_type, BaseModel) and {"start_index", "end_index"} <= set(item_type.model_fields):
+            values[name] = [
+                fill_model(item_type, f"{key}.{name}.{i}", prompt).model_copy(update={"start_index": s, "end_index": e})
+                for i, (s, e) in enumerate(_section_ranges(prompt, LIST_ITEMS))
+            ]
+    return schema.model_validate(values)
+
+
+# --- Modèles LLM ---
+
+def _usage(prompt: str, completion: str) -> Dict[str, int]:
+    input_tokens, output_tokens = max(1, len(prompt) // 4), max(1, len(completion) // 4)
+    return {"input_tokens": input_tokens, "output_tokens": output_tokens, "total_tokens": input_tokens + output_tokens}
+
+
+class FakeChatModel(BaseChatModel):
+    """
+    Remplace GatewayChatModel : passe par la même file de la passerelle (gateway.slot) et
+    les mêmes métriques (llm_call), mais dort au lieu d'appeler Gemini.
+    """
+    model: str = "fake-gemini"
+    google_api_key: Optional[str] = None
+    gateway_priority: int = 1  # PRIORITY_STANDARD
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-gemini"
+
+    def _generate(self, messages: List[BaseMessage], stop=None, run_manager=None, **kwargs) -> ChatResult:
+        prompt = _prompt_text(messages)
+        LATENCIES["llm"].sleep()
+        text = respond_text(prompt)
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=text, usage_metadata=_usage(prompt, text)))])
+
+    async def _agenerate(self, messages: List[BaseMessage], stop=None, run_manager=None, **kwargs) -> ChatResult:
+        from src.cleeroute.langGraph.learners_api.llm_gateway import gateway
+
+        prompt = _prompt_text(messages)
+        text = respond_text(prompt)
+        usage = _usage(prompt, text)
+        async with gateway.slot(self.google_api_key, self.gateway_priority, usage["input_tokens"], self.model) as slot:
+            with track("llm_call", self.model):
+                await LATENCIES["llm"].asleep()
+            slot.actual_tokens = usage["total_tokens"]
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=text, usage_metadata=usage))])
+
+    def _stream(self, messages: List[BaseMessage], stop=None, run_manager=None, **kwargs) -> Iterator[ChatGenerationChunk]:
+        result = self._generate(messages, stop=stop, **kwargs)
+        for word in result.generations[0].message.content.split(" "):
+            LATENCIES["llm_token"].sleep()
+            yield ChatGenerationChunk(message=AIMessageChunk(content=word + " "))
+
+    async def _astream(self, messages: List[BaseMessage], stop=None, run_manager=None, **kwargs) -> AsyncIterator[ChatGenerationChunk]:
+        from src.cleeroute.langGraph.learners_api.llm_gateway import gateway
+
+        prompt = _prompt_text(messages)
+        text = respond_text(prompt)
+        usage = _usage(prompt, text)
+        async with gateway.slot(self.google_api_key, self.gateway_priority, usage["input_tokens"], self.model) as slot:
+            with track("llm_call", self.model):
+                # Latence jusqu'au premier token, puis un délai par mot
+                await LATENCIES["llm"].asleep()
+                for word in text.split(" "):
+                    yield ChatGenerationChunk(message=AIMessageChunk(content=word + " "))
+                    await LATENCIES["llm_token"].asleep()
+            slot.actual_tokens = usage["total_tokens"]
+
+    def with_structured_output(self, schema, **kwargs):
+        from src.cleeroute.langGraph.learners_api.llm_gateway import gateway
+
+        def build(value):
+            return fill_model(schema, schema.__name__, _prompt_text(value))
+
+        async def abuild(value):
+            prompt = _prompt_text(value)
+            async with gateway.slot(self.google_api_key, self.gateway_priority, len(prompt) // 4, self.model):
+                with track("llm_call", self.model):
+                    await LATENCIES["llm"].asleep()
+            return fill_model(schema, schema.__name__, prompt)
+
+        return RunnableLambda(build, afunc=abuild)
+
+
+class FakeEmbeddings(Embeddings):
+    """Vecteurs unitaires déterministes (même texte -> même vecteur), un délai par lot."""
+
+    def __init__(self, model: str = "fake-embedding", dim: Optional[int] = None):
+        self.model = model
+        self.dim = dim or EMBEDDING_DIM
+
+    def _vector(self, text: str) -> List[float]:
+        rnd = random.Random(_digest(text))
+        raw = [rnd.gauss(0, 1) for _ in range(self.dim)]
+        norm = math.sqrt(sum(v * v for v in raw)) or 1.0
+        return [v / norm for v in raw]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        with track("embedding_batch", self.model):
+            LATENCIES["embedding"].sleep()
+            return [self._vector(t) for t in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        with track("embedding_batch", self.model):
+            await LATENCIES["embedding"].asleep()
+            return [self._vector(t) for t in texts]
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return (await self.aembed_documents([text]))[0]
+
+
+# --- YouTube Data API ---
+
+class _Request:
+    def __init__(self, payload):
+        self._payload = payload
+
+    def execute(self):
+        # Les appels réels sont synchrones (exécutés dans des threads par le code appelant)
+        LATENCIES["youtube"].sleep()
+        return self._payload
+
+
+def _video_id(seed_text: str) -> str:
+    return hashlib.md5(seed_text.encode()).hexdigest()[:11]
+
+
+def _snippet(title: str, key: str) -> Dict:
+    return {
+        "title": title,
+        "description": lorem(key, 20),
+        "channelTitle": "Fake Academy",
+        "videoOwnerChannelTitle": "Fake Academy",
+        "thumbnails": {"medium": {"url": f"https://i.ytimg.com/vi/{_video_id(key)}/mqdefault.jpg"}},
+    }
+
+
+class _Collection:
+    def __init__(self, handler):
+        self._handler = handler
+
+    def list(self, **kwargs):
+        return _Request(self._handler(**kwargs))
+
+
+class FakeYouTube:
+    """Sous-ensemble du client googleapiclient utilisé par course_gen/services.py et graph_gen.py."""
+
+    def playlists(self):
+        return _Collection(lambda id, **_: {"items": [{"id": id, "snippet": _snippet(f"Playlist {id}", id)}]})
+
+    def playlistItems(self):
+        def handler(playlistId, maxResults=50, pageToken=None, **_):
+            items = []
+            for i in range(min(VIDEOS_PER_PLAYLIST, maxResults)):
+                key = f"{playlistId}:{i}"
+                snippet = _snippet(f"Lesson {i + 1}: {lorem(key, 4)}", key)
+                snippet["resourceId"] = {"kind": "youtube#video", "videoId": _video_id(key)}
+                items.append({"snippet": snippet})
+            return {"items": items}
+        return _Collection(handler)
+
+    def videos(self):
+        return _Collection(lambda id, **_: {"items": [{"id": id, "snippet": _snippet(f"Video {id}", id)}]})
+
+    def search(self):
+        def handler(q, type="video", maxResults=5, **_):
+            items = []
+            for i in range(maxResults):
+                key = f"{q}:{type}:{i}"
+                item_id = {"playlistId": f"PLfake{_video_id(key)}"} if type == "playlist" else {"videoId": _video_id(key)}
+                items.append({"id": item_id, "snippet": _snippet(f"{q} #{i + 1}", key)})
+            return {"items": items}
+        return _Collection(handler)
+
+
+def get_fake_youtube_service():
+    return FakeYouTube()
+
+
+# --- Azure Blob Storage (en mémoire) ---
+BLOBS: Dict[str, bytes] = {}
+
+
+class _FakeBlobClient:
+    def __init__(self, container: str, name: str):
+        self.key = f"{container}/{name}"
+
+    async def upload_blob(self, data, overwrite: bool = False, **kwargs):
+        await LATENCIES["blob"].asleep()
+        BLOBS[self.key] = bytes(data)
+
+
+class _FakeContainerClient:
+    def __init__(self, name: str):
+        self.name = name
+
+    async def exists(self) -> bool:
+        await LATENCIES["blob"].asleep()
+        return True
+
+    async def create_container(self):
+        await LATENCIES["blob"].asleep()
+
+    def get_blob_client(self, name: str) -> _FakeBlobClient:
+        return _FakeBlobClient(self.name, name)
+
+
+class FakeBlobServiceClient:
+    """Remplace azure.storage.blob.aio.BlobServiceClient (mêmes appels que AzureStorageService)."""
+
+    @classmethod
+    def from_connection_string(cls, connection_string: str, **kwargs) -> "FakeBlobServiceClient":
+        return cls()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    def get_container_client(self, name: str) -> _FakeContainerClient:
+        return _FakeContainerClient(name)
+
+
+# --- Installation ---
+
+def install_fakes(use_azurite: bool = False):
+    """
+    Branche les fakes aux frontières de l'application (à appeler avant le premier usage des clients).
+    use_azurite : garde le vrai SDK Azure (AZURE_STORAGE_CONNECTION_STRING doit pointer vers Azurite).
+    """
+    # Imports locaux : l'appelant configure l'environnement avant de charger l'application
+    from src.cleeroute.langGraph.learners_api import llm_gateway
+    from src.cleeroute.langGraph.learners_api.course_gen import graph_gen, services
+    from src.cleeroute.langGraph.learners_api.chats.services import azure_storage_service
+
+    chat_models: Dict[tuple, FakeChatModel] = {}
+    embeddings: Dict[str, FakeEmbeddings] = {}
+
+    def get_chat_model(model, api_key, temperature=None, priority="standard", cache=None):
+        priority = llm_gateway.resolve_priority(priority)
+        key = (model, api_key, priority)
+        if key not in chat_models:
+            chat_models[key] = FakeChatModel(model=model or "fake-gemini", google_api_key=api_key, gateway_priority=priority)
+        return chat_models[key]
+
+    def get_embeddings(model, api_key, task_type="retrieval_document"):
+        if model not in embeddings:
+            embeddings[model] = FakeEmbeddings(model or "fake-embedding")
+        return embeddings[model]
+
+    llm_gateway.gateway.get_chat_model = get_chat_model
+    llm_gateway.gateway.get_embeddings = get_embeddings
+    # graph_gen importe get_youtube_service par son nom : les deux modules sont patchés
+    services.get_youtube_service = get_fake_youtube_service
+    graph_gen.get_youtube_service = get_fake_youtube_service
+    if not use_azurite:
+        azure_storage_service.BlobServiceClient = FakeBlobServiceClient
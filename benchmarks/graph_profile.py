@@ -0,0 +1,189 @@
+"""
+Reproducible node-level profile of the conversation, syllabus and quiz graphs.
+
+The nodes are called directly, in graph order, each one receiving the state the graph
+would give it:
+
+    conversation.intelligent_conversation   course_gen/graph_conv.py
+    syllabus.fast_data_collection           course_gen/graph_gen.py   (YouTube search + playlists)
+    syllabus.fast_syllabus_generation       course_gen/graph_gen.py   (one blueprint per playlist)
+    quiz.generate_questions                 quiz/graph.py
+    quiz.process_interaction_node           quiz/graph.py             (answer evaluation)
+
+LLM and YouTube traffic goes through benchmarks/replay.py: record it once with live keys,
+then replay it offline with the original latencies (or scaled ones). For each node the
+report splits wall time into time spent waiting on the LLM, on YouTube, and the rest
+(our own code: parsing, merging, serialization). No database is needed (no user id,
+no thread id: premium check and prefetch are skipped).
+
+Usage:
+    GEMINI_API_KEY=... YOUTUBE_API_KEY=... MODEL=gemini-2.5-flash python -m benchmarks.graph_profile --mode record
+    python -m benchmarks.graph_profile --runs 10
+    python -m benchmarks.graph_profile --latency-scale 0          # our code only
+    python -m benchmarks.graph_profile --latency-scale 0.5 --cprofile syllabus.fast_syllabus_generation
+"""
+import argparse
+import asyncio
+import cProfile
+import os
+import pstats
+import statistics
+import sys
+import time
+from typing import Dict, List
+
+# Les graphes importent le checkpointer, qui lit DATABASE_URL à l'import (aucune connexion n'est ouverte ici)
+os.environ.setdefault("DATABASE_URL", "postgresql://localhost/graph_profile_unused")
+
+from benchmarks import replay
+
+DEFAULT_CASSETTE = "benchmarks/fixtures/graph_profile.json"
+
+USER_TEXT = "I want to learn Python for data analysis"
+CONVERSATION = [("Beginner, I know a bit of Excel. About 5 hours per week.", "What is your current level and how much time do you have?")]
+QUIZ_CONTEXT = (
+    "Section: Pandas fundamentals. DataFrames are two-dimensional labeled data structures. "
+    "Use read_csv to load data, groupby to aggregate, merge to join tables and "
+    "pivot_table to reshape. Missing values are handled with isna, fillna and dropna."
+)
+
+NODES = [
+    "conversation.intelligent_conversation",
+    "syllabus.fast_data_collection",
+    "syllabus.fast_syllabus_generation",
+    "quiz.generate_questions",
+    "quiz.process_interaction_node",
+]
+
+
+class NodeTiming:
+    def __init__(self):
+        self.wall: List[float] = []
+        self.llm: List[float] = []
+        self.youtube: List[float] = []
+        self.calls: List[int] = []
+
+    def add(self, wall: float, breakdown: replay.Breakdown):
+        self.wall.append(wall)
+        self.llm.append(breakdown.seconds["llm"])
+        self.youtube.append(breakdown.seconds["youtube"])
+        self.calls.append(breakdown.calls["llm"] + breakdown.calls["youtube"])
+
+
+async def profiled(name: str, timings: Dict[str, NodeTiming], cprofile_node: str, coro_factory):
+    async def run():
+        breakdown = replay.measure()
+        profiler = cProfile.Profile() if name == cprofile_node else None
+        start = time.perf_counter()
+        if profiler:
+            profiler.enable()
+        try:
+            return await coro_factory()
+        finally:
+            if profiler:
+                profiler.disable()
+            timings.setdefault(name, NodeTiming()).add(time.perf_counter() - start, breakdown)
+            if profiler:
+                print(f"\n--- cProfile: {name} (top 25, cumulative) ---")
+                pstats.Stats(profiler).sort_stats("cumulative").print_stats(25)
+
+    # Tâche dédiée : la comptabilité (contextvar) reste propre à ce noeud
+    return await asyncio.create_task(run())
+
+
+async def run_pipeline(timings: Dict[str, NodeTiming], cprofile_node: str, links: List[str]):
+    from src.cleeroute.langGraph.learners_api.course_gen.graph_conv import intelligent_conversation
+    from src.cleeroute.langGraph.learners_api.course_gen.graph_gen import fast_data_collection, fast_syllabus_generation
+    from src.cleeroute.langGraph.learners_api.course_gen.models import Course_meta_datas
+    from src.cleeroute.langGraph.learners_api.course_gen.state import PydanticSerializer
+    from src.cleeroute.langGraph.learners_api.quiz.graph import generate_questions_node, process_interaction_node
+    from src.cleeroute.langGraph.learners_api.quiz.models import QuizQuestionInternal, UserProfile
+
+    metadata = Course_meta_datas(
+        title="Python for Data Analysis", domains=["Data"], categories=["Programming"], topics=["pandas", "numpy"],
+        objectives=["Clean and analyze datasets"], expectations=["Hands-on notebooks"], prerequisites=["Basic math"],
+        desired_level="Beginner",
+    )
+    conversation_state = {
+        "user_input_text": USER_TEXT,
+        "metadata_str": PydanticSerializer.dumps(metadata),
+        "language": "English",
+        "conversation_history": CONVERSATION,
+    }
+    await profiled("conversation.intelligent_conversation", timings, cprofile_node,
+                   lambda: intelligent_conversation(conversation_state))
+
+    config = {"configurable": {}}
+    syllabus_state = {**conversation_state, "user_input_links": links, "user_id": None}
+    collected = await profiled("syllabus.fast_data_collection", timings, cprofile_node,
+                               lambda: fast_data_collection(syllabus_state, config))
+    syllabus_state = {**syllabus_state, **collected}
+    await profiled("syllabus.fast_syllabus_generation", timings, cprofile_node,
+                   lambda: fast_syllabus_generation(syllabus_state, config))
+
+    quiz_state = {
+        "attemptId": "attempt_graph_profile",
+        "context": {"db_context": QUIZ_CONTEXT, "content_for_quiz": "Quiz me on pandas basics", "scope": "section"},
+        "preferences": {"difficulty": "Intermediate", "questionCount": 5},
+        "user_answers": {},
+        "user_profile": UserProfile(user_id="graph-profile").model_dump_json(),
+        "chat_history": PydanticSerializer.dumps([]),
+    }
+    generated = await profiled("quiz.generate_questions", timings, cprofile_node,
+                               lambda: generate_questions_node(quiz_state))
+    quiz_state = {**quiz_state, **generated}
+    questions = PydanticSerializer.loads(quiz_state["questions"], List[QuizQuestionInternal])
+    if not questions:
+        print("--- [PROFILE] No quiz question generated: process_interaction_node skipped ---")
+        return
+    quiz_state["current_interaction"] = {"type": "answer", "payload": {"questionId": questions[0].questionId, "answerIndex": 0}}
+    await profiled("quiz.process_interaction_node", timings, cprofile_node,
+                   lambda: process_interaction_node(quiz_state))
+
+
+def print_report(timings: Dict[str, NodeTiming], cassette: replay.Cassette):
+    print(f"\nMode: {cassette.mode}, latency scale {cassette.latency_scale}, "
+          f"replay misses {cassette.misses} (prompts that changed since the recording)")
+    print(f"{'node':<40} {'runs':>4} {'mean ms':>9} {'p50 ms':>9} {'max ms':>9} {'llm ms':>9} {'youtube ms':>10} {'own ms':>9} {'calls':>6}")
+    for name in NODES:
+        t = timings.get(name)
+        if not t:
+            continue
+        wall = statistics.mean(t.wall)
+        llm, youtube = statistics.mean(t.llm), statistics.mean(t.youtube)
+        # Appels externes parallèles : leur somme peut dépasser le temps mur
+        own = max(0.0, wall - llm - youtube)
+        print(f"{name:<40} {len(t.wall):>4} {wall * 1000:>9.1f} {statistics.median(t.wall) * 1000:>9.1f} "
+              f"{max(t.wall) * 1000:>9.1f} {llm * 1000:>9.1f} {youtube * 1000:>10.1f} {own * 1000:>9.1f} "
+              f"{statistics.mean(t.calls):>6.1f}")
+    print("(llm / youtube = summed call durations; calls made in parallel can exceed the node's wall time)")
+
+
+async def main(args) -> int:
+    cassette = replay.Cassette(args.cassette, mode=args.mode, latency_scale=args.latency_scale)
+    replay.install(cassette)
+
+    runs = 1 if args.mode == "record" else args.runs
+    timings: Dict[str, NodeTiming] = {}
+    try:
+        for run in range(runs):
+            await run_pipeline(timings, args.cprofile if run == runs - 1 else "", args.links)
+    except Exception as e:
+        print(f"--- [PROFILE] Run aborted: {type(e).__name__}: {e} ---")
+        return 1
+    finally:
+        cassette.save()
+
+    print_report(timings, cassette)
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mode", choices=["record", "replay"], default="replay")
+    parser.add_argument("--cassette", default=DEFAULT_CASSETTE)
+    parser.add_argument("--runs", type=int, default=5, help="Replay runs (record always runs once)")
+    parser.add_argument("--latency-scale", type=float, default=1.0, help="Multiplier for recorded latencies (0 = none)")
+    parser.add_argument("--links", nargs="*", default=[], help="YouTube playlist / video URLs given by the learner")
+    parser.add_argument("--cprofile", default="", choices=[""] + NODES, help="cProfile this node on the last run")
+    sys.exit(asyncio.run(main(parser.parse_args())))
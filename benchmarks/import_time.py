@@ -0,0 +1,95 @@
+"""
+Cold-start import budget for the API and the Celery worker.
+
+Imports a module in a fresh interpreter with `python -X importtime`, parses the report
+and fails (exit code 1) when:
+    - the cumulative import time exceeds the budget, or
+    - a lazy resource (src/cleeroute/lazy_init.py) was built during the import
+      (LLM clients, Azure services and graphs must wait for first use / lifespan warm-up).
+
+Usage:
+    python -m benchmarks.import_time
+    python -m benchmarks.import_time --module src.cleeroute.tasks --budget-ms 2500 --top 15
+"""
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+from typing import List, Tuple
+
+# "import time:       self [us] |  cumulative | imported package"
+_LINE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S.*)$")
+
+DEFAULT_BUDGET_MS = float(os.getenv("IMPORT_TIME_BUDGET_MS", 4000))
+
+# Exécuté dans le sous-process après l'import : ressources paresseuses déjà construites ?
+_READY_CHECK = """
+import json, importlib
+importlib.import_module({module!r})
+from src.cleeroute import lazy_init
+print(json.dumps([n for n, r in lazy_init.stats()["resources"].items() if r["ready"]]))
+"""
+
+
+def run_importtime(module: str) -> List[Tuple[int, int, int, str]]:
+    """[(self_us, cumulative_us, depth, package)] dans l'ordre du rapport."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True,
+    )
+    if proc.returncode != 0:
+        raise SystemExit(f"Importing {module} failed:\n{proc.stderr[-3000:]}")
+    rows = []
+    for line in proc.stderr.splitlines():
+        match = _LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, package = match.groups()
+            rows.append((int(self_us), int(cumulative_us), len(indent) // 2, package.strip()))
+    return rows
+
+
+def eagerly_built_resources(module: str) -> List[str]:
+    proc = subprocess.run(
+        [sys.executable, "-c", _READY_CHECK.format(module=module)],
+        capture_output=True, text=True,
+    )
+    if proc.returncode != 0:
+        raise SystemExit(f"Lazy resource check failed:\n{proc.stderr[-3000:]}")
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def main(module: str, budget_ms: float, top: int) -> int:
+    rows = run_importtime(module)
+    # Les modules de premier niveau (profondeur 0) couvrent tout l'import
+    total_ms = sum(cumulative for _, cumulative, depth, _ in rows if depth == 0) / 1000
+
+    print(f"Slowest imports under {module} (cumulative):")
+    print(f"{'cumulative (ms)':>16} {'self (ms)':>10}  package")
+    for self_us, cumulative_us, _, package in sorted(rows, key=lambda r: r[1], reverse=True)[:top]:
+        print(f"{cumulative_us / 1000:>16.1f} {self_us / 1000:>10.1f}  {package}")
+
+    eager = eagerly_built_resources(module)
+    print(f"\nTotal import time: {total_ms:.0f} ms (budget {budget_ms:.0f} ms)")
+    print(f"Lazy resources built at import: {eager or 'none'}")
+
+    failed = False
+    if total_ms > budget_ms:
+        print("FAIL: import time over budget.")
+        failed = True
+    if eager:
+        print("FAIL: resources must not be built at import time.")
+        failed = True
+    if not failed:
+        print("OK")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", default="src.cleeroute.main", help="Module to import (src.cleeroute.tasks for the worker)")
+    parser.add_argument("--budget-ms", type=float, default=DEFAULT_BUDGET_MS)
+    parser.add_argument("--top", type=int, default=20)
+    args = parser.parse_args()
+    sys.exit(main(args.module, args.budget_ms, args.top))
@@ -0,0 +1,131 @@
+"""
+Project content generation latency: sequential chain vs dependency DAG.
+
+Drives the real graph from streaming_project_content/test_streaming.py with a fake
+LLM whose calls take a fixed, per-stage delay (no network), and compares it with the
+previous topology where the four stages ran one after the other.
+
+    sequential : title -> objectives -> steps -> evaluation
+    dag        : title -> objectives -> (steps || evaluation)
+
+Usage:
+    python -m benchmarks.project_content_latency
+    python -m benchmarks.project_content_latency --delays title=0.8,objectives=1.0,steps=2.0,evaluation=1.5 --runs 5
+"""
+import argparse
+import asyncio
+import time
+from typing import Dict
+
+from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.runnables import RunnableLambda
+
+from src.cleeroute.langGraph.streaming_project_content.test_streaming import (
+    get_streaming_project_graph,
+    stream_partial_projects,
+)
+from src.cleeroute.langGraph.streaming_project_content.test_streaming_models import (
+    RequiredGenProjInput, Project, TitleDesc, ObjectivesPrereqs, Steps, Evaluation,
+)
+from src.cleeroute.langGraph.streaming_project_content.test_streaming_prompt import (
+    PROMPT_GENERATE_TITLE_DESC, PROMPT_GENERATE_OBJECTIVES, PROMPT_GENERATE_STEPS, PROMPT_GENERATE_EVALUATION,
+)
+
+# Réponses factices par schéma de sortie -> (étape, valeurs)
+FIXTURES = {
+    TitleDesc: ("title", {"title": "The Phonetic Quest", "description": "A journey through sounds."}),
+    ObjectivesPrereqs: ("objectives", {"objectives": ["Master IPA vowels"], "prerequisites": ["A microphone"]}),
+    Steps: ("steps", {"steps": ["**Step 1.** Record yourself.", "**Step 2.** Compare with IPA."]}),
+    Evaluation: ("evaluation", {"deliverable": ["A recording"], "evaluation_criteria": ["Vowel accuracy"]}),
+}
+
+SAMPLE_INPUT = RequiredGenProjInput(
+    course_title="Advanced English Fluency",
+    section_title="Fundamentals of English Phonetics",
+    section_description="Understand the core principles of English phonetics.",
+    subsection_titles_concatenated="IPA + Vowel Sounds + Consonant Sounds",
+)
+
+
+class FixedDelayLLM:
+    """Remplace le chat model : chaque appel structuré dort `delays[étape]` secondes."""
+
+    def __init__(self, delays: Dict[str, float]):
+        self.delays = delays
+        self.calls = 0
+
+    def with_structured_output(self, schema):
+        stage, values = FIXTURES[schema]
+
+        async def respond(_prompt_value):
+            self.calls += 1
+            await asyncio.sleep(self.delays[stage])
+            return schema(**values)
+
+        return RunnableLambda(lambda _: schema(**values), afunc=respond)
+
+
+async def run_sequential(llm: FixedDelayLLM) -> Project:
+    """Ancienne topologie : les quatre appels l'un après l'autre."""
+    project = {}
+    for template, schema in (
+        (PROMPT_GENERATE_TITLE_DESC, TitleDesc),
+        (PROMPT_GENERATE_OBJECTIVES, ObjectivesPrereqs),
+        (PROMPT_GENERATE_STEPS, Steps),
+        (PROMPT_GENERATE_EVALUATION, Evaluation),
+    ):
+        chain = ChatPromptTemplate.from_template(template) | llm.with_structured_output(schema)
+        response = await chain.ainvoke({**SAMPLE_INPUT.model_dump(), **project})
+        project.update(response.model_dump())
+    return Project.model_validate(project)
+
+
+async def run_dag(llm: FixedDelayLLM) -> Project:
+    graph = get_streaming_project_graph(llm_instance=llm)
+    project = {}
+    async for _node, partial_project in stream_partial_projects(graph, SAMPLE_INPUT):
+        project = partial_project
+    return Project.model_validate(project)
+
+
+async def timed(fn, delays: Dict[str, float], runs: int) -> dict:
+    best, project, calls = float("inf"), None, 0
+    for _ in range(runs):
+        llm = FixedDelayLLM(delays)
+        start = time.perf_counter()
+        project = await fn(llm)
+        best = min(best, time.perf_counter() - start)
+        calls = llm.calls
+    return {"seconds": best, "calls": calls, "project": project}
+
+
+def parse_delays(raw: str) -> Dict[str, float]:
+    delays = {"title": 1.0, "objectives": 1.0, "steps": 1.0, "evaluation": 1.0}
+    for item in filter(None, raw.split(",")):
+        stage, value = item.split("=")
+        delays[stage.strip()] = float(value)
+    return delays
+
+
+async def main(delays: Dict[str, float], runs: int):
+    sequential = await timed(run_sequential, delays, runs)
+    dag = await timed(run_dag, delays, runs)
+
+    expected_seq = sum(delays.values())
+    expected_dag = delays["title"] + delays["objectives"] + max(delays["steps"], delays["evaluation"])
+    print(f"{'topology':<11} {'calls':>6} {'best (s)':>9} {'critical path (s)':>18}")
+    print(f"{'sequential':<11} {sequential['calls']:>6} {sequential['seconds']:>9.2f} {expected_seq:>18.2f}")
+    print(f"{'dag':<11} {dag['calls']:>6} {dag['seconds']:>9.2f} {expected_dag:>18.2f}")
+    print(f"\nLatency saved: {1 - dag['seconds'] / sequential['seconds']:.0%}")
+    if dag["project"] == sequential["project"]:
+        print("Output OK: both topologies assemble the same Project.")
+    else:
+        print("Output MISMATCH between topologies.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--delays", default="", help="Per-stage delays in seconds, e.g. steps=2.0,evaluation=1.5")
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+    asyncio.run(main(parse_delays(args.delays), args.runs))
@@ -0,0 +1,254 @@
+"""
+Record / replay of LLM and YouTube traffic (benchmarks only, never imported by the app).
+
+    record : real Gemini / YouTube calls go through, each response and its latency is
+             written to a cassette (JSON) when `Cassette.save()` is called.
+    replay : no network; responses come from the cassette and the recorded latency is
+             slept again, multiplied by `latency_scale` (1.0 = original, 0 = none).
+
+The layer sits at the boundaries the app already has:
+    - LLM gateway (`gateway.get_chat_model`) -> ReplayChatModel, a GatewayChatModel whose
+      _agenerate / _astream are recorded (structured outputs are parsed downstream, as live);
+    - `get_youtube_service` -> ReplayYouTube proxy around the googleapiclient resource.
+
+Requests are matched on (model, messages) for the LLM and (collection, arguments) for
+YouTube. A prompt that changed since the recording (ids, timestamps...) falls back to the
+next unused recording of the same model / collection, in recording order; `misses` counts
+these fallbacks.
+
+Per-response caches (llm_cache) are bypassed: a cached answer would hide the call being measured.
+"""
+import asyncio
+import hashlib
+import json
+import threading
+import time
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from langchain_core.messages import BaseMessage, message_to_dict, messages_from_dict
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+from src.cleeroute.langGraph.learners_api.llm_gateway import GatewayChatModel, gateway, resolve_priority
+from src.cleeroute.metrics import track
+
+
+class Breakdown:
+    """Temps passé dans les appels externes pendant un bloc mesuré (voir `measure`)."""
+
+    def __init__(self):
+        self.seconds: Dict[str, float] = {"llm": 0.0, "youtube": 0.0}
+        self.calls: Dict[str, int] = {"llm": 0, "youtube": 0}
+        self._lock = threading.Lock()
+
+    def add(self, kind: str, seconds: float):
+        with self._lock:
+            self.seconds[kind] += seconds
+            self.calls[kind] += 1
+
+
+# Les appels YouTube passent par asyncio.to_thread : le contexte (et donc ce Breakdown) est copié
+_current_breakdown: ContextVar[Optional[Breakdown]] = ContextVar("replay_breakdown", default=None)
+
+
+def measure() -> Breakdown:
+    """Démarre la comptabilité des appels externes pour la tâche courante (et ses sous-tâches)."""
+    breakdown = Breakdown()
+    _current_breakdown.set(breakdown)
+    return breakdown
+
+
+def _account(kind: str, seconds: float):
+    breakdown = _current_breakdown.get()
+    if breakdown is not None:
+        breakdown.add(kind, seconds)
+
+
+def _digest(payload: Any) -> str:
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()[:24]
+
+
+def llm_request_key(model: str, messages: List[BaseMessage], kwargs: Dict) -> str:
+    # Les outils liés (sorties structurées) ont des repr non déterministes : seuls les noms d'arguments comptent
+    return _digest([model, [(m.type, m.content) for m in messages], sorted(kwargs)])
+
+
+class Cassette:
+    def __init__(self, path: str, mode: str = "replay", latency_scale: float = 1.0):
+        if mode not in ("record", "replay"):
+            raise ValueError(f"Unknown mode '{mode}' (record | replay)")
+        self.path = Path(path)
+        self.mode = mode
+        self.latency_scale = latency_scale
+        self.data: Dict[str, Dict[str, List[Dict]]] = {"llm": {}, "youtube": {}}
+        self.misses = 0
+        self._cursors: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        if mode == "replay":
+            if not self.path.exists():
+                raise FileNotFoundError(f"No cassette at {self.path}: run once with mode=record first")
+            self.data = json.loads(self.path.read_text())
+
+    def put(self, kind: str, key: str, group: str, entry: Dict):
+        with self._lock:
+            self.data[kind].setdefault(key, []).append({"group": group, **entry})
+
+    def take(self, kind: str, key: str, group: str) -> Dict:
+        with self._lock:
+            entries = self.data[kind].get(key)
+            cursor_key = f"{kind}:{key}"
+            if not entries:
+                # Prompt différent de l'enregistrement : prochaine réponse du même modèle / de la même collection
+                self.misses += 1
+                entries = [e for recorded in self.data[kind].values() for e in recorded if e["group"] == group]
+                cursor_key = f"{kind}:group:{group}"
+                if not entries:
+                    raise KeyError(f"No recorded {kind} response for '{group}' in {self.path}")
+            index = self._cursors.get(cursor_key, 0)
+            self._cursors[cursor_key] = index + 1
+            return entries[index % len(entries)]
+
+    def delay(self, seconds: float) -> float:
+        return max(0.0, seconds * self.latency_scale)
+
+    def save(self):
+        if self.mode != "record":
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.path.write_text(json.dumps(self.data, indent=1))
+        counts = {kind: sum(len(v) for v in entries.values()) for kind, entries in self.data.items()}
+        print(f"--- [REPLAY] Cassette saved to {self.path}: {counts} ---")
+
+    def stats(self) -> Dict:
+        return {"mode": self.mode, "latency_scale": self.latency_scale, "misses": self.misses,
+                "recorded": {kind: sum(len(v) for v in entries.values()) for kind, entries in self.data.items()}}
+
+
+# --- LLM ---
+
+class ReplayChatModel(GatewayChatModel):
+    """GatewayChatModel enregistré / rejoué (même file de la passerelle, mêmes métriques llm_call)."""
+    cassette: Any = None
+
+    async def _agenerate(self, messages: List[BaseMessage], stop=None, run_manager=None, **kwargs) -> ChatResult:
+        key = llm_request_key(self.model, messages, kwargs)
+        start = time.perf_counter()
+        if self.cassette.mode == "record":
+            result = await super()._agenerate(messages, stop=stop, run_manager=run_manager, **kwargs)
+            elapsed = time.perf_counter() - start
+            self.cassette.put("llm", key, self.model, {
+                "latency": elapsed, "message": message_to_dict(result.generations[0].message),
+            })
+            _account("llm", elapsed)
+            return result
+
+        entry = self.cassette.take("llm", key, self.model)
+        async with gateway.slot(self._raw_api_key(), self.gateway_priority, 0, self.model):
+            with track("llm_call", self.model):
+                await asyncio.sleep(self.cassette.delay(entry["latency"]))
+        _account("llm", time.perf_counter() - start)
+        message = messages_from_dict([entry["message"]])[0]
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    async def _astream(self, messages: List[BaseMessage], stop=None, run_manager=None, **kwargs) -> AsyncIterator[ChatGenerationChunk]:
+        key = llm_request_key(self.model, messages, kwargs)
+        start = time.perf_counter()
+        if self.cassette.mode == "record":
+            chunks = []
+            async for chunk in super()._astream(messages, stop=stop, run_manager=run_manager, **kwargs):
+                chunks.append({"offset": time.perf_counter() - start, "message": message_to_dict(chunk.message)})
+                yield chunk
+            elapsed = time.perf_counter() - start
+            self.cassette.put("llm", key, self.model, {"latency": elapsed, "chunks": chunks})
+            _account("llm", elapsed)
+            return
+
+        entry = self.cassette.take("llm", key, self.model)
+        async with gateway.slot(self._raw_api_key(), self.gateway_priority, 0, self.model):
+            with track("llm_call", self.model):
+                previous = 0.0
+                # Même rythme que l'enregistrement : délai avant chaque chunk (mis à l'échelle)
+                for recorded in entry.get("chunks") or [{"offset": entry["latency"], "message": entry["message"]}]:
+                    await asyncio.sleep(self.cassette.delay(recorded["offset"] - previous))
+                    previous = recorded["offset"]
+                    yield ChatGenerationChunk(message=messages_from_dict([recorded["message"]])[0])
+        _account("llm", time.perf_counter() - start)
+
+
+# --- YouTube ---
+
+class _ReplayRequest:
+    def __init__(self, youtube: "ReplayYouTube", collection: str, kwargs: Dict):
+        self.youtube = youtube
+        self.collection = collection
+        self.kwargs = kwargs
+
+    def execute(self):
+        cassette = self.youtube.cassette
+        key = _digest([self.collection, self.kwargs])
+        start = time.perf_counter()
+        if cassette.mode == "record":
+            response = getattr(self.youtube.service, self.collection)().list(**self.kwargs).execute()
+            elapsed = time.perf_counter() - start
+            cassette.put("youtube", key, self.collection, {"latency": elapsed, "response": response})
+            _account("youtube", elapsed)
+            return response
+
+        entry = cassette.take("youtube", key, self.collection)
+        # Appel synchrone, comme le client réel (exécuté dans un thread par les appelants)
+        time.sleep(cassette.delay(entry["latency"]))
+        _account("youtube", time.perf_counter() - start)
+        return entry["response"]
+
+
+class _ReplayCollection:
+    def __init__(self, youtube: "ReplayYouTube", collection: str):
+        self.youtube = youtube
+        self.collection = collection
+
+    def list(self, **kwargs) -> _ReplayRequest:
+        return _ReplayRequest(self.youtube, self.collection, kwargs)
+
+
+class ReplayYouTube:
+    """Proxy du client googleapiclient : youtube.search().list(...).execute(), etc."""
+
+    def __init__(self, cassette: Cassette, service=None):
+        self.cassette = cassette
+        self.service = service
+
+    def __getattr__(self, collection: str):
+        if collection.startswith("_"):
+            raise AttributeError(collection)
+        return lambda: _ReplayCollection(self, collection)
+
+
+# --- Installation ---
+
+def install(cassette: Cassette):
+    """Branche l'enregistrement / le rejeu sur la passerelle LLM et get_youtube_service."""
+    from src.cleeroute.langGraph.learners_api.course_gen import graph_gen, services
+
+    chat_models: Dict[tuple, ReplayChatModel] = {}
+
+    def get_chat_model(model, api_key, temperature=None, priority="standard", cache=None):
+        priority = resolve_priority(priority)
+        key = (model, api_key, temperature, priority)
+        if key not in chat_models:
+            params = {"model": model, "google_api_key": api_key or "replay", "gateway_priority": priority, "cassette": cassette}
+            if temperature is not None:
+                params["temperature"] = temperature
+            chat_models[key] = ReplayChatModel(**params)
+        return chat_models[key]
+
+    gateway.get_chat_model = get_chat_model
+
+    real_get_youtube_service = services.get_youtube_service
+
+    def get_youtube_service():
+        return ReplayYouTube(cassette, real_get_youtube_service() if cassette.mode == "record" else None)
+
+    # graph_gen importe get_youtube_service par son nom : les deux modules sont patchés
+    services.get_youtube_service = get_youtube_service
+    graph_gen.get_youtube_service = get_youtube_service
@@ -0,0 +1,138 @@
+-- Schéma minimal de la BDD applicative pour les benchmarks (Postgres + pgvector local).
+-- En production ces tables sont gérées hors de ce dépôt : seules les colonnes lues / écrites
+-- par l'API sont reprises ici. Les tables créées par le code lui-même (course_section_digests,
+-- chat_answer_cache, transcript_window_summaries) ne sont pas listées.
+--
+--     docker run -d -p 5432:5432 -e POSTGRES_PASSWORD=postgres pgvector/pgvector:pg16
+--
+-- Idempotent : appliqué par `python -m benchmarks.load_test` avant chaque run.
+
+CREATE EXTENSION IF NOT EXISTS vector;
+
+CREATE TABLE IF NOT EXISTS course (
+    id TEXT PRIMARY KEY,
+    title TEXT NOT NULL,
+    description TEXT
+);
+
+CREATE TABLE IF NOT EXISTS section (
+    id TEXT PRIMARY KEY,
+    course_id TEXT NOT NULL REFERENCES course (id) ON DELETE CASCADE,
+    title TEXT NOT NULL,
+    description TEXT,
+    position INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_section_course ON section (course_id, position);
+
+CREATE TABLE IF NOT EXISTS subsection (
+    id TEXT PRIMARY KEY,
+    section_id TEXT NOT NULL REFERENCES section (id) ON DELETE CASCADE,
+    title TEXT NOT NULL,
+    content TEXT,
+    content_type TEXT,
+    position INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_subsection_section ON subsection (section_id, position);
+
+CREATE TABLE IF NOT EXISTS subsection_transcripts (
+    subsection_id TEXT PRIMARY KEY,
+    video_id TEXT,
+    content JSONB,
+    language TEXT,
+    status TEXT
+);
+
+CREATE TABLE IF NOT EXISTS transcript_summaries (
+    subsection_id TEXT PRIMARY KEY,
+    summary_text TEXT
+);
+
+CREATE TABLE IF NOT EXISTS transcript_chunks (
+    id BIGSERIAL PRIMARY KEY,
+    subsection_id TEXT NOT NULL,
+    chunk_index INTEGER NOT NULL,
+    start_seconds DOUBLE PRECISION,
+    content TEXT,
+    embedding vector,
+    UNIQUE (subsection_id, chunk_index)
+);
+
+CREATE TABLE IF NOT EXISTS chat_sessions (
+    session_id TEXT PRIMARY KEY,
+    course_id TEXT NOT NULL,
+    title TEXT,
+    scope TEXT,
+    section_index INTEGER,
+    subsection_index INTEGER,
+    video_id TEXT,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+CREATE INDEX IF NOT EXISTS idx_chat_sessions_course ON chat_sessions (course_id);
+
+CREATE TABLE IF NOT EXISTS chat_messages (
+    id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    session_id TEXT NOT NULL REFERENCES chat_sessions (session_id) ON DELETE CASCADE,
+    sender TEXT NOT NULL,
+    content TEXT,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT clock_timestamp()
+);
+CREATE INDEX IF NOT EXISTS idx_chat_messages_session ON chat_messages (session_id, created_at);
+
+CREATE TABLE IF NOT EXISTS knowledge_files (
+    id TEXT PRIMARY KEY,
+    session_id TEXT NOT NULL,
+    filename TEXT,
+    file_type TEXT,
+    extracted_text TEXT,
+    summary TEXT,
+    file_size INTEGER,
+    storage_path TEXT,
+    content_hash TEXT,
+    uploaded_at TIMESTAMPTZ NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+CREATE INDEX IF NOT EXISTS idx_knowledge_files_session ON knowledge_files (session_id);
+
+CREATE TABLE IF NOT EXISTS knowledge_chunks (
+    id BIGSERIAL PRIMARY KEY,
+    file_id TEXT NOT NULL REFERENCES knowledge_files (id) ON DELETE CASCADE,
+    chunk_index INTEGER NOT NULL,
+    content TEXT,
+    embedding vector
+);
+CREATE INDEX IF NOT EXISTS idx_knowledge_chunks_file ON knowledge_chunks (file_id);
+
+CREATE TABLE IF NOT EXISTS quiz_attempts (
+    attempt_id TEXT PRIMARY KEY,
+    course_id TEXT NOT NULL,
+    title TEXT,
+    status TEXT,
+    questions_json JSONB,
+    interaction_json JSONB,
+    user_answers_json JSONB,
+    original_content TEXT,
+    correct_count INTEGER DEFAULT 0,
+    incorrect_count INTEGER DEFAULT 0,
+    skipped_count INTEGER DEFAULT 0,
+    pass_percentage DOUBLE PRECISION,
+    summary_text TEXT,
+    completed_at TIMESTAMPTZ,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+CREATE INDEX IF NOT EXISTS idx_quiz_attempts_course ON quiz_attempts (course_id);
+
+CREATE TABLE IF NOT EXISTS profiles (
+    id TEXT PRIMARY KEY,
+    preferred_language TEXT,
+    professional_status TEXT,
+    industries TEXT[],
+    motivation TEXT,
+    ai_response_type TEXT
+);
+
+CREATE TABLE IF NOT EXISTS subscriptions (
+    user_id TEXT NOT NULL,
+    status TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_subscriptions_user ON subscriptions (user_id);
@@ -0,0 +1,102 @@
+"""
+Worker throughput benchmark (tasks / minute).
+
+Compares the two ways a Celery worker can execute our async tasks:
+
+    legacy  : one task at a time ('solo' pool), each task does asyncio.run() and opens
+              a throwaway connection pool before doing its work.
+    runtime : WorkerRuntime (src/cleeroute/worker_runtime.py), one persistent event loop,
+              pools opened once, N Celery threads submitting coroutines concurrently.
+
+The task body simulates an I/O-bound job (LLM / YouTube calls) with asyncio.sleep.
+With --real-db the pools are real psycopg pools on DATABASE_URL / APP_DATABASE_URL
+and each simulated call also runs a `SELECT 1`.
+
+Usage:
+    python -m benchmarks.worker_throughput --tasks 40 --concurrency 8
+    python -m benchmarks.worker_throughput --tasks 40 --concurrency 8 --real-db
+"""
+import argparse
+import asyncio
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from src.cleeroute.worker_runtime import WorkerRuntime
+
+
+class _SimulatedRuntime(WorkerRuntime):
+    """Runtime sans base de données : seule la mécanique boucle partagée + threads est mesurée."""
+
+    async def _open(self):
+        return None
+
+    async def _close(self):
+        return None
+
+
+async def _task_body(pool, io_calls: int, io_latency: float):
+    for _ in range(io_calls):
+        await asyncio.sleep(io_latency)
+        if pool is not None:
+            async with pool.connection() as conn:
+                await conn.execute("SELECT 1")
+
+
+async def _legacy_task(args):
+    pool = None
+    if args.real_db:
+        from psycopg_pool import AsyncConnectionPool
+        pool = AsyncConnectionPool(conninfo=os.getenv("APP_DATABASE_URL"), min_size=1, max_size=1, open=False)
+        await pool.open()
+    else:
+        await asyncio.sleep(args.setup_latency)
+    try:
+        await _task_body(pool, args.io_calls, args.io_latency)
+    finally:
+        if pool is not None:
+            await pool.close()
+
+
+def run_legacy(args) -> float:
+    start = time.perf_counter()
+    for _ in range(args.tasks):
+        asyncio.run(_legacy_task(args))
+    return time.perf_counter() - start
+
+
+def run_runtime(args) -> float:
+    runtime = WorkerRuntime() if args.real_db else _SimulatedRuntime()
+    runtime.start()
+    try:
+        def celery_thread(_):
+            runtime.run(_task_body(runtime.app_pool, args.io_calls, args.io_latency))
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+            list(executor.map(celery_thread, range(args.tasks)))
+        return time.perf_counter() - start
+    finally:
+        runtime.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tasks", type=int, default=40)
+    parser.add_argument("--concurrency", type=int, default=8, help="Celery threads (runtime mode)")
+    parser.add_argument("--io-calls", type=int, default=5, help="simulated external calls per task")
+    parser.add_argument("--io-latency", type=float, default=0.2, help="seconds per simulated external call")
+    parser.add_argument("--setup-latency", type=float, default=0.3, help="simulated pool opening cost (legacy, without --real-db)")
+    parser.add_argument("--real-db", action="store_true")
+    args = parser.parse_args()
+
+    results = {"legacy": run_legacy(args), "runtime": run_runtime(args)}
+
+    print(f"{'mode':<10}{'seconds':>10}{'tasks/min':>12}")
+    for mode, elapsed in results.items():
+        print(f"{mode:<10}{elapsed:>10.2f}{args.tasks / elapsed * 60:>12.1f}")
+    print(f"speedup: x{results['legacy'] / results['runtime']:.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,11 @@
 # Fichier: src/cleeroute/db/app_db.py
 
 import os
+import asyncio
 from contextlib import asynccontextmanager
 from typing import AsyncGenerator
 from psycopg_pool import AsyncConnectionPool
+from src.cleeroute.db.pools import create_pool, open_pool, close_pool, abandon_pool
 from psycopg.connection_async import AsyncConnection
 from dotenv import load_dotenv
 from typing import Optional
@@ -14,6 +16,11 @@ load_dotenv()
 # On la déclare comme optionnelle pour une initialisation paresseuse
 app_db_pool: Optional[AsyncConnectionPool] = None
 
+# Pool de repli : code applicatif exécuté hors de l'API et du runtime worker (scripts, tâches isolées)
+_fallback_pool: Optional[AsyncConnectionPool] = None
+_fallback_lock: Optional[asyncio.Lock] = None
+_fallback_loop: Optional[asyncio.AbstractEventLoop] = None
+
 @asynccontextmanager
 async def app_db_lifespan(app):
     """
@@ -27,26 +34,15 @@ async def app_db_lifespan(app):
         
     print("--- Application Startup: Creating Application DB Connection Pool ---")
     
-    # =================================================================
-    # CORRECTION : On suit la meilleure pratique
-    # =================================================================
-    
-    # 1. On crée le pool sans l'ouvrir
-    app_db_pool = AsyncConnectionPool(
-        conninfo=app_db_url,
-        open=False # On passe à False pour supprimer le warning
-    )
-
-    # 2. On ouvre le pool explicitement. C'est la méthode recommandée.
-    await app_db_pool.open()
-    
-    # =================================================================
+    # Taille surchargeable par DB_POOL_APP_MIN_SIZE / DB_POOL_APP_MAX_SIZE (voir db/pools.py)
+    app_db_pool = create_pool("app", app_db_url, min_size=4, max_size=20, timeout=30.0)
+    await open_pool(app_db_pool)
 
     yield # L'application tourne
 
     print("--- Application Shutdown: Closing Application DB Connection Pool ---")
-    if app_db_pool:
-        await app_db_pool.close()
+    await close_pool(app_db_pool)
+    app_db_pool = None
         
 async def get_app_db_connection() -> AsyncGenerator[AsyncConnection, None]:
     """
@@ -64,4 +60,33 @@ def get_active_pool() -> AsyncConnectionPool:
     """Retourne le pool actif. Lève une erreur s'il n'est pas initialisé."""
     if app_db_pool is None:
         raise RuntimeError("Database Pool is not initialized. Ensure the app has started.")
-    return app_db_pool
\ No newline at end of file
+    return app_db_pool
+
+
+async def get_app_pool() -> AsyncConnectionPool:
+    """
+    Pool applicatif du process, utilisable partout (API, worker Celery, scripts) :
+        - celui de l'API (lifespan) ou du worker (WorkerRuntime) s'il est ouvert ;
+        - sinon un pool de repli unique, ouvert au premier appel puis réutilisé
+          (remplace les pools jetables ouverts à chaque appel).
+    """
+    global _fallback_pool, _fallback_lock, _fallback_loop
+    if app_db_pool is not None:
+        return app_db_pool
+
+    # Un pool est lié à sa boucle asyncio : nouvelle boucle (asyncio.run successifs) -> nouveau pool
+    loop = asyncio.get_running_loop()
+    if _fallback_loop is not loop:
+        # L'ancien pool garde ses connexions ouvertes tant qu'on ne le ferme pas
+        abandon_pool(_fallback_pool, _fallback_loop)
+        _fallback_pool, _fallback_lock, _fallback_loop = None, asyncio.Lock(), loop
+
+    async with _fallback_lock:
+        if _fallback_pool is None:
+            db_url = os.getenv("APP_DATABASE_URL")
+            if not db_url:
+                raise RuntimeError("APP_DATABASE_URL must be set in env.")
+            pool = create_pool("fallback", db_url, min_size=1, max_size=4, timeout=30.0)
+            await open_pool(pool)
+            _fallback_pool = pool
+    return _fallback_pool
@@ -2,7 +2,7 @@
 
 import os
 import pickle
-from psycopg_pool import AsyncConnectionPool
+from src.cleeroute.db.pools import create_pool, open_pool, close_pool
 from langgraph.checkpoint.postgres.aio import AsyncPostgresSaver
 from dotenv import load_dotenv
 from typing import AsyncGenerator
@@ -49,9 +49,11 @@ db_url_with_keepalives = f"{db_url}{separator}{keepalive_args}"
 
 # Le pool de connexions asynchrone est configuré pour être robuste
 # aux timeouts réseau des services cloud comme Azure.
-db_pool = AsyncConnectionPool(
-    conninfo=db_url_with_keepalives, 
-    open=False, # Important: Le cycle de vie est géré par le 'lifespan' de FastAPI
+# Non ouvert ici : le cycle de vie est géré par le 'lifespan' de FastAPI.
+# Valeurs par défaut surchargeables par DB_POOL_CHECKPOINT_MIN_SIZE / _MAX_SIZE / _TIMEOUT / _MAX_IDLE (db/pools.py).
+db_pool = create_pool(
+    "checkpoint",
+    db_url_with_keepalives,
     min_size=5,
     max_size=10,
     # Timeout pour obtenir une connexion du pool (en secondes)
@@ -60,7 +62,8 @@ db_pool = AsyncConnectionPool(
     max_idle=180,
     # La ligne la plus importante : VÉRIFIE si une connexion est toujours vivante
     # avant de la donner à votre code. Si elle est morte, il en ouvrira une nouvelle.
-    check=AsyncConnectionPool.check_connection 
+    # (défaut de ce pool, désactivable par DB_POOL_CHECKPOINT_CHECK=false)
+    check=True
 )
 
 
@@ -95,10 +98,10 @@ async def lifespan(app):
     Ouvre le pool de connexions au démarrage et le ferme à l'arrêt.
     """
     print("--- Application Startup: Opening Database Connection Pool ---")
-    await db_pool.open()
+    await open_pool(db_pool)
     yield
     print("--- Application Shutdown: Closing Database Connection Pool ---")
-    await db_pool.close()
+    await close_pool(db_pool)
 
 
 # =========================================================================
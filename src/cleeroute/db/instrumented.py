@@ -0,0 +1,55 @@
+# Fichier: src/cleeroute/db/instrumented.py
+# Pool et curseurs psycopg instrumentés : attente d'une connexion (pool_wait, label = nom du pool)
+# durée de chaque requête (db_query, label = type de requête SELECT / INSERT / ...) et durée pendant laquelle
+# une connexion reste empruntée (pool_hold, label = nom du pool). Chaque emprunt est déclaré à db/lease.py.
+import time
+from typing import Dict, Optional, Tuple
+
+from psycopg import AsyncCursor
+from psycopg_pool import AsyncConnectionPool
+
+from src.cleeroute.db import lease
+from src.cleeroute.metrics import observe, track
+
+
+def _statement_kind(query) -> str:
+    # Label à faible cardinalité : le premier mot de la requête, jamais la requête elle-même
+    text = query.decode() if isinstance(query, bytes) else query if isinstance(query, str) else ""
+    parts = text.lstrip().split(None, 1)
+    return parts[0].upper() if parts else "SQL"
+
+
+class InstrumentedAsyncCursor(AsyncCursor):
+    async def execute(self, query, params=None, **kwargs):
+        with track("db_query", _statement_kind(query)):
+            return await super().execute(query, params, **kwargs)
+
+    async def executemany(self, query, params_seq, **kwargs):
+        with track("db_query", _statement_kind(query)):
+            return await super().executemany(query, params_seq, **kwargs)
+
+
+class InstrumentedAsyncConnectionPool(AsyncConnectionPool):
+    """
+    AsyncConnectionPool dont les connexions utilisent InstrumentedAsyncCursor
+    (conn.execute et conn.cursor passent tous deux par la cursor_factory).
+    """
+
+    def __init__(self, conninfo: str = "", *, name: Optional[str] = None, kwargs: Optional[dict] = None, **pool_kwargs):
+        kwargs = {**(kwargs or {}), "cursor_factory": InstrumentedAsyncCursor}
+        # id(connexion) -> (début de l'emprunt, bail)
+        self._leases: Dict[int, Tuple[float, "lease._Lease"]] = {}
+        super().__init__(conninfo, name=name, kwargs=kwargs, **pool_kwargs)
+
+    async def getconn(self, timeout: Optional[float] = None):
+        with track("pool_wait", self.name):
+            conn = await super().getconn(timeout=timeout)
+        self._leases[id(conn)] = (time.perf_counter(), lease.acquired(self.name))
+        return conn
+
+    async def putconn(self, conn):
+        started, held = self._leases.pop(id(conn), (None, None))
+        lease.released(held)
+        if started is not None:
+            observe("pool_hold", self.name, time.perf_counter() - started)
+        await super().putconn(conn)
@@ -0,0 +1,107 @@
+# Fichier: src/cleeroute/db/lease.py
+# Baux courts sur les connexions du pool : une connexion n'est empruntée que le temps des requêtes SQL,
+# jamais pendant un appel LLM, YouTube, embeddings ou Azure.
+#
+#     async with lease(db) as conn:   # db = pool, connexion déjà empruntée, ou None (pool applicatif)
+#         cursor = await conn.execute(...)
+#     vector = await embeddings.aembed_query(...)   # connexion rendue au pool pendant l'appel
+#
+# Les pools instrumentés (db/instrumented.py) déclarent chaque emprunt ici, et `track` appelle
+# `check_external_call` à l'entrée d'une étape externe (metrics.EXTERNAL_STAGES). Si la tâche courante
+# tient encore une connexion : avertissement + cleeroute_db_lease_violations_total, ou ConnectionHeldError
+# si DB_LEASE_STRICT=true (benchmarks, CI).
+import os
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from typing import AsyncIterator, List, Optional, Set, Tuple, Union
+
+from psycopg import AsyncConnection
+from psycopg_pool import AsyncConnectionPool
+from dotenv import load_dotenv
+
+from src.cleeroute.metrics import record_lease_violation, register_external_call_check
+
+load_dotenv()
+
+DB_LEASE_STRICT = os.getenv("DB_LEASE_STRICT", "false").lower() == "true"
+
+DbSource = Union[AsyncConnectionPool, AsyncConnection, None]
+
+
+class ConnectionHeldError(RuntimeError):
+    """Un appel externe a été lancé alors que la tâche tenait une connexion du pool (mode strict)."""
+
+
+class _Lease:
+    __slots__ = ("pool", "active")
+
+    def __init__(self, pool: str):
+        self.pool = pool
+        self.active = True
+
+
+# Emprunts de la tâche courante (copiés dans les sous-tâches, qui voient donc ceux du parent)
+_held: ContextVar[Tuple[_Lease, ...]] = ContextVar("db_leases_held", default=())
+# Un avertissement par (pool, étape, opération) : le compteur Prometheus garde le volume
+_reported: Set[Tuple[str, str, str]] = set()
+
+
+def acquired(pool: str) -> _Lease:
+    """Appelé par le pool instrumenté quand la tâche courante emprunte une connexion."""
+    new_lease = _Lease(pool or "-")
+    _held.set(tuple(l for l in _held.get() if l.active) + (new_lease,))
+    return new_lease
+
+
+def released(held_lease: Optional[_Lease]):
+    """Appelé par le pool instrumenté au retour de la connexion (éventuellement depuis une autre tâche)."""
+    if held_lease is not None:
+        held_lease.active = False
+
+
+def held_pools() -> Tuple[str, ...]:
+    return tuple(sorted({l.pool for l in _held.get() if l.active}))
+
+
+def check_external_call(stage: str, name: str):
+    pools = held_pools()
+    if not pools:
+        return
+    pool_label = ",".join(pools)
+    record_lease_violation(pool_label, stage)
+    message = f"DB connection from pool '{pool_label}' held across external call {stage} ({name or '-'})"
+    key = (pool_label, stage, name)
+    if key not in _reported:
+        _reported.add(key)
+        print(f"--- [DB LEASE] {message} ---")
+    if DB_LEASE_STRICT:
+        raise ConnectionHeldError(message)
+
+
+def reported_violations() -> List[Tuple[str, str, str]]:
+    """(pool, étape, opération) déjà signalés par ce process (benchmarks / CI)."""
+    return sorted(_reported)
+
+
+register_external_call_check(check_external_call)
+
+
+@asynccontextmanager
+async def lease(source: DbSource = None) -> AsyncIterator[AsyncConnection]:
+    """
+    Emprunte une connexion le temps du bloc (commit à la sortie, rollback sur exception).
+        - pool       : bail court sur ce pool ;
+        - connexion  : déjà empruntée par l'appelant, rendue telle quelle (l'appelant gère le commit) ;
+        - None       : pool applicatif de l'API (db/app_db.py).
+    """
+    if isinstance(source, AsyncConnection):
+        yield source
+        return
+
+    if source is None:
+        # Import local : app_db importe le pool instrumenté, qui importe ce module
+        from src.cleeroute.db.app_db import get_active_pool
+        source = get_active_pool()
+
+    async with source.connection() as conn:
+        yield conn
@@ -0,0 +1,135 @@
+# Fichier: src/cleeroute/db/migrations.py
+# DDL ponctuelle sur la BDD applicative, lancée à la main (ou par le déploiement), jamais sur le chemin des requêtes :
+#     - index coûteux à construire sur de grosses tables (construits en CONCURRENTLY, sans bloquer les écritures) ;
+#     - modifications de tables gérées par un autre service (profiles, subscriptions, knowledge_files...).
+# Les petites tables propres à ce dépôt restent créées paresseusement par leur service (ensure_schema).
+#
+#     python -m src.cleeroute.db.migrations                 # toutes, dans l'ordre
+#     python -m src.cleeroute.db.migrations --list
+#     python -m src.cleeroute.db.migrations transcript_chunks_hnsw
+#
+# Chaque migration est idempotente : on peut la relancer sans risque.
+import argparse
+import asyncio
+import os
+import sys
+from typing import Awaitable, Callable, List, Tuple
+
+import psycopg
+from dotenv import load_dotenv
+
+load_dotenv()
+
+Migration = Callable[[psycopg.AsyncConnection], Awaitable[None]]
+
+MIGRATIONS: List[Tuple[str, Migration]] = []
+
+
+def migration(name: str):
+    def register(func: Migration) -> Migration:
+        MIGRATIONS.append((name, func))
+        return func
+    return register
+
+
+async def create_index_concurrently(conn: psycopg.AsyncConnection, index_name: str, definition: str):
+    """CREATE INDEX CONCURRENTLY idempotent (connexion en autocommit : interdit dans une transaction)."""
+    # Une construction CONCURRENTLY interrompue laisse un index INVALID, que IF NOT EXISTS ignorerait
+    cursor = await conn.execute(
+        """
+        SELECT i.indisvalid FROM pg_class c JOIN pg_index i ON i.indexrelid = c.oid
+        WHERE c.relname = %s
+        """,
+        (index_name,)
+    )
+    row = await cursor.fetchone()
+    if row is not None and not row[0]:
+        print(f"--- [MIGRATIONS] Dropping invalid index {index_name} ---")
+        await conn.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {index_name}")
+    await conn.execute(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {index_name} {definition}")
+
+
+@migration("transcript_chunks_hnsw")
+async def transcript_chunks_hnsw(conn: psycopg.AsyncConnection):
+    """Index ANN sur les embeddings des transcripts (pgvector >= 0.5), sinon le scan exact reste utilisé."""
+    await create_index_concurrently(
+        conn,
+        "idx_transcript_chunks_embedding_hnsw",
+        "ON transcript_chunks USING hnsw (embedding vector_cosine_ops)",
+    )
+
+
+@migration("knowledge_files_content_hash")
+async def knowledge_files_content_hash(conn: psycopg.AsyncConnection):
+    """Empreinte SHA-256 des fichiers uploadés : dédoublonnage par contenu dans une session (chats/services/ingestion.py)."""
+    # Colonne nullable sans défaut : pas de réécriture de la table
+    await conn.execute("ALTER TABLE knowledge_files ADD COLUMN IF NOT EXISTS content_hash TEXT")
+    await create_index_concurrently(
+        conn,
+        "idx_knowledge_files_session_hash",
+        "ON knowledge_files (session_id, content_hash)",
+    )
+
+
+_USER_CACHE_TRIGGER_FUNCTION_SQL = """
+CREATE OR REPLACE FUNCTION {function}() RETURNS trigger AS $$
+BEGIN
+    PERFORM pg_notify(TG_ARGV[0], CASE WHEN TG_OP = 'DELETE' THEN OLD.{column}::text ELSE NEW.{column}::text END);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql
+"""
+
+
+@migration("user_cache_notify_triggers")
+async def user_cache_notify_triggers(conn: psycopg.AsyncConnection):
+    """Triggers NOTIFY sur profiles / subscriptions : invalidation du cache utilisateur (db/user_cache.py)."""
+    # Import local : le canal est configuré côté cache, le reste du module n'est pas nécessaire ici
+    from src.cleeroute.db.user_cache import USER_CACHE_NOTIFY_CHANNEL
+
+    for table, column in (("profiles", "id"), ("subscriptions", "user_id")):
+        function = f"cleeroute_notify_user_cache_{table}"
+        async with conn.transaction():
+            await conn.execute(_USER_CACHE_TRIGGER_FUNCTION_SQL.format(function=function, column=column))
+            await conn.execute(f"DROP TRIGGER IF EXISTS {function} ON {table}")
+            await conn.execute(
+                f"CREATE TRIGGER {function} AFTER INSERT OR UPDATE OR DELETE ON {table} "
+                f"FOR EACH ROW EXECUTE FUNCTION {function}('{USER_CACHE_NOTIFY_CHANNEL}')"
+            )
+
+
+async def run(names: List[str], conninfo: str) -> int:
+    known = dict(MIGRATIONS)
+    unknown = [n for n in names if n not in known]
+    if unknown:
+        print(f"Unknown migrations: {unknown} (available: {[n for n, _ in MIGRATIONS]})")
+        return 1
+
+    selected = [(n, f) for n, f in MIGRATIONS if not names or n in names]
+    async with await psycopg.AsyncConnection.connect(conninfo, autocommit=True) as conn:
+        for name, func in selected:
+            print(f"--- [MIGRATIONS] {name} ---")
+            try:
+                await func(conn)
+            except Exception as e:
+                print(f"--- [MIGRATIONS] {name} failed: {e} ---")
+                return 1
+    print(f"--- [MIGRATIONS] {len(selected)} migration(s) applied ---")
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="One-off schema migrations for the application database")
+    parser.add_argument("names", nargs="*", help="Migrations to apply (default: all, in order)")
+    parser.add_argument("--list", action="store_true", help="List the migrations and exit")
+    parser.add_argument("--url", default=os.getenv("APP_DATABASE_URL"), help="Database URL (default: APP_DATABASE_URL)")
+    args = parser.parse_args()
+
+    if args.list:
+        for name, func in MIGRATIONS:
+            print(f"{name:<32} {(func.__doc__ or '').strip()}")
+        sys.exit(0)
+    if not args.url:
+        print("APP_DATABASE_URL is not set (or pass --url)")
+        sys.exit(1)
+    sys.exit(asyncio.run(run(args.names, args.url)))
@@ -0,0 +1,165 @@
+# Fichier: src/cleeroute/db/pools.py
+# Gestion unifiée des pools Postgres (API, checkpointer LangGraph, worker Celery, pool de repli) :
+#   - taille et timeouts par pool via l'env : DB_POOL_<NOM>_MIN_SIZE, _MAX_SIZE, _TIMEOUT, _MAX_IDLE,
+#     _MAX_LIFETIME (NOM = nom du pool en majuscules, ex. APP, CHECKPOINT, WORKER_APP, FALLBACK) ;
+#   - préparation des requêtes côté serveur : DB_PREPARE_THRESHOLD ou DB_POOL_<NOM>_PREPARE_THRESHOLD
+#     (non défini = défaut psycopg, 5 exécutions ; "none" = jamais, obligatoire derrière PgBouncer en mode transaction) ;
+#   - warm-up : à l'ouverture on attend que min_size connexions soient prêtes (DB_POOL_WARMUP) ;
+#   - vérification des connexions à chaque emprunt (un aller-retour de plus) : opt-in, DB_POOL_CHECK
+#     ou DB_POOL_<NOM>_CHECK (utile si un proxy coupe les connexions inactives sans prévenir) ;
+#   - statistiques psycopg_pool exportées en métriques toutes les DB_POOL_STATS_INTERVAL secondes.
+#
+#     pool = create_pool("app", url, min_size=4, max_size=20)   # valeurs par défaut, surchargées par l'env
+#     await open_pool(pool)
+#     ...
+#     await close_pool(pool)
+import asyncio
+import os
+import time
+from typing import Dict, Optional, Tuple
+
+from psycopg_pool import AsyncConnectionPool, PoolTimeout
+from dotenv import load_dotenv
+
+from src.cleeroute.db.instrumented import InstrumentedAsyncConnectionPool
+from src.cleeroute.metrics import record_pool_stats
+
+load_dotenv()
+
+DB_POOL_WARMUP = os.getenv("DB_POOL_WARMUP", "true").lower() == "true"
+DB_POOL_WARMUP_TIMEOUT = float(os.getenv("DB_POOL_WARMUP_TIMEOUT", 30))
+DB_POOL_STATS_INTERVAL = float(os.getenv("DB_POOL_STATS_INTERVAL", 15))
+DB_POOL_CHECK = os.getenv("DB_POOL_CHECK", "false").lower() == "true"
+
+_SIZING_KEYS = (("min_size", int), ("max_size", int), ("timeout", float), ("max_idle", float), ("max_lifetime", float))
+
+# Pools ouverts par ce process (nom -> pool), relevés par l'export des statistiques
+_open_pools: Dict[str, AsyncConnectionPool] = {}
+_stats_task: Optional[asyncio.Task] = None
+
+
+def _env(pool_name: str, key: str) -> Optional[str]:
+    return os.getenv(f"DB_POOL_{pool_name.upper().replace('-', '_')}_{key}")
+
+
+def pool_settings(name: str, **defaults) -> dict:
+    """Valeurs par défaut du code, surchargées par DB_POOL_<NOM>_<CLÉ> lorsqu'elles sont définies."""
+    settings = dict(defaults)
+    for key, cast in _SIZING_KEYS:
+        value = _env(name, key.upper())
+        if value:
+            settings[key] = cast(value)
+    return settings
+
+
+def _prepare_threshold(name: str) -> Tuple[bool, Optional[int]]:
+    """(configuré, seuil) : None désactive la préparation, non configuré = défaut psycopg."""
+    raw = _env(name, "PREPARE_THRESHOLD") or os.getenv("DB_PREPARE_THRESHOLD")
+    if not raw:
+        return False, None
+    if raw.lower() in ("none", "off", "-1"):
+        return True, None
+    return True, int(raw)
+
+
+def create_pool(name: str, conninfo: str, *, kwargs: Optional[dict] = None, check: Optional[bool] = None,
+                **defaults) -> InstrumentedAsyncConnectionPool:
+    """
+    Crée un pool instrumenté (non ouvert) avec la configuration de l'env. Voir `open_pool`.
+    `check` : vérification à l'emprunt par défaut pour ce pool (None = DB_POOL_CHECK), surchargée par DB_POOL_<NOM>_CHECK.
+    """
+    settings = pool_settings(name, **defaults)
+    raw_check = _env(name, "CHECK")
+    if raw_check:
+        check = raw_check.lower() == "true"
+    elif check is None:
+        check = DB_POOL_CHECK
+    if check:
+        settings["check"] = AsyncConnectionPool.check_connection
+
+    conn_kwargs = dict(kwargs or {})
+    configured, threshold = _prepare_threshold(name)
+    if configured:
+        conn_kwargs["prepare_threshold"] = threshold
+
+    pool = InstrumentedAsyncConnectionPool(conninfo, name=name, open=False, kwargs=conn_kwargs, **settings)
+    prepare = f", prepare_threshold {threshold}" if configured else ""
+    checked = ", checked on checkout" if check else ""
+    print(f"--- [DB POOL] {name}: min {pool.min_size}, max {pool.max_size}, timeout {pool.timeout}s{prepare}{checked} ---")
+    return pool
+
+
+async def open_pool(pool: AsyncConnectionPool):
+    """Ouvre le pool, attend ses min_size connexions (warm-up) et l'inscrit à l'export des statistiques."""
+    await pool.open()
+    if DB_POOL_WARMUP:
+        start = time.perf_counter()
+        try:
+            await pool.wait(timeout=DB_POOL_WARMUP_TIMEOUT)
+            print(f"--- [DB POOL] {pool.name}: {pool.min_size} connections ready in {time.perf_counter() - start:.2f}s ---")
+        except PoolTimeout as e:
+            # On démarre quand même : le pool continue d'ouvrir ses connexions en arrière-plan
+            print(f"--- [DB POOL] {pool.name}: warm-up incomplete after {DB_POOL_WARMUP_TIMEOUT:.0f}s ({e}) ---")
+    _open_pools[pool.name] = pool
+    _ensure_stats_exporter()
+
+
+async def close_pool(pool: Optional[AsyncConnectionPool]):
+    global _stats_task
+    if pool is None:
+        return
+    if _open_pools.get(pool.name) is pool:
+        # Dernier relevé avant fermeture
+        record_pool_stats(pool.name, pool.pop_stats())
+        del _open_pools[pool.name]
+    await pool.close()
+    if not _open_pools and _stats_task is not None:
+        _stats_task.cancel()
+        _stats_task = None
+
+
+def abandon_pool(pool: Optional[AsyncConnectionPool], loop: Optional[asyncio.AbstractEventLoop]):
+    """
+    Ferme un pool lié à une AUTRE boucle asyncio que la boucle courante (on ne peut pas l'y attendre) :
+        - boucle encore active (autre thread) : fermeture planifiée sur cette boucle ;
+        - boucle arrêtée (asyncio.run terminé) : les tâches du pool sont mortes avec elle,
+          on ferme directement les sockets de ses connexions inactives.
+    """
+    if pool is None:
+        return
+    if _open_pools.get(pool.name) is pool:
+        del _open_pools[pool.name]
+    if loop is not None and not loop.is_closed() and loop.is_running():
+        asyncio.run_coroutine_threadsafe(pool.close(), loop)
+        return
+    # Attribut interne de psycopg_pool : connexions inactives du pool
+    for conn in list(getattr(pool, "_pool", ())):
+        try:
+            conn.pgconn.finish()
+        except Exception as e:
+            print(f"--- [DB POOL] {pool.name}: could not close an abandoned connection ({e}) ---")
+    print(f"--- [DB POOL] {pool.name}: closed (event loop changed) ---")
+
+
+def export_pool_stats():
+    for name, pool in list(_open_pools.items()):
+        try:
+            record_pool_stats(name, pool.pop_stats())
+        except Exception as e:
+            print(f"--- [DB POOL] Stats export failed for {name}: {e} ---")
+
+
+async def _export_stats_forever():
+    while True:
+        export_pool_stats()
+        await asyncio.sleep(DB_POOL_STATS_INTERVAL)
+
+
+def _ensure_stats_exporter():
+    global _stats_task
+    if DB_POOL_STATS_INTERVAL <= 0:
+        return
+    # Une tâche par boucle (API ou runtime du worker) : on la recrée si la boucle a changé
+    loop = asyncio.get_running_loop()
+    if _stats_task is None or _stats_task.done() or _stats_task.get_loop() is not loop:
+        _stats_task = loop.create_task(_export_stats_forever())
@@ -0,0 +1,35 @@
+# Fichier: src/cleeroute/db/redis_client.py
+
+import os
+import asyncio
+import weakref
+from typing import Optional
+import redis.asyncio as aioredis
+from dotenv import load_dotenv
+
+load_dotenv()
+
+REDIS_URL = os.getenv("REDIS_URL", os.getenv("CELERY_BROKER_URL"))
+
+# Un client par event loop : les connexions redis.asyncio sont liées à la boucle qui les a créées
+# (l'API FastAPI a une seule boucle, les workers Celery peuvent en avoir plusieurs).
+_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, aioredis.Redis]" = weakref.WeakKeyDictionary()
+
+
+def get_redis() -> Optional[aioredis.Redis]:
+    """
+    Retourne le client Redis asynchrone de la boucle courante.
+    Retourne None si aucune URL Redis n'est configurée (les appelants doivent dégrader proprement).
+    """
+    if not REDIS_URL:
+        return None
+
+    loop = asyncio.get_running_loop()
+    client = _clients.get(loop)
+    if client is None:
+        kwargs = {"decode_responses": True, "socket_timeout": 10, "socket_connect_timeout": 10}
+        if REDIS_URL.startswith("rediss://"):
+            kwargs["ssl_cert_reqs"] = None
+        client = aioredis.from_url(REDIS_URL, **kwargs)
+        _clients[loop] = client
+    return client
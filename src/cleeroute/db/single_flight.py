@@ -0,0 +1,97 @@
+# Fichier: src/cleeroute/db/single_flight.py
+
+import os
+import asyncio
+from contextlib import asynccontextmanager
+from typing import Dict
+from redis.exceptions import LockError
+from src.cleeroute.db.redis_client import get_redis
+
+# Durée du bail Redis : renouvelé tant que le travail tourne, expire seul si le process meurt
+SINGLE_FLIGHT_LEASE_SECONDS = int(os.getenv("SINGLE_FLIGHT_LEASE_SECONDS", 60))
+# Temps max d'attente d'un job en cours (un long transcript peut prendre plusieurs minutes)
+SINGLE_FLIGHT_WAIT_SECONDS = int(os.getenv("SINGLE_FLIGHT_WAIT_SECONDS", 900))
+
+
+class _LocalLock:
+    """Verrou local partagé par les appelants d'une même clé ; retiré du registre quand plus personne ne l'utilise."""
+    __slots__ = ("lock", "users")
+
+    def __init__(self):
+        self.lock = asyncio.Lock()
+        self.users = 0
+
+
+# Fallback intra-process quand Redis n'est pas disponible (une entrée par clé en cours d'utilisation seulement)
+_local_locks: Dict[str, _LocalLock] = {}
+
+
+async def _renew_lease(lock, interval: float):
+    """Prolonge le bail tant que le détenteur travaille."""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await lock.reacquire()
+        except Exception as e:
+            print(f"[SINGLE-FLIGHT] Lease renewal failed for {lock.name}: {e}")
+            return
+
+
+@asynccontextmanager
+async def single_flight(key: str, lease_seconds: int = SINGLE_FLIGHT_LEASE_SECONDS, wait_seconds: int = SINGLE_FLIGHT_WAIT_SECONDS):
+    """
+    Verrou distribué (Redis) : un seul détenteur à la fois pour `key`, API et workers Celery confondus.
+    Les autres appelants ATTENDENT la fin du job en cours ; ils doivent ensuite revérifier
+    si le travail a déjà été fait avant de le refaire.
+
+    Usage :
+        async with single_flight(f"transcript:{subsection_id}"):
+            if already_done(): return
+            ...
+    """
+    redis = get_redis()
+    lock = None
+
+    if redis is not None:
+        lock = redis.lock(
+            f"singleflight:{key}",
+            timeout=lease_seconds,
+            sleep=0.5,
+            blocking_timeout=wait_seconds,
+            thread_local=False
+        )
+        try:
+            acquired = await lock.acquire()
+        except Exception as e:
+            print(f"[SINGLE-FLIGHT] Redis unavailable, falling back to a local lock: {e}")
+            lock, acquired = None, False
+        else:
+            if not acquired:
+                raise TimeoutError(f"Timed out waiting for in-flight job '{key}'")
+
+    if lock is None:
+        local_lock = _local_locks.get(key)
+        if local_lock is None:
+            local_lock = _local_locks[key] = _LocalLock()
+        local_lock.users += 1
+        try:
+            async with local_lock.lock:
+                yield
+        finally:
+            local_lock.users -= 1
+            if local_lock.users == 0:
+                _local_locks.pop(key, None)
+        return
+
+    renewer = asyncio.create_task(_renew_lease(lock, lease_seconds / 3))
+    try:
+        yield
+    finally:
+        renewer.cancel()
+        try:
+            await lock.release()
+        except LockError:
+            # Bail expiré entre-temps : un autre détenteur a pu prendre la main, rien à libérer
+            pass
+        except Exception as e:
+            print(f"[SINGLE-FLIGHT] Could not release lock '{key}': {e}")
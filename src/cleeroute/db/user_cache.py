@@ -0,0 +1,191 @@
+# Fichier: src/cleeroute/db/user_cache.py
+# Cache TTL des lectures par utilisateur qui changent rarement mais sont faites à chaque requête :
+#     - "profile" : get_user_profile (table profiles), pour le chat et le quiz ;
+#     - "premium" : check_user_premium_status (table subscriptions), pour la collecte du syllabus.
+#
+# Deux niveaux, comme le cache de réponses LLM (llm_cache.py) :
+#     - mémoire du process (USER_CACHE_MEMORY_TTL, court) ;
+#     - Redis, partagé entre l'API et les workers Celery (USER_PROFILE_CACHE_TTL / USER_PREMIUM_CACHE_TTL).
+#
+# Invalidation :
+#     - POST /users/{userId}/cache/invalidate (backoffice, webhook de paiement...) ;
+#     - Postgres NOTIFY sur USER_CACHE_NOTIFY_CHANNEL (payload = user id) : chaque process API / worker écoute
+#       le canal et vide sa mémoire et Redis. Les triggers qui émettent ce NOTIFY à chaque modification de
+#       profiles / subscriptions (tables d'un autre service) s'installent une fois, hors du chemin applicatif :
+#           python -m src.cleeroute.db.migrations user_cache_notify_triggers
+# Redis ou Postgres indisponible = dégradation silencieuse : on relit la base.
+import os
+import time
+import asyncio
+from typing import Dict, Optional, Tuple
+
+import psycopg
+from fastapi import APIRouter, HTTPException
+from dotenv import load_dotenv
+
+from src.cleeroute.db.redis_client import get_redis
+from src.cleeroute.metrics import record_cache
+
+load_dotenv()
+
+USER_CACHE_ENABLED = os.getenv("USER_CACHE_ENABLED", "true").lower() == "true"
+USER_CACHE_MEMORY_TTL = float(os.getenv("USER_CACHE_MEMORY_TTL", 30))
+USER_CACHE_TTLS: Dict[str, int] = {
+    "profile": int(os.getenv("USER_PROFILE_CACHE_TTL", 600)),
+    "premium": int(os.getenv("USER_PREMIUM_CACHE_TTL", 300)),
+}
+USER_CACHE_NOTIFY_CHANNEL = os.getenv("USER_CACHE_NOTIFY_CHANNEL", "user_cache_invalidate")
+USER_CACHE_LISTEN = os.getenv("USER_CACHE_LISTEN", "true").lower() == "true"
+# Entrées mémoire max (au-delà, les plus anciennes sont évincées)
+USER_CACHE_MEMORY_SIZE = int(os.getenv("USER_CACHE_MEMORY_SIZE", 10000))
+
+
+def _redis_key(kind: str, user_id: str) -> str:
+    return f"usercache:{kind}:{user_id}"
+
+
+class UserCache:
+    """Valeurs sérialisées (str) par (type, user id). Une erreur de cache ne fait jamais échouer l'appel."""
+
+    def __init__(self):
+        self._memory: Dict[Tuple[str, str], Tuple[float, str]] = {}
+
+    def _memory_get(self, kind: str, user_id: str) -> Optional[str]:
+        entry = self._memory.get((kind, user_id))
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            self._memory.pop((kind, user_id), None)
+            return None
+        return value
+
+    def _memory_set(self, kind: str, user_id: str, value: str):
+        ttl = min(USER_CACHE_MEMORY_TTL, USER_CACHE_TTLS[kind])
+        self._memory[(kind, user_id)] = (time.monotonic() + ttl, value)
+        if len(self._memory) > USER_CACHE_MEMORY_SIZE:
+            # dict ordonné par insertion : on évince les plus anciennes
+            for key in list(self._memory)[: len(self._memory) - USER_CACHE_MEMORY_SIZE]:
+                self._memory.pop(key, None)
+
+    async def get(self, kind: str, user_id: str) -> Optional[str]:
+        if not USER_CACHE_ENABLED or not user_id:
+            return None
+        value = self._memory_get(kind, user_id)
+        if value is None:
+            redis = get_redis()
+            if redis is not None:
+                try:
+                    value = await redis.get(_redis_key(kind, user_id))
+                except Exception as e:
+                    print(f"[USER CACHE] Redis read failed ({kind}): {e}")
+                if value is not None:
+                    self._memory_set(kind, user_id, value)
+        record_cache(f"user:{kind}", value is not None)
+        return value
+
+    async def set(self, kind: str, user_id: str, value: str):
+        if not USER_CACHE_ENABLED or not user_id:
+            return
+        self._memory_set(kind, user_id, value)
+        redis = get_redis()
+        if redis is None:
+            return
+        try:
+            await redis.set(_redis_key(kind, user_id), value, ex=USER_CACHE_TTLS[kind])
+        except Exception as e:
+            print(f"[USER CACHE] Redis write failed ({kind}): {e}")
+
+    def invalidate_local(self, user_id: str):
+        for kind in USER_CACHE_TTLS:
+            self._memory.pop((kind, user_id), None)
+
+    async def invalidate(self, user_id: str):
+        """Vide la mémoire de ce process et Redis ; les autres process sont prévenus par `notify_invalidation`."""
+        self.invalidate_local(user_id)
+        redis = get_redis()
+        if redis is None:
+            return
+        try:
+            await redis.delete(*[_redis_key(kind, user_id) for kind in USER_CACHE_TTLS])
+        except Exception as e:
+            print(f"[USER CACHE] Redis delete failed: {e}")
+
+
+user_cache = UserCache()
+
+
+# ---------------------------------------------------------------------------
+# Invalidation inter-process : Postgres LISTEN / NOTIFY
+# ---------------------------------------------------------------------------
+
+async def notify_invalidation(user_id: str) -> bool:
+    """Invalide le cache de l'utilisateur partout : ce process, Redis, puis NOTIFY pour les autres process."""
+    await user_cache.invalidate(user_id)
+    try:
+        # Import local : app_db importe les pools, qui importent les métriques
+        from src.cleeroute.db.app_db import get_app_pool
+        pool = await get_app_pool()
+        async with pool.connection() as conn:
+            await conn.execute("SELECT pg_notify(%s, %s)", (USER_CACHE_NOTIFY_CHANNEL, str(user_id)))
+        return True
+    except Exception as e:
+        # Les autres process gardent au plus USER_CACHE_MEMORY_TTL secondes l'ancienne valeur
+        print(f"[USER CACHE] NOTIFY failed for user {user_id}: {e}")
+        return False
+
+
+async def _listen_forever(conninfo: str, conn_kwargs: dict):
+    delay = 1.0
+    while True:
+        try:
+            # Connexion dédiée hors pool : LISTEN la garde ouverte pendant toute la vie du process
+            # (écoute seule : les triggers sont installés par db/migrations.py)
+            async with await psycopg.AsyncConnection.connect(conninfo, **{**conn_kwargs, "autocommit": True}) as conn:
+                await conn.execute(f'LISTEN "{USER_CACHE_NOTIFY_CHANNEL}"')
+                print(f"--- [USER CACHE] Listening for invalidations on '{USER_CACHE_NOTIFY_CHANNEL}' ---")
+                delay = 1.0
+                async for notification in conn.notifies():
+                    if notification.payload:
+                        # Le NOTIFY peut venir d'un trigger (écriture directe en base) : personne n'a vidé Redis
+                        await user_cache.invalidate(notification.payload)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            # Pendant la coupure, la mémoire locale reste bornée par USER_CACHE_MEMORY_TTL
+            print(f"[USER CACHE] Invalidation listener disconnected ({e}), retrying in {delay:.0f}s")
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 60.0)
+
+
+def start_invalidation_listener(conn_kwargs: Optional[dict] = None) -> Optional[asyncio.Task]:
+    """Lance l'écoute du canal d'invalidation sur la boucle courante (lifespan de l'API, runtime du worker)."""
+    conninfo = os.getenv("APP_DATABASE_URL")
+    if not (USER_CACHE_ENABLED and USER_CACHE_LISTEN and conninfo):
+        return None
+    return asyncio.get_running_loop().create_task(_listen_forever(conninfo, conn_kwargs or {}))
+
+
+# ---------------------------------------------------------------------------
+# Endpoint d'invalidation
+# ---------------------------------------------------------------------------
+
+user_cache_router = APIRouter()
+
+
+@user_cache_router.post("/users/{userId}/cache/invalidate", summary="Invalidate a user's cached profile and premium status")
+async def invalidate_user_cache(userId: str):
+    """
+    **Drops the cached profile and premium status of a user, in every API process and Celery worker.**\n
+    Call it after a profile edit or a subscription change when the database triggers are not installed
+    (`python -m src.cleeroute.db.migrations user_cache_notify_triggers`); without either, cached values
+    expire after USER_PROFILE_CACHE_TTL / USER_PREMIUM_CACHE_TTL seconds.\n
+    Args:\n
+        userId (str): The user id.
+    """
+    try:
+        notified = await notify_invalidation(userId)
+    except Exception as e:
+        print(f"User Cache Invalidation Error: {e}")
+        raise HTTPException(status_code=500, detail="Failed to invalidate the user cache.")
+    return {"status": "success", "userId": userId, "notified": notified}
@@ -1,10 +1,8 @@
-import os
 import logging
-from psycopg_pool import AsyncConnectionPool
 from dotenv import load_dotenv
 
-# On importe ton accesseur de pool existant
-from src.cleeroute.db.app_db import get_active_pool
+from src.cleeroute.db.app_db import get_app_pool
+from src.cleeroute.db.user_cache import user_cache
 
 load_dotenv()
 
@@ -14,9 +12,8 @@ async def check_user_premium_status(user_id: str) -> bool:
     """
     Vérifie si un utilisateur possède un abonnement 'active' dans la table subscriptions.
     
-    Logique de résilience :
-    1. Essaie d'utiliser le pool global de l'application (cas API/FastAPI).
-    2. Si le pool n'est pas initialisé (cas Celery Worker), crée une connexion temporaire.
+    Utilise le pool applicatif du process (API, worker Celery ou pool de repli, voir get_app_pool).
+    Résultat mis en cache (db/user_cache.py, USER_PREMIUM_CACHE_TTL) ; les erreurs ne sont pas mises en cache.
     
     Returns:
         bool: True si premium, False sinon (ou en cas d'erreur).
@@ -24,6 +21,10 @@ async def check_user_premium_status(user_id: str) -> bool:
     if not user_id:
         return False
 
+    cached = await user_cache.get("premium", user_id)
+    if cached is not None:
+        return cached == "1"
+
     # Requête SQL optimisée : on cherche juste l'existence d'une ligne active
     # On suppose que la colonne de jointure est 'user_id'. Adapte si c'est 'id' ou 'userId'.
     query = """
@@ -34,38 +35,18 @@ async def check_user_premium_status(user_id: str) -> bool:
     """
 
     try:
-        # --- CAS 1 : Utilisation du Pool Global (Contexte FastAPI) ---
-        try:
-            pool = get_active_pool()
-            async with pool.connection() as conn:
-                async with conn.cursor() as cur:
-                    await cur.execute(query, (user_id,))
-                    result = await cur.fetchone()
-                    
-                    is_premium = result is not None
-                    _log_status(user_id, is_premium)
-                    return is_premium
-
-        except RuntimeError:
-            # --- CAS 2 : Pool Global non initialisé (Contexte Worker/Script) ---
-            # Le pool n'existe pas car on n'est pas passé par app_db_lifespan.
-            # On crée une connexion "One-Shot".
-            
-            db_url = os.getenv("APP_DATABASE_URL")
-            if not db_url:
-                logger.error("APP_DATABASE_URL missing for manual connection.")
-                return False
-
-            # On ouvre un pool temporaire juste pour cette vérification
-            async with AsyncConnectionPool(conninfo=db_url, min_size=1, max_size=1) as temp_pool:
-                async with temp_pool.connection() as conn:
-                    async with conn.cursor() as cur:
-                        await cur.execute(query, (user_id,))
-                        result = await cur.fetchone()
-                        
-                        is_premium = result is not None
-                        _log_status(user_id, is_premium)
-                        return is_premium
+        # Pool de l'API ou du worker s'il est ouvert, sinon pool de repli unique du process
+        # (plus de pool temporaire ouvert puis fermé à chaque vérification)
+        pool = await get_app_pool()
+        async with pool.connection() as conn:
+            async with conn.cursor() as cur:
+                await cur.execute(query, (user_id,))
+                result = await cur.fetchone()
+
+        is_premium = result is not None
+        await user_cache.set("premium", user_id, "1" if is_premium else "0")
+        _log_status(user_id, is_premium)
+        return is_premium
 
     except Exception as e:
         # En cas d'erreur DB (timeout, auth...), on ne bloque pas l'utilisateur.
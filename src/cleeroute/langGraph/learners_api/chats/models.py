@@ -250,4 +250,32 @@ class TranscriptResponse(BaseModel):
     """Réponse complète de l'endpoint."""
     subsectionId: str
     videoId: str
-    content: List[TranscriptSegment]
\ No newline at end of file
+    content: List[TranscriptSegment]
+# Models for course-wide transcript prewarming
+class CoursePrewarmRequest(BaseModel):
+    """Position actuelle de l'apprenant (les vidéos proches sont préparées en premier)."""
+    currentSubsectionId: Optional[str] = None
+
+class CoursePrewarmResponse(BaseModel):
+    courseId: str
+    status: str
+    total: int
+    queued: int
+    alreadyQueued: int
+    ready: int
+    unavailable: int
+
+class SubsectionPrewarmStatus(BaseModel):
+    subsectionId: str
+    title: Optional[str] = None
+    status: str # ready | queued | pending | unavailable
+
+class CoursePrewarmProgress(BaseModel):
+    courseId: str
+    total: int
+    percentage: int
+    ready: int
+    queued: int
+    pending: int
+    unavailable: int
+    subsections: List[SubsectionPrewarmStatus]
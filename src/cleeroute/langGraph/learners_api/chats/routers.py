@@ -11,15 +11,17 @@ import json
 from fastapi.responses import StreamingResponse
 from datetime import datetime
 # 1. Importations des modèles et du graphe
-from .models import (DeleteResponse, SessionActionResponse, MessageResponse, ChatAskRequest, ChatSessionResponse, CreateSessionRequest, EditMessageRequest, RenameSessionRequest, FileUploadResponse, FileMetadataResponse, FileContentResponse, DeleteUploadedFile, TranscriptResponse, TranscriptSegment)
+from .models import (DeleteResponse, SessionActionResponse, MessageResponse, ChatAskRequest, ChatSessionResponse, CreateSessionRequest, EditMessageRequest, RenameSessionRequest, FileUploadResponse, FileMetadataResponse, FileContentResponse, DeleteUploadedFile, TranscriptResponse, TranscriptSegment, CoursePrewarmRequest, CoursePrewarmResponse, CoursePrewarmProgress)
 
 # from .graph import get_quiz_graph
 
 # Import du sérialiseur que nous utilisons de manière cohérente
 from src.cleeroute.langGraph.learners_api.course_gen.state import PydanticSerializer
 from src.cleeroute.db.app_db import get_app_db_connection, get_active_pool
-from src.cleeroute.langGraph.learners_api.chats.services.tasks import ingest_transcript_by_id_task
+from src.cleeroute.db.lease import lease
+from src.cleeroute.langGraph.learners_api.chats.services.prewarm_scheduler import enqueue_subsection_ingestion, schedule_course_prewarm, get_course_prewarm_progress
 from src.cleeroute.langGraph.learners_api.chats.services.ytbe_transcripts import TranscriptService
+from src.cleeroute.langGraph.learners_api.chats.services.answer_cache import SemanticAnswerCache, CHAT_SEMANTIC_CACHE_ENABLED, build_scope_key, compute_course_version
 import os
 
 from dotenv import load_dotenv
@@ -36,8 +38,29 @@ from .course_context_for_global_chat import get_student_quiz_context, extract_co
 from src.cleeroute.langGraph.learners_api.chats.services.ingestion import FileIngestionService
 from src.cleeroute.langGraph.learners_api.utils import get_llm
 from src.cleeroute.langGraph.learners_api.chats.services.azure_storage_service import AzureStorageService
+from src.cleeroute.lazy_init import lazy_resource
 
-qa_llm = get_llm(api_key=os.getenv("GEMINI_API_KEY"))
+# Clients et services construits au premier usage (ou au warm-up du lifespan), pas à l'import
+@lazy_resource("chats.qa_llm")
+def qa_llm():
+    return get_llm(api_key=os.getenv("GEMINI_API_KEY"), priority="interactive")
+
+# Même requête initiale -> même titre : réponse servie par le cache
+@lazy_resource("chats.title_llm")
+def title_llm():
+    return get_llm(api_key=os.getenv("GEMINI_API_KEY"), priority="interactive", cache="session_title")
+
+@lazy_resource("chats.ingestion_service")
+def ingestion_service():
+    return FileIngestionService()
+
+@lazy_resource("chats.answer_cache")
+def answer_cache():
+    return SemanticAnswerCache()
+
+@lazy_resource("chats.azure_service")
+def azure_service():
+    return AzureStorageService()
 
 
 global_chat_router = APIRouter()
@@ -161,7 +184,6 @@ async def ask_question_in_the_global_chat_for_a_session(
     request: ChatAskRequest,
     userId: str = Header(..., alias="userId"),
     x_gemini_api_key: Optional[str] = Header(None, alias="X-gemini-Api-Key"),
-    db: AsyncConnection = Depends(get_app_db_connection)
 ):
     """
         Sends a user message to the AI Assistant and receives a response.\\
@@ -185,51 +207,55 @@ async def ask_question_in_the_global_chat_for_a_session(
     if x_gemini_api_key:
         os.environ['GEMINI_API_KEY'] = x_gemini_api_key
         
-    # 1. Personnalisation
-    profile = await get_user_profile(db=db,user_id=userId)
-    persona_block = build_personalization_block(profile)
-
-    # 2. Récupération Session & Check Historique
-    cursor = await db.execute(
-        "SELECT course_id, scope, section_index, subsection_index, video_id FROM chat_sessions WHERE session_id = %s",
-        (sessionId,)
-    )
-    session_rec = await cursor.fetchone()
-    if not session_rec:
-        raise HTTPException(status_code=404, detail="Session not found")
+    # Baux courts : la connexion n'est tenue que pour les lectures (étapes 1 à 3) et la sauvegarde (6),
+    # jamais pendant la génération ni le titrage
+    pool = get_active_pool()
+    async with lease(pool) as db:
+        # 1. Personnalisation
+        profile = await get_user_profile(db=db,user_id=userId)
+        persona_block = build_personalization_block(profile)
+
+        # 2. Récupération Session & Check Historique
+        cursor = await db.execute(
+            "SELECT course_id, scope, section_index, subsection_index, video_id FROM chat_sessions WHERE session_id = %s",
+            (sessionId,)
+        )
+        session_rec = await cursor.fetchone()
+        if not session_rec:
+            raise HTTPException(status_code=404, detail="Session not found")
         
-    if isinstance(session_rec, tuple):
-        course_id, scope, sec_idx, sub_idx, vid_id = session_rec
-    else:
-        course_id, scope, sec_idx, sub_idx, vid_id = session_rec["course_id"], session_rec["scope"], session_rec["section_index"], session_rec["subsection_index"], session_rec["video_id"]
-
-    # Historique pour savoir si c'est la première interaction
-    msgs_cursor = await db.execute(
-        "SELECT sender, content FROM chat_messages WHERE session_id = %s ORDER BY created_at ASC",
-        (sessionId,)
-    )
-    history_rows = await msgs_cursor.fetchall()
-    is_first_interaction = (len(history_rows) == 0)
+        if isinstance(session_rec, tuple):
+            course_id, scope, sec_idx, sub_idx, vid_id = session_rec
+        else:
+            course_id, scope, sec_idx, sub_idx, vid_id = session_rec["course_id"], session_rec["scope"], session_rec["section_index"], session_rec["subsection_index"], session_rec["video_id"]
 
-    # 3. Construction du Contexte (Cours + Quiz + Fichiers)
-    try:
-        course_obj = await fetch_course_hierarchy(db, str(course_id))
-    except Exception as e:
-        print(f"Error fetching course: {e}")
-        raise HTTPException(status_code=500, detail="Failed to retrieve course structure")
+        # Historique pour savoir si c'est la première interaction
+        msgs_cursor = await db.execute(
+            "SELECT sender, content FROM chat_messages WHERE session_id = %s ORDER BY created_at ASC",
+            (sessionId,)
+        )
+        history_rows = await msgs_cursor.fetchall()
+        is_first_interaction = (len(history_rows) == 0)
 
-    context_text = extract_context_from_course(course_obj, scope, sec_idx, sub_idx, vid_id)
-    student_quiz_context = await get_student_quiz_context(db, str(course_id))
+        # 3. Construction du Contexte (Cours + Quiz + Fichiers)
+        try:
+            course_obj = await fetch_course_hierarchy(db, str(course_id))
+        except Exception as e:
+            print(f"Error fetching course: {e}")
+            raise HTTPException(status_code=500, detail="Failed to retrieve course structure")
 
-    # RAG (Fichiers Uploadés)
-    try:
-        uploaded_docs_context = await ingestion_service.retrieve_relevant_context(
-            session_id=sessionId,
-            db=db
-        )
-    except Exception as e:
-        print(f"RAG Error: {e}")
-        uploaded_docs_context = ""
+        context_text = extract_context_from_course(course_obj, scope, sec_idx, sub_idx, vid_id)
+        student_quiz_context = await get_student_quiz_context(db, str(course_id))
+
+        # RAG (Fichiers Uploadés)
+        try:
+            uploaded_docs_context = await ingestion_service.get().retrieve_relevant_context(
+                session_id=sessionId,
+                db=db
+            )
+        except Exception as e:
+            print(f"RAG Error: {e}")
+            uploaded_docs_context = ""
 
     # 4. Formatage Historique LangChain
     langchain_history = []
@@ -241,7 +267,7 @@ async def ask_question_in_the_global_chat_for_a_session(
             langchain_history.append(AIMessage(content=content))
 
     # 5. Génération LLM
-    chain = GLOBAL_CHAT_PROMPT | qa_llm
+    chain = GLOBAL_CHAT_PROMPT | qa_llm.get()
     
     try:
         ai_response = await chain.ainvoke({
@@ -258,42 +284,43 @@ async def ask_question_in_the_global_chat_for_a_session(
         print(f"LLM Error: {e}")
         raise HTTPException(status_code=500, detail="AI generation failed")
 
-    # 6. Sauvegarde & Renommage
+    # 6. Titre (appel LLM, avant d'emprunter la connexion) puis Sauvegarde & Renommage
+    new_title = None
+    if is_first_interaction:
+        try:
+            title_chain = GENERATE_SESSION_TITLE_PROMPT | title_llm.get()
+            title_response = await title_chain.ainvoke({"user_query": request.userQuery})
+            new_title = title_response.content.strip().replace('"', '')
+        except Exception as e:
+            print(f"Title Gen Warning: {e}")
+
     ai_message_id = str(uuid.uuid4()) # ID par défaut de sécurité
 
     try:
-        # Insertion avec RETURNING id pour récupérer l'ID généré
-        cursor = await db.execute(
-            """
-            INSERT INTO chat_messages (session_id, sender, content) 
-            VALUES (%s, 'user', %s), (%s, 'ai', %s)
-            RETURNING id
-            """,
-            (sessionId, request.userQuery, sessionId, answer_text)
-        )
-        
-        # On récupère les IDs. Le 2ème est celui de l'IA (ordre d'insertion)
-        inserted_ids = await cursor.fetchall()
-        if inserted_ids and len(inserted_ids) >= 2:
-            ai_message_id = str(inserted_ids[1][0])
+        async with lease(pool) as db:
+            # Insertion avec RETURNING id pour récupérer l'ID généré
+            cursor = await db.execute(
+                """
+                INSERT INTO chat_messages (session_id, sender, content) 
+                VALUES (%s, 'user', %s), (%s, 'ai', %s)
+                RETURNING id
+                """,
+                (sessionId, request.userQuery, sessionId, answer_text)
+            )
+            
+            # On récupère les IDs. Le 2ème est celui de l'IA (ordre d'insertion)
+            inserted_ids = await cursor.fetchall()
+            if inserted_ids and len(inserted_ids) >= 2:
+                ai_message_id = str(inserted_ids[1][0])
 
-        # Auto-Titling (Si première question)
-        if is_first_interaction:
-            try:
-                title_chain = GENERATE_SESSION_TITLE_PROMPT | qa_llm
-                title_response = await title_chain.ainvoke({"user_query": request.userQuery})
-                new_title = title_response.content.strip().replace('"', '')
-                
+            # Auto-Titling (Si première question)
+            if new_title:
                 await db.execute(
                     "UPDATE chat_sessions SET title = %s, updated_at = CURRENT_TIMESTAMP WHERE session_id = %s",
                     (new_title, sessionId)
                 )
-            except Exception as e:
-                print(f"Title Gen Warning: {e}")
-                # Fallback update date
+            else:
                 await db.execute("UPDATE chat_sessions SET updated_at = CURRENT_TIMESTAMP WHERE session_id = %s", (sessionId,))
-        else:
-            await db.execute("UPDATE chat_sessions SET updated_at = CURRENT_TIMESTAMP WHERE session_id = %s", (sessionId,))
 
     except Exception as e:
         print(f"DB Save Error: {e}")
@@ -387,6 +414,32 @@ async def delete_all_course_chat_sessions(
         print(f"Delete All Sessions Error: {e}")
         raise HTTPException(status_code=500, detail="Failed to delete sessions.")
 
+
+@global_chat_router.delete("/courses/{courseId}/answer-cache", response_model=DeleteResponse, summary="Invalidate cached chat answers of a course")
+async def invalidate_course_answer_cache(
+    courseId: str,
+    db: AsyncConnection = Depends(get_app_db_connection)
+):
+    """
+    **Removes every cached chat answer of a course.**\n
+    Cached answers are already ignored as soon as the course content of their scope changes;
+    call this after an edit that does not change that content (e.g. a transcript correction).\n
+    Args:\n
+        courseId (str): The UUID of the course.
+    returns:\n
+        DeleteResponse: Number of cached answers removed.
+    """
+    try:
+        count = await answer_cache.get().invalidate_course(db, courseId)
+        return DeleteResponse(
+            status="success",
+            deletedCount=count,
+            message=f"Successfully invalidated {count} cached answers for course {courseId}."
+        )
+    except Exception as e:
+        print(f"Answer Cache Invalidation Error: {e}")
+        raise HTTPException(status_code=500, detail="Failed to invalidate the answer cache.")
+
 #delete a message in an existing chat session.
 @global_chat_router.delete("/sessions/{sessionId}/messages/{messageId}", response_model=DeleteResponse)
 async def delete_a_message_in_a_session(
@@ -576,7 +629,6 @@ async def rename_chat_session_title(
         raise HTTPException(status_code=500, detail="Failed to rename session.")
 
  # Streaming Version of the Global Chat
-ingestion_service = FileIngestionService()
 stream_global_chat_router = APIRouter()
 @stream_global_chat_router.post("/stream-sessions/{sessionId}/ask")
 async def ask_in_session_stream(
@@ -591,15 +643,17 @@ async def ask_in_session_stream(
         request (ChatAskRequest): The user's text query.\\n
         userId (str): The unique UUID of the user (from header).\\n
     """
-    transcript_service = TranscriptService()
+    transcript_service = TranscriptService(priority="interactive")
     # 1. Récupération du Pool Global (Assurez-vous que l'app a démarré)
     try:
         pool = get_active_pool()
     except RuntimeError as e:
         raise HTTPException(status_code=500, detail="Database pool not initialized")
 
-    # --- PHASE 1 : PRÉPARATION (Lecture avec connexion temporaire) ---
-    async with pool.connection() as conn:
+    # --- PHASE 1 : PRÉPARATION ---
+    # Baux courts : la connexion est rendue au pool avant chaque appel externe
+    # (embeddings, ingestion du transcript), puis ré-empruntée pour la lecture suivante.
+    async with lease(pool) as conn:
         async with conn.cursor() as cur:
             
             # Profil: Vérification Session & Profil
@@ -643,47 +697,76 @@ async def ask_in_session_stream(
                 (sessionId, request.userQuery)
             )
 
-            # Contextes
+    # Contextes
+    cached_answer = None
+    cache_eligible = False
+    try:
+        async with lease(pool) as conn:
+            course_obj = await fetch_course_hierarchy(conn, str(course_id))
+            context_text = extract_context_from_course(course_obj, scope, sec_idx, sub_idx, vid_id)
+            student_quiz_context = await get_student_quiz_context(conn, str(course_id))
+
+            # Cache sémantique : uniquement pour une question autonome (1er message, aucun upload privé)
+            if CHAT_SEMANTIC_CACHE_ENABLED and is_first_interaction:
+                try:
+                    cache_eligible = not await answer_cache.get().session_has_uploads(conn, sessionId)
+                except Exception as e:
+                    print(f"Semantic Cache Warning: {e}")
+
+        if cache_eligible:
             try:
-                course_obj = await fetch_course_hierarchy(conn, str(course_id))
-                context_text = extract_context_from_course(course_obj, scope, sec_idx, sub_idx, vid_id)
-                student_quiz_context = await get_student_quiz_context(conn, str(course_id))
-                uploaded_docs_context = await ingestion_service.retrieve_hybrid_context(
-                    session_id=sessionId, 
-                    query=request.userQuery,
-                    db=conn,
-                    limit=5
+                cache_scope_key = build_scope_key(scope, sec_idx, sub_idx, vid_id, request.currentSubsectionId)
+                cache_content_version = compute_course_version(context_text)
+                cache_version = compute_course_version(
+                    context_text, persona_block=persona_block, student_quiz_context=student_quiz_context
                 )
-                transcript_context = ""
-                # Si le frontend nous indique sur quelle vidéo l'utilisateur se trouve
-                if request.currentSubsectionId:
-                    try:
-                        # A. Sécurité / Fallback
-                        # Si le préchauffage n'a pas fini, on force l'attente ici (Fast-fail)
-                        # C'est rapide si c'est déjà fait grâce au cache SQL interne du service
-                        await transcript_service.ingest_transcript_if_needed(conn, request.currentSubsectionId)
-                        
-                        # B. Récupération sémantique (RAG)
-                        # On récupère le résumé + les passages liés à la question
-                        transcript_context = await transcript_service.retrieve_context(
-                            db=conn,
-                            subsection_id=request.currentSubsectionId,
-                            user_query=request.userQuery,
-                            limit=3
-                        )
-                        print(f"--- [Chat] Injected context for video {request.currentSubsectionId} ---")
-                        
-                    except Exception as e:
-                        print(f"Transcript Dynamic Retrieval Error: {e}")
-
+                query_vector = await answer_cache.get().embed(request.userQuery)
+                async with lease(pool) as conn:
+                    hit = await answer_cache.get().lookup(conn, str(course_id), cache_scope_key, profile.language, cache_version, query_vector)
+                if hit:
+                    cached_answer = hit[1]
+                    print(f"--- [Chat] Semantic cache hit (similarity {hit[2]:.3f}) ---")
+            except Exception as e:
+                print(f"Semantic Cache Warning: {e}")
+                cache_eligible = False
+
+        uploaded_docs_context = "" if cached_answer else await ingestion_service.get().retrieve_hybrid_context(
+            session_id=sessionId, 
+            query=request.userQuery,
+            db=pool,
+            limit=5
+        )
+        transcript_context = ""
+        # Si le frontend nous indique sur quelle vidéo l'utilisateur se trouve
+        if request.currentSubsectionId and not cached_answer:
+            try:
+                # A. Sécurité / Fallback
+                # Si le préchauffage n'a pas fini, on force l'attente ici (Fast-fail)
+                # C'est rapide si c'est déjà fait grâce au cache SQL interne du service
+                await transcript_service.ingest_transcript_if_needed(pool, request.currentSubsectionId)
+                
+                # B. Récupération sémantique (RAG)
+                # On récupère le résumé + les passages liés à la question
+                transcript_context = await transcript_service.retrieve_context(
+                    db=pool,
+                    subsection_id=request.currentSubsectionId,
+                    user_query=request.userQuery,
+                    limit=3
+                )
+                print(f"--- [Chat] Injected context for video {request.currentSubsectionId} ---")
+                
             except Exception as e:
-                print(f"Context Warning: {e}")
-                context_text = ""
-                student_quiz_context = ""
-                uploaded_docs_context = ""
+                print(f"Transcript Dynamic Retrieval Error: {e}")
+
+    except Exception as e:
+        print(f"Context Warning: {e}")
+        context_text = ""
+        student_quiz_context = ""
+        uploaded_docs_context = ""
+        transcript_context = ""
 
     # --- PHASE 2 : INPUTS LLM ---
-    chain = GLOBAL_CHAT_PROMPT | qa_llm
+    chain = GLOBAL_CHAT_PROMPT | qa_llm.get()
     
     chain_inputs = {
         "student_quiz_context": student_quiz_context,
@@ -701,36 +784,56 @@ async def ask_in_session_stream(
     async def global_chat_generator():
         full_answer_text = ""
         try:
-            # A. Streaming
-            async for chunk in chain.astream(chain_inputs):
-                content = chunk.content
-                if content:
+            # A. Streaming (réponse en cache rejouée, ou génération LLM)
+            if cached_answer:
+                async for content in SemanticAnswerCache.stream_cached(cached_answer):
                     full_answer_text += content
                     yield f"data: {json.dumps({'type': 'token', 'content': content})}\n\n"
+            else:
+                async for chunk in chain.astream(chain_inputs):
+                    content = chunk.content
+                    if content:
+                        full_answer_text += content
+                        yield f"data: {json.dumps({'type': 'token', 'content': content})}\n\n"
             
-            # B. Sauvegarde (On réutilise le pool capturé au début)
-            async with pool.connection() as conn_save:
+            # B. Titre de session (appel LLM, avant d'emprunter la connexion de sauvegarde)
+            new_title = None
+            if is_first_interaction:
+                try:
+                    title_chain = GENERATE_SESSION_TITLE_PROMPT | title_llm.get()
+                    title_resp = await title_chain.ainvoke({"user_query": request.userQuery})
+                    new_title = title_resp.content.strip().replace('"', '')
+                except Exception as e:
+                    print(f"Title Gen Error: {e}")
+
+            # C. Sauvegarde (On réutilise le pool capturé au début)
+            async with lease(pool) as conn_save:
                 async with conn_save.cursor() as cur_save:
                     # Insert AI Messages after generation
                     await cur_save.execute(
                         "INSERT INTO chat_messages (session_id, sender, content) VALUES (%s, 'ai', %s)",
                         (sessionId, full_answer_text)
                     )
-                    
-                    # Auto Title
-                    if is_first_interaction:
+
+                    # Nouvelle réponse éligible : on l'ajoute au cache sémantique
+                    if cache_eligible and not cached_answer and full_answer_text:
                         try:
-                            title_chain = GENERATE_SESSION_TITLE_PROMPT | qa_llm
-                            title_resp = await title_chain.ainvoke({"user_query": request.userQuery})
-                            new_title = title_resp.content.strip().replace('"', '')
-                            await cur_save.execute("UPDATE chat_sessions SET title = %s WHERE session_id = %s", (new_title, sessionId))
+                            await answer_cache.get().store(
+                                conn_save, str(course_id), cache_scope_key, profile.language,
+                                cache_version, request.userQuery, query_vector, full_answer_text,
+                                content_version=cache_content_version
+                            )
                         except Exception as e:
-                            print(f"Title Gen Error: {e}")
+                            print(f"Semantic Cache Store Error: {e}")
+                    
+                    # Auto Title
+                    if new_title:
+                        await cur_save.execute("UPDATE chat_sessions SET title = %s WHERE session_id = %s", (new_title, sessionId))
                     
                     # Update Timestamp
                     await cur_save.execute("UPDATE chat_sessions SET updated_at = CURRENT_TIMESTAMP WHERE session_id = %s", (sessionId,))
             
-            # C. Fin
+            # D. Fin
             yield f"data: {json.dumps({'type': 'end', 'status': 'completed'})}\n\n"
 
         except Exception as e:
@@ -742,6 +845,7 @@ async def ask_in_session_stream(
 @global_chat_router.post("/subsections/{subsectionId}/prepare_transcripts", status_code=202, summary="Pre-heat Video Context")
 async def prepare_video_context(
     subsectionId: str,
+    x_gemini_api_key: Optional[str] = Header(None, alias="X-gemini-Api-Key"),
     db: AsyncConnection = Depends(get_app_db_connection)
 ):
     """
@@ -759,10 +863,10 @@ async def prepare_video_context(
         if exists:
             return {"status": "ready", "message": "Context already available"}
         
-        # 2. Si pas prêt, on lance Celery (Non-bloquant)
-        ingest_transcript_by_id_task.delay(subsectionId)
-        
-        return {"status": "ingestion_started", "message": "Background processing started"}
+        # 2. Si pas prêt, on lance Celery (Non-bloquant), en tête de file et sans doublon
+        if await enqueue_subsection_ingestion(subsectionId, gemini_api_key=x_gemini_api_key):
+            return {"status": "ingestion_started", "message": "Background processing started"}
+        return {"status": "ingestion_queued", "message": "Background processing already queued"}
         
     except Exception as e:
         # On ne veut pas casser la navigation frontend si ça échoue, on log juste
@@ -770,6 +874,55 @@ async def prepare_video_context(
         return {"status": "error", "message": str(e)}
 
 
+@global_chat_router.post("/courses/{courseId}/prepare_transcripts", response_model=CoursePrewarmResponse, status_code=202, summary="Pre-heat all videos of a course")
+async def prepare_course_context(
+    courseId: str,
+    request: CoursePrewarmRequest = CoursePrewarmRequest(),
+    x_gemini_api_key: Optional[str] = Header(None, alias="X-gemini-Api-Key"),
+    db: AsyncConnection = Depends(get_app_db_connection)
+):
+    """
+        Queues the transcript ingestion of every video of the course.\n
+        Videos close to the learner's current position are processed first, already prepared or already queued videos are skipped.\n
+        Call it when the learner opens a course (and again when they jump far ahead).\n
+
+        args:\n
+            courseId (str): The unique UUID of the course.\n
+            currentSubsectionId (str, optional): The video the learner is currently on.
+    """
+    try:
+        result = await schedule_course_prewarm(
+            db, courseId,
+            current_subsection_id=request.currentSubsectionId,
+            gemini_api_key=x_gemini_api_key
+        )
+    except Exception as e:
+        print(f"Course Pre-heat Error: {e}")
+        raise HTTPException(status_code=500, detail="Could not schedule course preparation.")
+
+    return CoursePrewarmResponse(
+        courseId=courseId,
+        status="ingestion_started" if result["queued"] else "nothing_to_queue",
+        total=result["total"],
+        queued=result["queued"],
+        alreadyQueued=result["already_queued"],
+        ready=result["ready"],
+        unavailable=result["unavailable"]
+    )
+
+
+@global_chat_router.get("/courses/{courseId}/prepare_transcripts", response_model=CoursePrewarmProgress, summary="Course pre-heat progress")
+async def get_course_context_progress(
+    courseId: str,
+    db: AsyncConnection = Depends(get_app_db_connection)
+):
+    """
+        Returns the preparation status of every video of the course (ready / queued / pending / unavailable).
+    """
+    progress = await get_course_prewarm_progress(db, courseId)
+    return CoursePrewarmProgress(courseId=courseId, **progress)
+
+
 @global_chat_router.get("/subsections/{subsectionId}/transcript", response_model=TranscriptResponse)
 async def get_subsection_transcript(
     subsectionId: str,
@@ -841,14 +994,12 @@ async def get_subsection_transcript(
         raise HTTPException(status_code=500, detail="Internal error fetching transcript.")
 
 # Upload files on a session chat
-ingestion_service = FileIngestionService()
 upload_file_router = APIRouter()
 
 @upload_file_router.post("/sessions/{sessionId}/upload", response_model=FileUploadResponse)
 async def upload_file_to_session_chat(
     sessionId: str,
     file: UploadFile = File(...),
-    db: AsyncConnection = Depends(get_app_db_connection)
 ):
     """
         Ingest a document into the session context using Hybrid RAG strategy. \n
@@ -861,10 +1012,14 @@ async def upload_file_to_session_chat(
         returns: \n
             FileUploadResponse: Metadata about the uploaded file and processing status.
     """
+    # Pas de connexion tenue pendant l'upload Azure, l'extraction et les embeddings : baux courts
+    pool = get_active_pool()
+
     # Check Session
-    cursor = await db.execute("SELECT 1 FROM chat_sessions WHERE session_id = %s", (sessionId,))
-    if not await cursor.fetchone():
-        raise HTTPException(status_code=404, detail="Session not found")
+    async with lease(pool) as db:
+        cursor = await db.execute("SELECT 1 FROM chat_sessions WHERE session_id = %s", (sessionId,))
+        if not await cursor.fetchone():
+            raise HTTPException(status_code=404, detail="Session not found")
 
     file_bytes = await file.read()
     
@@ -873,20 +1028,21 @@ async def upload_file_to_session_chat(
         raise HTTPException(status_code=413, detail="File too large (Max 10MB)")
 
     try:
-        result = await ingestion_service.process_file(
+        result = await ingestion_service.get().process_file(
             session_id=sessionId,
             filename=file.filename,
             file_bytes=file_bytes,
             file_type=file.content_type,
-            db=db
+            db=pool
         )
         
         # Notification système dans le chat
         sys_msg = f"Summary: {result['summary']}"
-        await db.execute(
-            "INSERT INTO chat_messages (session_id, sender, content) VALUES (%s, 'system', %s)",
-            (sessionId, sys_msg)
-        )
+        async with lease(pool) as db:
+            await db.execute(
+                "INSERT INTO chat_messages (session_id, sender, content) VALUES (%s, 'system', %s)",
+                (sessionId, sys_msg)
+            )
         
         return FileUploadResponse(
             fileId=result["file_id"],
@@ -900,7 +1056,6 @@ async def upload_file_to_session_chat(
         raise HTTPException(status_code=500, detail=f"Processing failed: {str(e)}")
 
 # --- 2. LIST (GET) ---
-azure_service = AzureStorageService()
 @upload_file_router.get("/sessions/{sessionId}/files", response_model=List[FileMetadataResponse])
 async def get_session_files(
     sessionId: str,
@@ -932,7 +1087,7 @@ async def get_session_files(
                  f_id, f_name, f_type, f_sum, f_size, f_date, f_path = row['id'], row['filename'], row['file_type'], row['summary'], row['file_size'], row['uploaded_at'], row['storage_path']
 
             # Génération de l'URL SAS à la volée
-            sas_url = azure_service.generate_sas_url(f_path) if f_path else None
+            sas_url = azure_service.get().generate_sas_url(f_path) if f_path else None
 
             files.append(FileMetadataResponse(
                 fileId=str(f_id), 
@@ -973,7 +1128,7 @@ async def get_file_content(
     storage_path = row[2] if isinstance(row, tuple) else row['storage_path']
 
     # Génération URL SAS
-    sas_url = azure_service.generate_sas_url(storage_path) if storage_path else None
+    sas_url = azure_service.get().generate_sas_url(storage_path) if storage_path else None
 
     
     return FileContentResponse(
@@ -0,0 +1,179 @@
+import os
+import asyncio
+import hashlib
+from typing import List, Optional, Tuple
+from psycopg.connection_async import AsyncConnection
+from src.cleeroute.langGraph.learners_api.utils import get_embedding_model
+from src.cleeroute.metrics import record_cache
+
+# Opt-in : désactivé par défaut
+CHAT_SEMANTIC_CACHE_ENABLED = os.getenv("CHAT_SEMANTIC_CACHE_ENABLED", "false").lower() == "true"
+# Similarité cosinus minimale (1 - distance) pour considérer deux questions comme identiques
+CHAT_SEMANTIC_CACHE_THRESHOLD = float(os.getenv("CHAT_SEMANTIC_CACHE_THRESHOLD", 0.93))
+CHAT_SEMANTIC_CACHE_TTL_DAYS = int(os.getenv("CHAT_SEMANTIC_CACHE_TTL_DAYS", 30))
+# Découpage de la réponse en cache pour garder le rendu "streaming" côté frontend
+CACHED_ANSWER_CHUNK_CHARS = 48
+
+
+def build_scope_key(scope: str, sec_idx, sub_idx, vid_id, current_subsection_id: Optional[str]) -> str:
+    return f"{scope}:{sec_idx}:{sub_idx}:{vid_id}:{current_subsection_id or ''}"
+
+
+def compute_course_version(context_text: str, persona_block: str = "", student_quiz_context: str = "") -> str:
+    """
+    Version du contenu vu par la réponse : si le cours (dans ce scope) change,
+    la version change et les anciennes réponses ne matchent plus.
+    Le profil (persona) et les résultats de quiz de l'apprenant entrent aussi dans le prompt :
+    une réponse personnalisée n'est resservie qu'à un apprenant ayant le même profil et les mêmes résultats.
+    Sans persona ni quiz : version du seul contenu du cours (utilisée pour purger les anciennes versions).
+    """
+    raw = "\x00".join([context_text, persona_block or "", student_quiz_context or ""])
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:32]
+
+
+def chunk_answer(text: str, size: int = CACHED_ANSWER_CHUNK_CHARS) -> List[str]:
+    """Découpe sur les espaces (jamais au milieu d'un mot ou d'un caractère multi-octets)."""
+    chunks, current = [], ""
+    for word in text.split(" "):
+        candidate = f"{current} {word}" if current else word
+        if len(candidate) > size and current:
+            chunks.append(current + " ")
+            current = word
+        else:
+            current = candidate
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+class SemanticAnswerCache:
+    """
+    Cache sémantique des réponses du chat global, par cours + scope + langue.
+    Seules les questions "autonomes" sont éligibles : première question de la session,
+    sans document privé uploadé (la réponse ne doit dépendre que du contenu du cours).
+    """
+    _schema_ready = False
+
+    def __init__(self):
+        self.embeddings = get_embedding_model(api_key=os.getenv("GEMINI_API_KEY"))
+
+    async def ensure_schema(self, db: AsyncConnection):
+        if SemanticAnswerCache._schema_ready:
+            return
+
+        await db.execute(
+            """
+            CREATE TABLE IF NOT EXISTS chat_answer_cache (
+                id BIGSERIAL PRIMARY KEY,
+                course_id TEXT NOT NULL,
+                scope_key TEXT NOT NULL,
+                language TEXT NOT NULL,
+                course_version TEXT NOT NULL,
+                query_text TEXT NOT NULL,
+                answer_text TEXT NOT NULL,
+                embedding vector NOT NULL,
+                hit_count INTEGER NOT NULL DEFAULT 0,
+                created_at TIMESTAMPTZ NOT NULL DEFAULT CURRENT_TIMESTAMP
+            )
+            """
+        )
+        await db.execute(
+            "CREATE INDEX IF NOT EXISTS idx_chat_answer_cache_scope ON chat_answer_cache (course_id, scope_key, language)"
+        )
+        # Version du seul contenu du cours (course_version inclut aussi le profil de l'apprenant)
+        await db.execute("ALTER TABLE chat_answer_cache ADD COLUMN IF NOT EXISTS content_version TEXT")
+        await db.execute("CREATE INDEX IF NOT EXISTS idx_chat_answer_cache_created ON chat_answer_cache (created_at)")
+        SemanticAnswerCache._schema_ready = True
+
+    async def session_has_uploads(self, db: AsyncConnection, session_id: str) -> bool:
+        cursor = await db.execute("SELECT 1 FROM knowledge_files WHERE session_id = %s LIMIT 1", (session_id,))
+        return (await cursor.fetchone()) is not None
+
+    async def embed(self, query: str) -> List[float]:
+        return await self.embeddings.aembed_query(query)
+
+    async def lookup(
+        self,
+        db: AsyncConnection,
+        course_id: str,
+        scope_key: str,
+        language: str,
+        course_version: str,
+        query_vector: List[float]
+    ) -> Optional[Tuple[int, str, float]]:
+        """Meilleure réponse au-dessus du seuil : (id, answer_text, similarity) ou None."""
+        await self.ensure_schema(db)
+        cursor = await db.execute(
+            """
+            SELECT id, answer_text, 1 - (embedding <=> %s) AS similarity
+            FROM chat_answer_cache
+            WHERE course_id = %s AND scope_key = %s AND language = %s AND course_version = %s
+              AND created_at > CURRENT_TIMESTAMP - make_interval(days => %s)
+            ORDER BY embedding <=> %s
+            LIMIT 1
+            """,
+            (str(query_vector), course_id, scope_key, language, course_version,
+             CHAT_SEMANTIC_CACHE_TTL_DAYS, str(query_vector))
+        )
+        row = await cursor.fetchone()
+        if not row:
+            record_cache("chat_answer", False)
+            return None
+
+        entry_id, answer, similarity = (row[0], row[1], row[2]) if isinstance(row, tuple) else (row['id'], row['answer_text'], row['similarity'])
+        if similarity < CHAT_SEMANTIC_CACHE_THRESHOLD:
+            record_cache("chat_answer", False)
+            return None
+
+        await db.execute("UPDATE chat_answer_cache SET hit_count = hit_count + 1 WHERE id = %s", (entry_id,))
+        record_cache("chat_answer", True)
+        return entry_id, answer, float(similarity)
+
+    async def store(
+        self,
+        db: AsyncConnection,
+        course_id: str,
+        scope_key: str,
+        language: str,
+        course_version: str,
+        query_text: str,
+        query_vector: List[float],
+        answer_text: str,
+        content_version: Optional[str] = None
+    ):
+        await self.ensure_schema(db)
+        # Purge au passage : réponses expirées (tous scopes) et, dans ce scope, celles d'une ancienne
+        # version du cours (jamais resservies). Les autres profils d'apprenants du même contenu sont gardés.
+        await db.execute(
+            """
+            DELETE FROM chat_answer_cache
+            WHERE created_at <= CURRENT_TIMESTAMP - make_interval(days => %s)
+               OR (course_id = %s AND scope_key = %s AND content_version IS DISTINCT FROM %s)
+            """,
+            (CHAT_SEMANTIC_CACHE_TTL_DAYS, course_id, scope_key, content_version or course_version)
+        )
+        await db.execute(
+            """
+            INSERT INTO chat_answer_cache (course_id, scope_key, language, course_version, content_version, query_text, answer_text, embedding)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+            """,
+            (course_id, scope_key, language, course_version, content_version or course_version, query_text, answer_text, str(query_vector))
+        )
+
+    async def invalidate_course(self, db: AsyncConnection, course_id: str) -> int:
+        await self.ensure_schema(db)
+        cursor = await db.execute("DELETE FROM chat_answer_cache WHERE course_id = %s", (course_id,))
+        return cursor.rowcount
+
+    async def invalidate_subsection(self, db: AsyncConnection, subsection_id: str) -> int:
+        """Réponses données pendant la lecture de cette vidéo (le transcript a changé)."""
+        await self.ensure_schema(db)
+        cursor = await db.execute("DELETE FROM chat_answer_cache WHERE scope_key LIKE %s", (f"%:{subsection_id}",))
+        return cursor.rowcount
+
+    @staticmethod
+    async def stream_cached(answer: str):
+        """Rejoue la réponse en petits morceaux (même protocole SSE que le streaming LLM)."""
+        for chunk in chunk_answer(answer):
+            yield chunk
+            await asyncio.sleep(0)
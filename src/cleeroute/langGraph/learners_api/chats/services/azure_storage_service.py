@@ -3,6 +3,7 @@ import uuid
 from datetime import datetime, timedelta
 from azure.storage.blob.aio import BlobServiceClient
 from azure.storage.blob import generate_blob_sas, BlobSasPermissions, ContentSettings
+from src.cleeroute.metrics import track
 
 class AzureStorageService:
     def __init__(self):
@@ -12,6 +13,7 @@ class AzureStorageService:
         if not self.connection_string or not self.container_name:
             raise ValueError("Azure Storage configuration missing.")
 
+    @track("azure_upload", "upload_blob")
     async def upload_file(self, file_bytes: bytes, filename: str, session_id: str, content_type: str) -> str:
         """
             Upload the file and return its internal path (blob_name).
@@ -0,0 +1,252 @@
+import os
+import asyncio
+from typing import List, Dict, Optional, Set
+from psycopg.connection_async import AsyncConnection
+from src.cleeroute.langGraph.learners_api.utils import get_embedding_model, get_llm
+from src.cleeroute.langGraph.learners_api.chats.prompts import CONDENSE_SECTION_DIGEST_PROMPT
+from src.cleeroute.db.lease import DbSource, lease
+
+# Approximation grossière utilisée pour les budgets (Gemini ~ 4 caractères / token)
+CHARS_PER_TOKEN = 4
+# Taille max d'un digest de section (au-delà on coupe, même si le LLM est bavard)
+SECTION_DIGEST_MAX_CHARS = int(os.getenv("SECTION_DIGEST_MAX_CHARS", 1500))
+# Priorité Celery de la reconstruction d'un digest (0 = premier, 9 = dernier) : après les vidéos proches de l'apprenant
+SECTION_DIGEST_TASK_PRIORITY = int(os.getenv("SECTION_DIGEST_TASK_PRIORITY", 7))
+
+# Reconstructions lancées dans ce process quand le broker est injoignable (références gardées jusqu'à la fin)
+_local_refreshes: Set[asyncio.Task] = set()
+
+
+class CourseDigestService:
+    """
+    Digest matérialisé par cours :
+        - un résumé condensé par section (table `course_section_digests`),
+        - l'index vectoriel des chunks de transcripts (table `transcript_chunks`, déjà alimentée).
+
+    Le digest d'une section est reconstruit à chaque ingestion d'un transcript de cette section,
+    ce qui évite de recoller tous les résumés du cours à chaque démarrage de quiz.
+    """
+
+    _schema_ready = False
+
+    def __init__(self):
+        self.embeddings = get_embedding_model(api_key=os.getenv("GEMINI_API_KEY"))
+        self.llm = get_llm(api_key=os.getenv("GEMINI_API_KEY"), priority="background")
+
+    async def ensure_schema(self, db: AsyncConnection):
+        """Crée la table du digest (idempotent, une seule fois par process)."""
+        if CourseDigestService._schema_ready:
+            return
+
+        await db.execute(
+            """
+            CREATE TABLE IF NOT EXISTS course_section_digests (
+                section_id TEXT PRIMARY KEY,
+                course_id TEXT NOT NULL,
+                section_title TEXT,
+                position INTEGER,
+                digest_text TEXT NOT NULL,
+                source_count INTEGER NOT NULL DEFAULT 0,
+                updated_at TIMESTAMPTZ NOT NULL DEFAULT CURRENT_TIMESTAMP
+            )
+            """
+        )
+        await db.execute(
+            "CREATE INDEX IF NOT EXISTS idx_course_section_digests_course ON course_section_digests (course_id)"
+        )
+        # L'index ANN de transcript_chunks est construit par une migration (db/migrations.py, transcript_chunks_hnsw) :
+        # sur une grosse table, la construction bloquerait les écritures pendant toute sa durée
+
+        CourseDigestService._schema_ready = True
+
+    # ------------------------------------------------------------------
+    # CONSTRUCTION (incrémentale)
+    # ------------------------------------------------------------------
+
+    def _condense_extractive(self, rows: List[tuple]) -> str:
+        """Fallback sans LLM : première ligne utile de chaque résumé, sans timestamps."""
+        lines = []
+        for vid_title, summary in rows:
+            first_topic = ""
+            for line in (summary or "").splitlines():
+                line = line.strip().lstrip("-").strip()
+                if line and line != "Summary unavailable.":
+                    # On retire le tag [MM:SS] s'il est présent
+                    if line.startswith("[") and "]" in line:
+                        line = line.split("]", 1)[1].strip()
+                    first_topic = line
+                    break
+            if first_topic:
+                lines.append(f"- {vid_title}: {first_topic}")
+            else:
+                lines.append(f"- {vid_title}")
+        return "\n".join(lines)
+
+    async def rebuild_section(self, db: DbSource, section_id: str):
+        """
+        Recalcule le digest d'UNE section à partir des résumés vidéo disponibles.
+        `db` (pool ou connexion) est emprunté pour la lecture puis pour l'écriture, pas pendant la condensation LLM.
+        """
+        async with lease(db) as conn:
+            await self.ensure_schema(conn)
+
+            cursor = await conn.execute(
+                """
+                SELECT sec.course_id, sec.title, sec.position, sub.title, ts.summary_text
+                FROM section sec
+                JOIN subsection sub ON sub.section_id = sec.id
+                JOIN transcript_summaries ts ON ts.subsection_id = sub.id
+                WHERE sec.id = %s
+                ORDER BY sub.position
+                """,
+                (section_id,)
+            )
+            rows = await cursor.fetchall()
+        if not rows:
+            return
+
+        # Gestion Tuple vs Dict
+        if isinstance(rows[0], tuple):
+            course_id, section_title, position = rows[0][0], rows[0][1], rows[0][2]
+            videos = [(r[3], r[4]) for r in rows]
+        else:
+            course_id, section_title, position = rows[0]['course_id'], rows[0]['title'], rows[0]['position']
+            videos = [(r['title'], r['summary_text']) for r in rows]
+
+        input_text = "\n".join([f"Video '{title}':\n{summary}" for title, summary in videos])
+
+        chain = CONDENSE_SECTION_DIGEST_PROMPT | self.llm
+        try:
+            res = await chain.ainvoke({"section_title": section_title, "input_text": input_text})
+            digest_text = (res.content or "").strip() or self._condense_extractive(videos)
+        except Exception as e:
+            print(f"[DIGEST] LLM condensation failed for section {section_id}: {e}")
+            digest_text = self._condense_extractive(videos)
+
+        digest_text = digest_text[:SECTION_DIGEST_MAX_CHARS]
+
+        async with lease(db) as conn:
+            await conn.execute(
+                """
+                INSERT INTO course_section_digests (section_id, course_id, section_title, position, digest_text, source_count, updated_at)
+                VALUES (%s, %s, %s, %s, %s, %s, CURRENT_TIMESTAMP)
+                ON CONFLICT (section_id) DO UPDATE SET
+                    course_id = EXCLUDED.course_id,
+                    section_title = EXCLUDED.section_title,
+                    position = EXCLUDED.position,
+                    digest_text = EXCLUDED.digest_text,
+                    source_count = EXCLUDED.source_count,
+                    updated_at = CURRENT_TIMESTAMP
+                """,
+                (str(section_id), str(course_id), section_title, position, digest_text, len(videos))
+            )
+        print(f"[DIGEST] Section {section_id} rebuilt ({len(videos)} video summaries)")
+
+    async def refresh_for_subsection(self, db: DbSource, subsection_id: str):
+        """Hook appelé après l'ingestion d'un transcript : ne reconstruit que la section concernée."""
+        async with lease(db) as conn:
+            cursor = await conn.execute("SELECT section_id FROM subsection WHERE id = %s", (subsection_id,))
+            row = await cursor.fetchone()
+        if not row:
+            return
+        section_id = row[0] if isinstance(row, tuple) else row['section_id']
+        await self.rebuild_section(db, section_id)
+
+    # ------------------------------------------------------------------
+    # LECTURE
+    # ------------------------------------------------------------------
+
+    async def get_course_digest(self, db: AsyncConnection, course_id: str) -> List[Dict]:
+        """Retourne les digests de section du cours, dans l'ordre du programme."""
+        await self.ensure_schema(db)
+
+        cursor = await db.execute(
+            """
+            SELECT section_id, section_title, digest_text
+            FROM course_section_digests
+            WHERE course_id = %s
+            ORDER BY position
+            """,
+            (str(course_id),)
+        )
+        rows = await cursor.fetchall()
+        digests = []
+        for row in rows:
+            if isinstance(row, tuple):
+                digests.append({"section_id": row[0], "section_title": row[1], "digest_text": row[2]})
+            else:
+                digests.append(dict(row))
+        return digests
+
+    async def search_chunks(
+        self,
+        db: DbSource,
+        course_id: str,
+        query: str,
+        section_id: Optional[str] = None,
+        subsection_id: Optional[str] = None,
+        top_k: int = 8
+    ) -> List[Dict]:
+        """
+        Top-k des chunks de transcripts les plus proches de la requête, restreint au scope :
+        subsection > section > cours entier.
+        La requête est vectorisée avant d'emprunter la connexion.
+        """
+        query_vector = await self.embeddings.aembed_query(query)
+
+        if subsection_id:
+            scope_filter, scope_param = "tc.subsection_id = %s", subsection_id
+        elif section_id:
+            scope_filter, scope_param = "sub.section_id = %s", section_id
+        else:
+            scope_filter, scope_param = "sec.course_id = %s", course_id
+
+        async with lease(db) as conn:
+            cursor = await conn.execute(
+                f"""
+                SELECT sub.title, tc.content
+                FROM transcript_chunks tc
+                JOIN subsection sub ON tc.subsection_id = sub.id
+                JOIN section sec ON sub.section_id = sec.id
+                WHERE {scope_filter}
+                ORDER BY tc.embedding <=> %s
+                LIMIT %s
+                """,
+                (scope_param, str(query_vector), top_k)
+            )
+            rows = await cursor.fetchall()
+        return [
+            {"video_title": r[0], "content": r[1]} if isinstance(r, tuple)
+            else {"video_title": r['title'], "content": r['content']}
+            for r in rows
+        ]
+
+
+async def schedule_section_refresh(subsection_id: str):
+    """
+    Reconstruction du digest de la section en tâche de fond (Celery, priorité basse) après une ingestion :
+    la condensation LLM ne se fait ni sur le chemin de la requête ni sous le verrou d'ingestion.
+    Broker injoignable : la reconstruction est lancée dans ce process, sans être attendue.
+    """
+    # Import local : tasks -> ytbe_transcripts -> course_digest
+    from src.cleeroute.langGraph.learners_api.chats.services.tasks import refresh_section_digest_task
+
+    try:
+        # apply_async est bloquant (écriture sur le broker) : hors de la boucle, un Redis lent ne la fige pas
+        await asyncio.to_thread(
+            refresh_section_digest_task.apply_async,
+            args=[str(subsection_id)], priority=SECTION_DIGEST_TASK_PRIORITY
+        )
+        return
+    except Exception as e:
+        print(f"[DIGEST] Could not enqueue digest refresh for {subsection_id} ({e}), refreshing in-process")
+
+    async def refresh():
+        try:
+            await CourseDigestService().refresh_for_subsection(None, subsection_id)
+        except Exception as e:
+            print(f"Course digest refresh error: {e}")
+
+    task = asyncio.get_running_loop().create_task(refresh())
+    _local_refreshes.add(task)
+    task.add_done_callback(_local_refreshes.discard)
@@ -2,7 +2,8 @@ import io
 import os
 import uuid
 import base64
-from typing import Dict, Any
+import hashlib
+from typing import Dict, Any, Optional
 
 # Libraries d'extraction
 import pdfplumber
@@ -17,6 +18,9 @@ from langchain_text_splitters import RecursiveCharacterTextSplitter
 from src.cleeroute.langGraph.learners_api.utils import get_vision_model, get_embedding_model
 
 from src.cleeroute.langGraph.learners_api.chats.services.azure_storage_service import AzureStorageService
+from src.cleeroute.db.single_flight import single_flight
+from src.cleeroute.db.lease import lease
+from psycopg import AsyncConnection
 
 VISION_MODEL = os.getenv("MODEL")
 EMBEDDING_MODEL = "models/text-embedding-004"
@@ -25,7 +29,7 @@ EMBEDDING_MODEL = "models/text-embedding-004"
 class FileIngestionService:
     def __init__(self):
         # On utilise un modèle rapide et peu coûteux
-        self.llm = get_vision_model()
+        self.llm = get_vision_model(priority="interactive")
         self.embeddings = get_embedding_model()
         self.azure_service = AzureStorageService()
 
@@ -107,14 +111,59 @@ class FileIngestionService:
         except:
             return "Summary unavailable."
 
+    async def _find_existing_file(self, session_id: str, content_hash: str, db) -> Optional[Dict[str, Any]]:
+        """
+        Retrouve un fichier au contenu identique (SHA-256) déjà ingéré dans la session (double envoi, retry client...).
+        Les fichiers ingérés avant la colonne content_hash (NULL) ne sont jamais considérés comme doublons.
+        """
+        async with lease(db) as conn:
+            cursor = await conn.execute(
+                """
+                SELECT kf.id, kf.filename, kf.summary, (SELECT COUNT(*) FROM knowledge_chunks kc WHERE kc.file_id = kf.id)
+                FROM knowledge_files kf
+                WHERE kf.session_id = %s AND kf.content_hash = %s
+                LIMIT 1
+                """,
+                (session_id, content_hash)
+            )
+            row = await cursor.fetchone()
+        if not row:
+            return None
+        if isinstance(row, tuple):
+            file_id, filename, summary, chunks_count = row
+        else:
+            file_id, filename, summary, chunks_count = row['id'], row['filename'], row['summary'], row['count']
+        return {"file_id": str(file_id), "filename": filename, "summary": summary, "chunks_count": chunks_count}
+
     async def process_file(self, session_id: str, filename: str, file_bytes: bytes, file_type: str, db) -> Dict[str, Any]:
+        """
+            Single-flight : le même fichier envoyé deux fois en parallèle dans une session n'est ingéré qu'une fois,
+            le second appel attend le premier puis réutilise son résultat.
+            `db` : le pool de préférence (bail court pour la lecture et pour l'écriture finale,
+            rien n'est tenu pendant l'upload Azure, l'extraction, le résumé et les embeddings).
+        """
+        content_hash = hashlib.sha256(file_bytes).hexdigest()
+        async with single_flight(f"file:{session_id}:{content_hash}"):
+            existing = await self._find_existing_file(session_id, content_hash, db)
+            if existing:
+                print(f"--- {filename} already ingested in session {session_id}, reusing it ---")
+                return existing
+
+            result = await self._process_file(session_id, filename, file_bytes, file_type, db, content_hash)
+            # On valide AVANT de rendre le verrou, pour que le suivant voie le résultat
+            # (avec un pool, le bail d'écriture a déjà validé à sa sortie)
+            if isinstance(db, AsyncConnection):
+                await db.commit()
+            return result
+
+    async def _process_file(self, session_id: str, filename: str, file_bytes: bytes, file_type: str, db, content_hash: str) -> Dict[str, Any]:
         """
             complete process of ingestion:
             1. Upload to Azure Storage
             2. Extract text based on file type
             3. Generate summary
-            4. Store metadata in DB
-            5. Chunking & Embedding for RAG
+            4. Chunking & Embedding for RAG
+            5. Store metadata + chunks in DB (single short lease, once every external call is done)
         """
 
         # 1. UPLOAD SUR AZURE (Nouveau)
@@ -144,8 +193,6 @@ class FileIngestionService:
 
             if not extracted_text.strip():
                 raise ValueError("Empty or unreadable file.")
-            
-            summary = await self.generate_summary(extracted_text)
                 
         except Exception as e:
             print(f"Extraction failed for {filename}: {e}")
@@ -154,35 +201,33 @@ class FileIngestionService:
         # 2. Résumé
         summary = await self.generate_summary(extracted_text)
 
-        # 3. Sauvegarde BDD
-        file_id = str(uuid.uuid4())
-        await db.execute(
-            """
-            INSERT INTO knowledge_files (id, session_id, filename, file_type, extracted_text, summary, file_size, storage_path) 
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
-            """,
-            (file_id, session_id, filename, file_type, extracted_text, summary, len(file_bytes), storage_path)
-        )
-
-        # 4. Chunking & Embedding (Le RAG)
+        # 3. Chunking & Embedding (Le RAG)
         chunks = self.text_splitter.split_text(extracted_text)
-
+        vectors = []
         if chunks:
             # Vectorisation par lot (Batch) pour la vitesse
             # Attention aux limites de quota, on peut faire des mini-batchs si nécessaire
             vectors = await self.embeddings.aembed_documents(chunks)
-            
-            # Insertion des chunks
-            values = []
-            for i, (chunk, vector) in enumerate(zip(chunks, vectors)):
-                # Préparation pour execute_many ou boucle
-                await db.execute(
-                    """
-                    INSERT INTO knowledge_chunks (file_id, chunk_index, content, embedding)
-                    VALUES (%s, %s, %s, %s)
-                    """,
-                    (file_id, i, chunk, str(vector))
-                )
+
+        # 4. Sauvegarde BDD : fichier + chunks dans le même bail
+        file_id = str(uuid.uuid4())
+        async with lease(db) as conn:
+            await conn.execute(
+                """
+                INSERT INTO knowledge_files (id, session_id, filename, file_type, extracted_text, summary, file_size, storage_path, content_hash) 
+                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+                """,
+                (file_id, session_id, filename, file_type, extracted_text, summary, len(file_bytes), storage_path, content_hash)
+            )
+            if chunks:
+                async with conn.cursor() as cur:
+                    await cur.executemany(
+                        """
+                        INSERT INTO knowledge_chunks (file_id, chunk_index, content, embedding)
+                        VALUES (%s, %s, %s, %s)
+                        """,
+                        [(file_id, i, chunk, str(vector)) for i, (chunk, vector) in enumerate(zip(chunks, vectors))]
+                    )
 
         return {
             "file_id": file_id,
@@ -195,14 +240,16 @@ class FileIngestionService:
     async def retrieve_hybrid_context(self, session_id: str,query: str, db, limit: int = 5) -> str:
         """
             Stratégie SOTA : Résumés (Toujours) + Chunks Pertinents (RAG hierarchique).
+            `db` (pool ou connexion) n'est pas tenu pendant la vectorisation de la requête.
         """
 
         # A. Récupérer TOUS les résumés des fichiers de la session
-        cursor = await db.execute(
-            "SELECT filename, summary FROM knowledge_files WHERE session_id = %s ORDER BY uploaded_at ASC",
-            (session_id,)
-        )
-        files = await cursor.fetchall()
+        async with lease(db) as conn:
+            cursor = await conn.execute(
+                "SELECT filename, summary FROM knowledge_files WHERE session_id = %s ORDER BY uploaded_at ASC",
+                (session_id,)
+            )
+            files = await cursor.fetchall()
         
         if not files: 
             return ""
@@ -220,18 +267,19 @@ class FileIngestionService:
             try:
                 query_vector = await self.embeddings.aembed_query(query)
                 
-                cursor = await db.execute(
-                    """
-                    SELECT c.content, f.filename, (c.embedding <=> %s) as distance
-                    FROM knowledge_chunks c
-                    JOIN knowledge_files f ON c.file_id = f.id
-                    WHERE f.session_id = %s
-                    ORDER BY distance ASC
-                    LIMIT %s
-                    """,
-                    (str(query_vector), session_id, limit)
-                )
-                chunks = await cursor.fetchall()
+                async with lease(db) as conn:
+                    cursor = await conn.execute(
+                        """
+                        SELECT c.content, f.filename, (c.embedding <=> %s) as distance
+                        FROM knowledge_chunks c
+                        JOIN knowledge_files f ON c.file_id = f.id
+                        WHERE f.session_id = %s
+                        ORDER BY distance ASC
+                        LIMIT %s
+                        """,
+                        (str(query_vector), session_id, limit)
+                    )
+                    chunks = await cursor.fetchall()
                 
                 if chunks:
                     context_str += "\n=== RELEVANT DETAILS (RAG) ===\n"
@@ -0,0 +1,249 @@
+import os
+import hashlib
+from typing import List, Dict, Optional
+from psycopg.connection_async import AsyncConnection
+from src.cleeroute.db.redis_client import get_redis
+
+# Une sous-section déjà en file n'est pas ré-enfilée pendant cette durée
+PREWARM_DEDUPE_TTL = int(os.getenv("PREWARM_DEDUPE_TTL", 1800))
+# Nombre max d'ingestions démarrées par minute et par clé Gemini (embedding + résumé = plusieurs appels)
+PREWARM_MAX_PER_MINUTE = int(os.getenv("PREWARM_MAX_PER_MINUTE", 10))
+# Rafale autorisée au-dessus du rythme régulier (défaut : une minute de quota)
+PREWARM_BURST = int(os.getenv("PREWARM_BURST", PREWARM_MAX_PER_MINUTE))
+
+# Priorités Celery/Redis : 0 = traité en premier, 9 = en dernier
+PRIORITY_CURRENT = 0
+PRIORITY_LOWEST = 9
+
+
+def _dedupe_key(subsection_id: str) -> str:
+    return f"prewarm:subsection:{subsection_id}"
+
+
+# Dédoublonnage avec promotion : la valeur est la meilleure priorité déjà en file.
+# 0 = déjà en file avec une priorité au moins aussi bonne, 1 = nouvelle, 2 = promue (ré-enfilée plus prioritaire)
+_DEDUPE_SCRIPT = """
+local current = redis.call('GET', KEYS[1])
+if current and tonumber(current) <= tonumber(ARGV[1]) then
+    return 0
+end
+redis.call('SET', KEYS[1], ARGV[1], 'EX', tonumber(ARGV[2]))
+if current then
+    return 2
+end
+return 1
+"""
+
+# GCRA : chaque appel réserve atomiquement le prochain créneau libre de la clé et renvoie l'attente (s).
+# TAT = heure théorique du prochain créneau ; la rafale tolère (burst - 1) créneaux d'avance.
+_RATE_SCRIPT = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local interval = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local tat = tonumber(redis.call('GET', KEYS[1]) or '0')
+if tat < now then
+    tat = now
+end
+local wait = tat - (burst - 1) * interval - now
+if wait < 0 then
+    wait = 0
+end
+tat = tat + interval
+redis.call('SET', KEYS[1], tostring(tat), 'EX', math.ceil(tat - now) + 60)
+return tostring(wait)
+"""
+
+
+def gemini_key_id(api_key: Optional[str]) -> str:
+    """Identifiant non réversible d'une clé Gemini (pour les compteurs Redis)."""
+    key = api_key or os.getenv("GEMINI_API_KEY") or "default"
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()[:16]
+
+
+def compute_priority(position: int, current_position: Optional[int]) -> int:
+    """
+    Priorité selon la distance à la position actuelle de l'apprenant :
+        - la vidéo courante passe en premier,
+        - les vidéos suivantes ensuite (l'apprenant avance dans le cours),
+        - les vidéos déjà passées en dernier.
+    """
+    if current_position is None:
+        return min(PRIORITY_LOWEST, 2 + position // 3)
+
+    distance = position - current_position
+    if distance == 0:
+        return PRIORITY_CURRENT
+    if distance > 0:
+        return min(PRIORITY_LOWEST, 1 + (distance - 1) // 2)
+    return min(PRIORITY_LOWEST, 5 + abs(distance) // 2)
+
+
+async def fetch_course_subsections(db: AsyncConnection, course_id: str) -> List[Dict]:
+    """
+    Liste ordonnée des sous-sections du cours avec leur état d'ingestion.
+        - has_summary : transcript déjà ingéré (résumé présent)
+        - transcript_status : statut de `subsection_transcripts` (None si pas encore récupéré)
+    """
+    cursor = await db.execute(
+        """
+        SELECT sub.id, sub.title, st.status, (ts.subsection_id IS NOT NULL) AS has_summary
+        FROM subsection sub
+        JOIN section sec ON sub.section_id = sec.id
+        LEFT JOIN subsection_transcripts st ON st.subsection_id = sub.id
+        LEFT JOIN transcript_summaries ts ON ts.subsection_id = sub.id
+        WHERE sec.course_id = %s
+        ORDER BY sec.position, sub.position
+        """,
+        (course_id,)
+    )
+    rows = await cursor.fetchall()
+
+    subsections = []
+    for row in rows:
+        if isinstance(row, tuple):
+            sub_id, title, transcript_status, has_summary = row
+        else:
+            sub_id, title, transcript_status, has_summary = row['id'], row['title'], row['status'], row['has_summary']
+        subsections.append({
+            "subsection_id": str(sub_id),
+            "title": title,
+            "transcript_status": transcript_status,
+            "has_summary": bool(has_summary),
+        })
+    return subsections
+
+
+async def enqueue_subsection_ingestion(subsection_id: str, priority: int = PRIORITY_CURRENT, gemini_api_key: Optional[str] = None) -> bool:
+    """
+    Enfile l'ingestion d'une sous-section si elle n'est pas déjà en file (dédoublonnage Redis).
+    Déjà en file avec une priorité moins bonne : ré-enfilée avec la nouvelle priorité (l'ancien message,
+    traité plus tard, trouvera la vidéo ingérée et s'arrêtera tout de suite).
+    Retourne True si une tâche a été envoyée.
+    """
+    # Import local : évite un import circulaire tasks -> ytbe_transcripts -> ...
+    from src.cleeroute.langGraph.learners_api.chats.services.tasks import ingest_transcript_by_id_task
+
+    redis = get_redis()
+    if redis is not None:
+        try:
+            outcome = await redis.eval(_DEDUPE_SCRIPT, 1, _dedupe_key(subsection_id), priority, PREWARM_DEDUPE_TTL)
+            if not int(outcome):
+                return False
+        except Exception as e:
+            # Redis indisponible : on préfère un doublon (protégé en aval) à une vidéo jamais préparée
+            print(f"[PREWARM] Dedupe unavailable: {e}")
+
+    ingest_transcript_by_id_task.apply_async(
+        args=[subsection_id],
+        kwargs={"gemini_api_key": gemini_api_key},
+        priority=priority
+    )
+    return True
+
+
+async def release_subsection(subsection_id: str):
+    """Appelé par le worker à la fin de l'ingestion (succès ou abandon)."""
+    redis = get_redis()
+    if redis is None:
+        return
+    try:
+        await redis.delete(_dedupe_key(subsection_id))
+    except Exception as e:
+        print(f"[PREWARM] Could not release dedupe key: {e}")
+
+
+async def acquire_rate_slot(gemini_api_key: Optional[str]) -> float:
+    """
+    Limiteur GCRA par clé Gemini, partagé entre tous les workers (PREWARM_MAX_PER_MINUTE, rafale PREWARM_BURST).
+    Réserve le prochain créneau et retourne le nombre de secondes à attendre avant de démarrer :
+    la tâche attend son créneau au lieu de se ré-enfiler, et les créneaux sont attribués dans l'ordre
+    où les workers prennent les tâches, c'est-à-dire par priorité.
+    """
+    redis = get_redis()
+    if redis is None or PREWARM_MAX_PER_MINUTE <= 0:
+        return 0.0
+
+    key = f"prewarm:rate:{gemini_key_id(gemini_api_key)}"
+    try:
+        wait = await redis.eval(_RATE_SCRIPT, 1, key, 60.0 / PREWARM_MAX_PER_MINUTE, max(1, PREWARM_BURST))
+    except Exception as e:
+        print(f"[PREWARM] Rate limiter unavailable: {e}")
+        return 0.0
+    return float(wait)
+
+
+async def schedule_course_prewarm(
+    db: AsyncConnection,
+    course_id: str,
+    current_subsection_id: Optional[str] = None,
+    gemini_api_key: Optional[str] = None
+) -> Dict:
+    """Enfile toutes les sous-sections non ingérées du cours, priorisées autour de la position de l'apprenant."""
+    subsections = await fetch_course_subsections(db, course_id)
+
+    current_position = None
+    if current_subsection_id:
+        for i, sub in enumerate(subsections):
+            if sub["subsection_id"] == str(current_subsection_id):
+                current_position = i
+                break
+
+    queued, already_queued, ready, unavailable = 0, 0, 0, 0
+    for position, sub in enumerate(subsections):
+        if sub["has_summary"]:
+            ready += 1
+            continue
+        # Pas de transcript exploitable : rien à ingérer
+        if sub["transcript_status"] is None or sub["transcript_status"] == "not_found":
+            unavailable += 1
+            continue
+
+        priority = compute_priority(position, current_position)
+        if await enqueue_subsection_ingestion(sub["subsection_id"], priority, gemini_api_key):
+            queued += 1
+        else:
+            already_queued += 1
+
+    print(f"[PREWARM] Course {course_id}: {queued} queued, {already_queued} already queued, {ready} ready, {unavailable} unavailable")
+    return {
+        "total": len(subsections),
+        "queued": queued,
+        "already_queued": already_queued,
+        "ready": ready,
+        "unavailable": unavailable,
+    }
+
+
+async def get_course_prewarm_progress(db: AsyncConnection, course_id: str) -> Dict:
+    """Vue de progression : état de chaque sous-section (ready / queued / pending / unavailable)."""
+    subsections = await fetch_course_subsections(db, course_id)
+
+    queued_flags = [False] * len(subsections)
+    redis = get_redis()
+    if redis is not None and subsections:
+        try:
+            values = await redis.mget([_dedupe_key(s["subsection_id"]) for s in subsections])
+            queued_flags = [v is not None for v in values]
+        except Exception as e:
+            print(f"[PREWARM] Progress lookup degraded: {e}")
+
+    counts = {"ready": 0, "queued": 0, "pending": 0, "unavailable": 0}
+    items = []
+    for sub, is_queued in zip(subsections, queued_flags):
+        if sub["has_summary"]:
+            status = "ready"
+        elif sub["transcript_status"] is None or sub["transcript_status"] == "not_found":
+            status = "unavailable"
+        elif is_queued:
+            status = "queued"
+        else:
+            status = "pending"
+        counts[status] += 1
+        items.append({"subsectionId": sub["subsection_id"], "title": sub["title"], "status": status})
+
+    # Le pourcentage ne porte que sur les vidéos qui peuvent réellement être préparées
+    preparable = len(subsections) - counts["unavailable"]
+    percentage = int(counts["ready"] / preparable * 100) if preparable else 100
+
+    return {"total": len(subsections), "percentage": percentage, **counts, "subsections": items}
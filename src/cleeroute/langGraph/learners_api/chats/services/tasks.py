@@ -1,42 +1,66 @@
 import asyncio
-import os
 import logging
-from psycopg_pool import AsyncConnectionPool
+from typing import Optional
 from celery import shared_task
+from src.cleeroute.worker_runtime import get_runtime
 from src.cleeroute.langGraph.learners_api.chats.services.ytbe_transcripts import TranscriptService
+from src.cleeroute.langGraph.learners_api.chats.services.course_digest import CourseDigestService
+from src.cleeroute.langGraph.learners_api.chats.services.prewarm_scheduler import acquire_rate_slot, release_subsection
 
 logger = logging.getLogger(__name__)
-DB_URL = os.getenv("APP_DATABASE_URL")
 
 @shared_task(bind=True, max_retries=3, default_retry_delay=10)
-def ingest_transcript_by_id_task(self, subsection_id: str):
+def ingest_transcript_by_id_task(self, subsection_id: str, gemini_api_key: Optional[str] = None):
     """
     Tâche optimisée : Ingère le transcript d'une sous-section via son UUID.
-    Appelée par l'endpoint de 'Préchauffage'.
+    Appelée par l'endpoint de 'Préchauffage' (vidéo seule ou cours complet).
     """
+    runtime = get_runtime()
     try:
-        return asyncio.run(_ingest_transcript_by_id_async(subsection_id))
+        result = runtime.run(_ingest_transcript_by_id_async(runtime.app_pool, subsection_id, gemini_api_key))
     except Exception as e:
         logger.error(f"Erreur ingestion transcript (ID: {subsection_id}): {e}")
+        if self.request.retries >= self.max_retries:
+            runtime.run(release_subsection(subsection_id))
         raise self.retry(exc=e)
+    return result
 
-async def _ingest_transcript_by_id_async(subsection_id: str):
-    transcript_service = TranscriptService()
-
-    # Config SSL si nécessaire
-    conn_kwargs = {"autocommit": True}
-    if "azure.com" in DB_URL or "52." in DB_URL:
-         conn_kwargs["sslmode"] = "require"
-
-    # Pool éphémère pour le worker
-    async with AsyncConnectionPool(
-        conninfo=DB_URL,
-        min_size=1, max_size=1, timeout=30.0, kwargs=conn_kwargs 
-    ) as pool:
-        async with pool.connection() as conn:
-            # On appelle directement le service qui gère la logique "If needed"
-            # (Vérifie si déjà fait, sinon vectorise et résume)
-            await transcript_service.ingest_transcript_if_needed(conn, subsection_id)
-            
-            logger.info(f"--- [Celery] Ingestion finished for subsection {subsection_id} ---")
-            return "processed"
\ No newline at end of file
+async def _ingest_transcript_by_id_async(pool, subsection_id: str, gemini_api_key: Optional[str] = None):
+    transcript_service = TranscriptService(api_key=gemini_api_key, priority="background")
+
+    # Déjà ingérée (ancien message d'une vidéo ré-enfilée avec une meilleure priorité, ou chat plus rapide) :
+    # aucun créneau du limiteur n'est consommé
+    if await transcript_service._is_ingested(pool, subsection_id):
+        await release_subsection(subsection_id)
+        return "already_ingested"
+
+    # Créneau réservé dans le limiteur partagé : on attend ici plutôt que de ré-enfiler la tâche
+    wait_seconds = await acquire_rate_slot(gemini_api_key)
+    if wait_seconds > 0:
+        logger.info(f"--- [Celery] Rate limit: subsection {subsection_id} starts in {wait_seconds:.0f}s ---")
+        await asyncio.sleep(wait_seconds)
+
+    # Pool applicatif partagé du worker (ouvert une seule fois par process) : le service emprunte
+    # une connexion par étape SQL, aucune n'est tenue pendant les embeddings et les résumés
+    # (Vérifie si déjà fait, sinon vectorise et résume)
+    await transcript_service.ingest_transcript_if_needed(pool, subsection_id)
+
+    logger.info(f"--- [Celery] Ingestion finished for subsection {subsection_id} ---")
+
+    await release_subsection(subsection_id)
+    return "processed"
+
+
+@shared_task(bind=True, max_retries=2, default_retry_delay=30)
+def refresh_section_digest_task(self, subsection_id: str):
+    """
+    Reconstruit le digest de la section d'une sous-section fraîchement ingérée (condensation LLM, priorité basse).
+    Enfilée par l'ingestion du transcript (course_digest.schedule_section_refresh).
+    """
+    runtime = get_runtime()
+    try:
+        runtime.run(CourseDigestService().refresh_for_subsection(runtime.app_pool, subsection_id))
+    except Exception as e:
+        logger.error(f"Erreur digest de section (subsection {subsection_id}): {e}")
+        raise self.retry(exc=e)
+    return "refreshed"
@@ -1,16 +1,91 @@
 import json
 import math
-from typing import List, Dict, Any
+import asyncio
+import hashlib
+import time
+from typing import List, Dict, Any, Optional, Tuple, Union
 from psycopg.connection_async import AsyncConnection
 from src.cleeroute.langGraph.learners_api.utils import get_embedding_model, get_llm
-from src.cleeroute.langGraph.learners_api.chats.prompts import SUMMARY_TIMESTAMPED_YT_TRANSCRIPT
+from src.cleeroute.langGraph.learners_api.chats.prompts import (
+    SUMMARY_TIMESTAMPED_YT_TRANSCRIPT,
+    SUMMARY_TRANSCRIPT_WINDOW_PROMPT,
+    MERGE_TRANSCRIPT_SUMMARIES_PROMPT
+)
+from src.cleeroute.langGraph.learners_api.chats.services.course_digest import schedule_section_refresh
+from src.cleeroute.langGraph.learners_api.chats.services.answer_cache import SemanticAnswerCache, CHAT_SEMANTIC_CACHE_ENABLED
+from src.cleeroute.db.single_flight import single_flight
+from src.cleeroute.db.lease import DbSource, lease
+from src.cleeroute.db.redis_client import get_redis
 import os
 
+# Au-delà de cette taille, on passe en map-reduce (fenêtres résumées en parallèle puis fusionnées)
+SUMMARY_SINGLE_PASS_MAX_CHARS = int(os.getenv("SUMMARY_SINGLE_PASS_MAX_CHARS", 40000))
+SUMMARY_WINDOW_CHARS = int(os.getenv("SUMMARY_WINDOW_CHARS", 20000))
+SUMMARY_WINDOW_CONCURRENCY = int(os.getenv("SUMMARY_WINDOW_CONCURRENCY", 4))
+# Résumé en échec : pas de nouvelle tentative avant SUMMARY_FAILURE_BACKOFF s, doublé à chaque échec (plafonné)
+SUMMARY_FAILURE_BACKOFF = int(os.getenv("SUMMARY_FAILURE_BACKOFF", 60))
+SUMMARY_FAILURE_BACKOFF_MAX = int(os.getenv("SUMMARY_FAILURE_BACKOFF_MAX", 6 * 3600))
+
+# Repli sans Redis : échecs de résumé de ce process (subsection -> (nombre d'échecs, prochaine tentative))
+_local_summary_failures: Dict[str, Tuple[int, float]] = {}
+
+
+def _summary_failure_key(subsection_id: str) -> str:
+    return f"transcript:summary_failures:{subsection_id}"
+
+
+async def _get_summary_failure(subsection_id: str) -> Tuple[int, float]:
+    """(nombre d'échecs consécutifs, timestamp de la prochaine tentative autorisée)."""
+    redis = get_redis()
+    if redis is None:
+        return _local_summary_failures.get(subsection_id, (0, 0.0))
+    try:
+        value = await redis.get(_summary_failure_key(subsection_id))
+    except Exception as e:
+        print(f"[TRANSCRIPT] Summary failure lookup unavailable: {e}")
+        return 0, 0.0
+    if not value:
+        return 0, 0.0
+    failures, retry_at = value.split(":", 1)
+    return int(failures), float(retry_at)
+
+
+async def _record_summary_failure(subsection_id: str) -> float:
+    """Enregistre un échec de résumé et retourne le délai avant la prochaine tentative."""
+    failures, _ = await _get_summary_failure(subsection_id)
+    failures += 1
+    delay = min(SUMMARY_FAILURE_BACKOFF * 2 ** (failures - 1), SUMMARY_FAILURE_BACKOFF_MAX)
+    retry_at = time.time() + delay
+    redis = get_redis()
+    if redis is None:
+        _local_summary_failures[subsection_id] = (failures, retry_at)
+        return delay
+    try:
+        # Le compteur survit au délai pour que le backoff continue de croître
+        await redis.set(_summary_failure_key(subsection_id), f"{failures}:{retry_at}", ex=int(delay + SUMMARY_FAILURE_BACKOFF_MAX))
+    except Exception as e:
+        print(f"[TRANSCRIPT] Could not record summary failure: {e}")
+    return delay
+
+
+async def _clear_summary_failure(subsection_id: str):
+    _local_summary_failures.pop(subsection_id, None)
+    redis = get_redis()
+    if redis is None:
+        return
+    try:
+        await redis.delete(_summary_failure_key(subsection_id))
+    except Exception as e:
+        print(f"[TRANSCRIPT] Could not clear summary failure: {e}")
+
 
 class TranscriptService:
-    def __init__(self):
-        self.embeddings = get_embedding_model(api_key=os.getenv("GEMINI_API_KEY"))
-        self.llm = get_llm(api_key=os.getenv("GEMINI_API_KEY"))
+    _window_schema_ready = False
+
+    def __init__(self, api_key: Optional[str] = None, priority: str = "standard"):
+        api_key = api_key or os.getenv("GEMINI_API_KEY")
+        self.embeddings = get_embedding_model(api_key=api_key)
+        self.llm = get_llm(api_key=api_key, priority=priority)
 
     def _format_seconds(self, seconds: float) -> str:
         """Convertit 125.5 -> '02:05'"""
@@ -71,32 +146,208 @@ class TranscriptService:
             
         return chunks
 
-    async def generate_timestamped_summary(self, full_text_with_timestamps: str) -> str:
-        """Génère un résumé avec chapitrage."""
-        # On tronque pour le résumé si trop long (Gemini supporte beaucoup, mais restons prudents)
-        input_text = full_text_with_timestamps
-        
-        chain = SUMMARY_TIMESTAMPED_YT_TRANSCRIPT | self.llm
+    async def _ensure_window_schema(self, db: AsyncConnection):
+        """Table de cache des résumés de fenêtres (idempotent, une fois par process)."""
+        if TranscriptService._window_schema_ready:
+            return
+        await db.execute(
+            """
+            CREATE TABLE IF NOT EXISTS transcript_window_summaries (
+                subsection_id TEXT NOT NULL,
+                window_index INTEGER NOT NULL,
+                content_hash TEXT NOT NULL,
+                summary_text TEXT NOT NULL,
+                updated_at TIMESTAMPTZ NOT NULL DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (subsection_id, window_index)
+            )
+            """
+        )
+        TranscriptService._window_schema_ready = True
+
+    def _build_windows(self, chunks: List[Dict], window_chars: int = SUMMARY_WINDOW_CHARS) -> List[str]:
+        """Regroupe les chunks timestampés en fenêtres contiguës d'environ `window_chars` caractères."""
+        windows = []
+        current = []
+        current_len = 0
+        for c in chunks:
+            text = c["content"]
+            if current and current_len + len(text) > window_chars:
+                windows.append("\n".join(current))
+                current, current_len = [], 0
+            current.append(text)
+            current_len += len(text)
+        if current:
+            windows.append("\n".join(current))
+        return windows
+
+    async def _summarize_windows(
+        self,
+        windows: List[str],
+        db: DbSource = None,
+        subsection_id: Optional[str] = None
+    ) -> List[Optional[str]]:
+        """
+        MAP : résume chaque fenêtre en parallèle (sémaphore borné).
+        Les résumés réussis sont mis en cache : une relance ne refait que les fenêtres en échec.
+        `db` (pool ou connexion) n'est emprunté que pour lire puis écrire le cache, pas pendant les appels LLM.
+        """
+        use_cache = db is not None and subsection_id
+        cached = {}
+        if use_cache:
+            async with lease(db) as conn:
+                await self._ensure_window_schema(conn)
+                cursor = await conn.execute(
+                    "SELECT window_index, content_hash, summary_text FROM transcript_window_summaries WHERE subsection_id = %s",
+                    (str(subsection_id),)
+                )
+                rows = await cursor.fetchall()
+            for row in rows:
+                if isinstance(row, tuple):
+                    cached[row[0]] = (row[1], row[2])
+                else:
+                    cached[row['window_index']] = (row['content_hash'], row['summary_text'])
+
+        semaphore = asyncio.Semaphore(SUMMARY_WINDOW_CONCURRENCY)
+        chain = SUMMARY_TRANSCRIPT_WINDOW_PROMPT | self.llm
+
+        async def summarize(index: int, text: str) -> Union[str, Tuple[str, str], None]:
+            """Résumé en cache (str), résumé frais à mettre en cache ((résumé, hash)), ou None en cas d'échec."""
+            content_hash = hashlib.sha256(text.encode("utf-8")).hexdigest()
+            if index in cached and cached[index][0] == content_hash:
+                return cached[index][1]
+
+            async with semaphore:
+                try:
+                    res = await chain.ainvoke({
+                        "window_number": index + 1,
+                        "window_count": len(windows),
+                        "input_text": text
+                    })
+                    summary = (res.content or "").strip()
+                except Exception as e:
+                    print(f"Window {index + 1}/{len(windows)} summary error: {e}")
+                    return None
+
+            if not summary:
+                return None
+            return summary, content_hash
+
+        results = await asyncio.gather(*[summarize(i, w) for i, w in enumerate(windows)])
+
+        summaries = []
+        fresh = []
+        for index, result in enumerate(results):
+            if isinstance(result, tuple):
+                summary, content_hash = result
+                fresh.append((str(subsection_id), index, content_hash, summary))
+                summaries.append(summary)
+            else:
+                summaries.append(result)
+
+        if use_cache and fresh:
+            # Un seul bail, écriture séquentielle (une connexion psycopg ne supporte pas les requêtes concurrentes)
+            async with lease(db) as conn:
+                async with conn.cursor() as cur:
+                    await cur.executemany(
+                        """
+                        INSERT INTO transcript_window_summaries (subsection_id, window_index, content_hash, summary_text)
+                        VALUES (%s, %s, %s, %s)
+                        ON CONFLICT (subsection_id, window_index) DO UPDATE SET
+                            content_hash = EXCLUDED.content_hash,
+                            summary_text = EXCLUDED.summary_text,
+                            updated_at = CURRENT_TIMESTAMP
+                        """,
+                        fresh
+                    )
+        return summaries
+
+    async def generate_timestamped_summary(
+        self,
+        full_text_with_timestamps: str,
+        chunks: Optional[List[Dict]] = None,
+        db: DbSource = None,
+        subsection_id: Optional[str] = None
+    ) -> Optional[str]:
+        """
+        Génère un résumé avec chapitrage.
+            - Transcript court : un seul appel.
+            - Transcript long : map-reduce (fenêtres résumées en parallèle puis fusionnées en chapitres).
+        Retourne None en cas d'échec (rien n'est stocké ; l'ingestion est relancée après un backoff, voir SUMMARY_FAILURE_BACKOFF).
+        """
+        if len(full_text_with_timestamps) <= SUMMARY_SINGLE_PASS_MAX_CHARS or not chunks:
+            chain = SUMMARY_TIMESTAMPED_YT_TRANSCRIPT | self.llm
+            try:
+                res = await chain.ainvoke({"input_text": full_text_with_timestamps})
+                return res.content or None
+            except Exception as e:
+                print(f"Summary error: {e}")
+                return None
+
+        # MAP
+        windows = self._build_windows(chunks)
+        print(f"--- Map-reduce summary: {len(windows)} windows ---")
+        window_summaries = await self._summarize_windows(windows, db, subsection_id)
+
+        failed = [i + 1 for i, summary in enumerate(window_summaries) if summary is None]
+        if failed:
+            print(f"Summary incomplete, failed windows: {failed} (successful windows are cached)")
+            return None
+
+        # REDUCE
+        merged_input = "\n\n".join(
+            [f"--- Part {i + 1}/{len(windows)} ---\n{summary}" for i, summary in enumerate(window_summaries)]
+        )
+        chain = MERGE_TRANSCRIPT_SUMMARIES_PROMPT | self.llm
         try:
-            res = await chain.ainvoke({"input_text": input_text})
-            return res.content
-        except:
-            return "Summary unavailable."
+            res = await chain.ainvoke({"input_text": merged_input})
+            return res.content or None
+        except Exception as e:
+            print(f"Summary merge error: {e}")
+            return None
 
-    async def ingest_transcript_if_needed(self, db: AsyncConnection, subsection_id: str):
+    async def _is_ingested(self, db: DbSource, subsection_id: str) -> bool:
+        # La table summaries est un bon indicateur
+        async with lease(db) as conn:
+            cursor = await conn.execute("SELECT 1 FROM transcript_summaries WHERE subsection_id = %s", (subsection_id,))
+            return await cursor.fetchone() is not None
+
+    async def ingest_transcript_if_needed(self, db: DbSource, subsection_id: str):
         """
         Vérifie si le transcript est déjà ingéré pour cette vidéo. Sinon, le traite.
+        Un seul process ingère une vidéo donnée : les appels concurrents (Celery + chat) attendent le job en cours.
+        Passer le pool plutôt qu'une connexion : chaque étape SQL prend alors un bail court,
+        et aucune connexion n'est tenue pendant les embeddings et les résumés.
         """
-        # 1. Vérifier si déjà ingéré (table summaries est un bon indicateur)
-        cursor = await db.execute("SELECT 1 FROM transcript_summaries WHERE subsection_id = %s", (subsection_id,))
-        if await cursor.fetchone():
+        # 1. Vérifier si déjà ingéré (chemin rapide, sans verrou)
+        if await self._is_ingested(db, subsection_id):
             return # Déjà fait
-            
+
+        # Résumé récemment en échec : on ne relance pas le map-reduce à chaque message (backoff)
+        failures, retry_at = await _get_summary_failure(subsection_id)
+        if retry_at > time.time():
+            print(f"--- Transcript summary for {subsection_id} failed {failures} time(s), next attempt in {retry_at - time.time():.0f}s ---")
+            return
+
+        async with single_flight(f"transcript:{subsection_id}"):
+            # Revérification : un autre process a pu terminer pendant qu'on attendait le verrou
+            if await self._is_ingested(db, subsection_id):
+                return
+            await self._ingest_transcript(db, subsection_id)
+            # On valide AVANT de rendre le verrou, pour que le suivant voie le résultat
+            # (avec un pool, chaque bail a déjà validé à sa sortie)
+            if isinstance(db, AsyncConnection):
+                await db.commit()
+
+    async def _ingest_transcript(self, db: DbSource, subsection_id: str):
         print(f"--- Ingesting Transcript for Subsection {subsection_id} ---")
         
         # 2. Récupérer le JSON brut depuis la table existante
-        cursor = await db.execute("SELECT content FROM subsection_transcripts WHERE subsection_id = %s", (subsection_id,))
-        row = await cursor.fetchone()
+        async with lease(db) as conn:
+            cursor = await conn.execute("SELECT content FROM subsection_transcripts WHERE subsection_id = %s", (subsection_id,))
+            row = await cursor.fetchone()
+            if row:
+                cursor = await conn.execute("SELECT COUNT(*) FROM transcript_chunks WHERE subsection_id = %s", (subsection_id,))
+                count_row = await cursor.fetchone()
         
         if not row:
             print("No transcript found in DB.")
@@ -110,77 +361,111 @@ class TranscriptService:
         # 3. Préparer les Chunks
         chunks = self._prepare_chunks(transcript_data)
         
-        # 4. Vectoriser (Batch)
-        texts_to_embed = [c["content"] for c in chunks]
-        try:
-            vectors = await self.embeddings.aembed_documents(texts_to_embed)
-        except Exception as e:
-            print(f"Embedding error: {e}")
+        # 4. Vectoriser (Batch) - sauf si une ingestion précédente a déjà stocké les chunks
+        existing_chunks = count_row[0] if isinstance(count_row, tuple) else count_row['count']
+
+        if existing_chunks < len(chunks):
+            texts_to_embed = [c["content"] for c in chunks]
+            try:
+                vectors = await self.embeddings.aembed_documents(texts_to_embed)
+            except Exception as e:
+                print(f"Embedding error: {e}")
+                return
+
+            # 5. Sauvegarder Chunks + Vecteurs (bail pris APRÈS l'appel d'embeddings)
+            async with lease(db) as conn:
+                for i, (chunk_data, vector) in enumerate(zip(chunks, vectors)):
+                    await conn.execute(
+                        """
+                        INSERT INTO transcript_chunks (subsection_id, chunk_index, start_seconds, content, embedding)
+                        VALUES (%s, %s, %s, %s, %s)
+                        ON CONFLICT DO NOTHING
+                        """,
+                        (subsection_id, i, chunk_data["start_seconds"], chunk_data["content"], str(vector))
+                    )
+
+        # 6. Générer et Sauvegarder le Résumé
+        # On reconstruit un texte complet léger pour le résumé
+        full_text = "\n".join([c["content"] for c in chunks])
+        summary = await self.generate_timestamped_summary(full_text, chunks=chunks, db=db, subsection_id=subsection_id)
+
+        if not summary:
+            # On ne marque PAS le transcript comme ingéré, mais l'échec est mémorisé : les requêtes suivantes
+            # n'attendent pas un nouveau résumé avant la fin du backoff (les chunks restent utilisables)
+            delay = await _record_summary_failure(subsection_id)
+            print(f"--- Transcript summary failed, next attempt in {delay:.0f}s ---")
             return
 
-        # 5. Sauvegarder Chunks + Vecteurs
-        for i, (chunk_data, vector) in enumerate(zip(chunks, vectors)):
-            await db.execute(
+        async with lease(db) as conn:
+            await conn.execute(
                 """
-                INSERT INTO transcript_chunks (subsection_id, chunk_index, start_seconds, content, embedding)
-                VALUES (%s, %s, %s, %s, %s)
-                ON CONFLICT DO NOTHING
+                INSERT INTO transcript_summaries (subsection_id, summary_text)
+                VALUES (%s, %s)
+                ON CONFLICT (subsection_id) DO UPDATE SET summary_text = EXCLUDED.summary_text
                 """,
-                (subsection_id, i, chunk_data["start_seconds"], chunk_data["content"], str(vector))
+                (subsection_id, summary)
             )
+        await _clear_summary_failure(subsection_id)
+
+        # 7. Mise à jour incrémentale du digest du cours (seule la section concernée), en tâche de fond :
+        # la condensation LLM n'est pas faite sous le verrou d'ingestion, que la requête de chat attend
+        await schedule_section_refresh(subsection_id)
+
+        # 8. Les réponses en cache pour cette vidéo ont été produites sans (ou avec l'ancien) transcript
+        if CHAT_SEMANTIC_CACHE_ENABLED:
+            try:
+                async with lease(db) as conn:
+                    await SemanticAnswerCache().invalidate_subsection(conn, subsection_id)
+            except Exception as e:
+                print(f"Answer cache invalidation error: {e}")
 
-        # 6. Générer et Sauvegarder le Résumé
-        # On reconstruit un texte complet léger pour le résumé
-        full_text = "\n".join([c["content"] for c in chunks])
-        summary = await self.generate_timestamped_summary(full_text)
-        
-        await db.execute(
-            """
-            INSERT INTO transcript_summaries (subsection_id, summary_text)
-            VALUES (%s, %s)
-            ON CONFLICT (subsection_id) DO UPDATE SET summary_text = EXCLUDED.summary_text
-            """,
-            (subsection_id, summary)
-        )
         print("--- Transcript Ingestion Complete ---")
 
-    async def retrieve_context(self, db: AsyncConnection, subsection_id: str, user_query: str, limit: int = 3):
+    async def retrieve_context(self, db: DbSource, subsection_id: str, user_query: str, limit: int = 3):
         """
             Récupère : 
                 1. Le résumé global, 
                 2. Les passages précis liés à la question.
+            La question est vectorisée avant d'emprunter la connexion.
         """
-        # A. Récupérer le résumé
-        cursor = await db.execute("SELECT summary_text FROM transcript_summaries WHERE subsection_id = %s", (subsection_id,))
-        row = await cursor.fetchone()
-        summary = row[0] if row else "No summary available."
-        
-        context_str = f"=== CURRENT VIDEO CONTEXT (Timestamps included) ===\n\n**Video Summary:**\n{summary}\n\n"
-
-        # B. Recherche Vectorielle (RAG)
+        query_vector = None
         if len(user_query) > 5:
             try:
                 query_vector = await self.embeddings.aembed_query(user_query)
-                
-                cursor = await db.execute(
-                    """
-                    SELECT content, start_seconds
-                    FROM transcript_chunks
-                    WHERE subsection_id = %s
-                    ORDER BY embedding <=> %s
-                    LIMIT %s
-                    """,
-                    (subsection_id, str(query_vector), limit)
-                )
-                results = await cursor.fetchall()
-                
-                if results:
-                    context_str += "**Relevant Transcript Segments:**\n"
-                    for res in results:
-                        text = res[0] if isinstance(res, tuple) else res['content']
-                        # start = res[1] # Pas besoin de l'afficher, il est déjà dans le texte [MM:SS]
-                        context_str += f"... {text} ...\n\n"
             except Exception as e:
                 print(f"Transcript RAG Error: {e}")
 
+        results = []
+        async with lease(db) as conn:
+            # A. Récupérer le résumé
+            cursor = await conn.execute("SELECT summary_text FROM transcript_summaries WHERE subsection_id = %s", (subsection_id,))
+            row = await cursor.fetchone()
+
+            # B. Recherche Vectorielle (RAG)
+            if query_vector is not None:
+                try:
+                    cursor = await conn.execute(
+                        """
+                        SELECT content, start_seconds
+                        FROM transcript_chunks
+                        WHERE subsection_id = %s
+                        ORDER BY embedding <=> %s
+                        LIMIT %s
+                        """,
+                        (subsection_id, str(query_vector), limit)
+                    )
+                    results = await cursor.fetchall()
+                except Exception as e:
+                    print(f"Transcript RAG Error: {e}")
+
+        summary = row[0] if row else "No summary available."
+        context_str = f"=== CURRENT VIDEO CONTEXT (Timestamps included) ===\n\n**Video Summary:**\n{summary}\n\n"
+
+        if results:
+            context_str += "**Relevant Transcript Segments:**\n"
+            for res in results:
+                text = res[0] if isinstance(res, tuple) else res['content']
+                # start = res[1] # Pas besoin de l'afficher, il est déjà dans le texte [MM:SS]
+                context_str += f"... {text} ...\n\n"
+
         return context_str
\ No newline at end of file
@@ -12,6 +12,16 @@ PROGRESS_MAPPING = {
         "label": "Designing Blueprint",
         "desc": "AI is analyzing videos and structuring learning modules..."
     },
+    "generating_options": {
+        "step": 2,
+        "label": "Building Courses",
+        "desc": "Course options are being published as soon as each one is ready..."
+    },
+    "failed": {
+        "step": 1,
+        "label": "Generation Failed",
+        "desc": "Something went wrong while generating your course. Please try again."
+    },
     # Fallback pour tout état inconnu
     "unknown": {
         "step": 1,
@@ -3,28 +3,29 @@ from langgraph.pregel import Pregel
 from .graph_gen import create_syllabus_generation_graph
 from .graph_conv import create_conversation_graph
 from src.cleeroute.db.checkpointer import get_checkpointer
-import asyncio
+from src.cleeroute.lazy_init import register_async_warmup
 
-async def get_conversation_graph():
-    # Vérifiez si une boucle d'événements existe
-    try:
-        loop = asyncio.get_running_loop()
-    except RuntimeError:
-        # Créez une boucle temporairement
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
+# Les graphes compilés sont sans état (l'état vit dans le checkpointer) : on les construit une seule fois
+_conversation_graph = None
+_syllabus_graph = None
 
-    # Initialisez le checkpointer
-    checkpointer = get_checkpointer()
-    return create_conversation_graph(checkpointer)
+async def get_conversation_graph():
+    global _conversation_graph
+    if _conversation_graph is None:
+        print("--- LAZY INIT: Compiling Conversation Graph ---")
+        checkpointer = get_checkpointer()
+        _conversation_graph = create_conversation_graph(checkpointer)
+    return _conversation_graph
 
 async def get_syllabus_graph():
-    # Même logique pour le graphe de syllabus
-    try:
-        loop = asyncio.get_running_loop()
-    except RuntimeError:
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
+    # Même logique pour le graphe de syllabus (utilisé en lecture seule par le polling de statut)
+    global _syllabus_graph
+    if _syllabus_graph is None:
+        print("--- LAZY INIT: Compiling Syllabus Graph ---")
+        checkpointer = get_checkpointer()
+        _syllabus_graph = create_syllabus_generation_graph(checkpointer)
+    return _syllabus_graph
+
 
-    checkpointer = get_checkpointer()
-    return create_syllabus_generation_graph(checkpointer)
\ No newline at end of file
+register_async_warmup("course_gen.conversation_graph", get_conversation_graph)
+register_async_warmup("course_gen.syllabus_graph", get_syllabus_graph)
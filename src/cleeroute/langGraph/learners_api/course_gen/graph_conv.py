@@ -8,10 +8,12 @@ from googleapiclient.discovery import build
 from src.cleeroute.db.checkpointer import get_checkpointer
 from dotenv import load_dotenv
 from src.cleeroute.langGraph.learners_api.utils import resilient_retry_policy, get_llm
+from src.cleeroute.metrics import track
 
 load_dotenv()
 
 # Graph Nodes
+@track("graph_node", "conversation.initialize")
 def initialize_state(state: GraphState) -> dict:
     """Initializes non-input fields of the state."""
     print("--- State Initialized ---")
@@ -30,12 +32,13 @@ def initialize_state(state: GraphState) -> dict:
         "language": lang
     }
 
+@track("graph_node", "conversation.intelligent_conversation")
 async def intelligent_conversation(state: GraphState) -> dict:
     """Manages the conversation with the user."""
     print("--- Conducting Intelligent Conversation ---")
     history_tuples = state.get('conversation_history', [])
     history_str = "\n".join([f"Human: {h}\nAI: {a}" for h, a in history_tuples])
-    llm = get_llm(api_key=os.getenv("GEMINI_API_KEY"))
+    llm = get_llm(api_key=os.getenv("GEMINI_API_KEY"), priority="interactive")
     # # On désérialise les métadonnées pour les rendre lisibles
     metadata = PydanticSerializer.loads(state['metadata_str'], Course_meta_datas)
 
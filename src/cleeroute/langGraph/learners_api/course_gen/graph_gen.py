@@ -11,10 +11,17 @@ import asyncio
 from googleapiclient.discovery import build
 from .models import VideoInfo
 from .services import smart_search_and_curate, fetch_playlist_light, classify_youtube_url, analyze_single_video, get_emergency_video_resource, get_youtube_service
-from .models import SyllabusOptions, CompleteCourse, AnalyzedPlaylist, VideoInfo, Section, Subsection, CourseBlueprint
+from .models import SyllabusOptions, CompleteCourse, AnalyzedPlaylist, VideoInfo, Section, Subsection, CourseBlueprint, SectionPlan
 from dotenv import load_dotenv
 from src.cleeroute.langGraph.learners_api.utils import resilient_retry_policy, get_llm
+from src.cleeroute.metrics import track
 from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.runnables import RunnableConfig
+from .progress import publish_option, publish_status
+from .prefetch import (
+    build_search_inputs, search_fingerprint, search_limit,
+    get_prefetched_search, get_prefetched_playlist, get_prefetched_video
+)
 from src.cleeroute.db.user_service import check_user_premium_status
 
 def build_course_from_blueprint(blueprint: CourseBlueprint, original_videos: List[VideoInfo]) -> CompleteCourse:
@@ -98,8 +105,105 @@ def create_fallback_course(playlist: AnalyzedPlaylist) -> CompleteCourse:
         tag="practice-focused", sections=sections
     )
 
-async def fast_data_collection(state: GraphState) -> dict:
+# Publication de chaque option dès qu'elle est prête (SSE / polling) au lieu d'attendre la plus lente
+SYLLABUS_INCREMENTAL_OPTIONS = os.getenv("SYLLABUS_INCREMENTAL_OPTIONS", "true").lower() == "true"
+
+# --- BLUEPRINT HIÉRARCHIQUE (grandes playlists) ---
+# Au-delà de BLUEPRINT_WINDOW_SIZE vidéos, la playlist est découpée en fenêtres blueprintées en parallèle,
+# puis recollées : le temps de génération reste celui d'UNE fenêtre, quelle que soit la longueur.
+BLUEPRINT_TIMEOUT = 25.0
+BLUEPRINT_WINDOW_SIZE = int(os.getenv("BLUEPRINT_WINDOW_SIZE", 150))
+BLUEPRINT_WINDOW_CONCURRENCY = int(os.getenv("BLUEPRINT_WINDOW_CONCURRENCY", 8))
+
+
+def _fallback_plans(start: int, end: int, chunk: int = 5) -> List[SectionPlan]:
+    """Découpage mécanique (comme create_fallback_course) d'une plage [start, end[ d'indices."""
+    return [
+        SectionPlan(
+            title=f"Module {i // chunk + 1}",
+            description=f"Videos {i + 1}-{min(i + chunk, end)}",
+            start_index=i,
+            end_index=min(i + chunk, end) - 1
+        )
+        for i in range(start, end, chunk)
+    ]
+
+
+def _clamp_window_plans(plans: List[SectionPlan], start: int, end: int) -> List[SectionPlan]:
+    """
+    Aligne les sections d'une fenêtre sur ses bornes : aucune section ne déborde sur la fenêtre voisine
+    et la dernière section ferme la fenêtre. La continuité interne reste assurée par la Relay Logic.
+    Indices renvoyés relatifs à la fenêtre (renumérotés depuis 0 malgré la consigne) : on les décale de `start`.
+    """
+    if start > 0 and plans and max(p.end_index for p in plans) < start:
+        print(f"--- Window [{start}-{end - 1}]: relative indices returned, shifted by {start} ---")
+        plans = [
+            SectionPlan(title=p.title, description=p.description, start_index=p.start_index + start, end_index=p.end_index + start)
+            for p in plans
+        ]
+
+    clamped = []
+    for plan in sorted(plans, key=lambda x: x.start_index):
+        plan_end = max(start, min(plan.end_index, end - 1))
+        plan_start = max(start, min(plan.start_index, plan_end))
+        clamped.append(SectionPlan(title=plan.title, description=plan.description, start_index=plan_start, end_index=plan_end))
+    if not clamped:
+        return _fallback_plans(start, end)
+    last = clamped[-1]
+    clamped[-1] = SectionPlan(title=last.title, description=last.description, start_index=last.start_index, end_index=end - 1)
+    return clamped
+
+
+async def blueprint_windowed(chain, pl: AnalyzedPlaylist, user_input: str, lang: str, semaphore: asyncio.Semaphore) -> CourseBlueprint:
+    """Blueprint d'une grande playlist : fenêtres en parallèle (indices globaux), puis fusion."""
+    videos = pl.videos
+    windows = [(start, min(start + BLUEPRINT_WINDOW_SIZE, len(videos))) for start in range(0, len(videos), BLUEPRINT_WINDOW_SIZE)]
+    print(f"--- Hierarchical blueprint for '{pl.playlist_title}': {len(windows)} windows of {BLUEPRINT_WINDOW_SIZE} ---")
+
+    async def run_window(start: int, end: int) -> Optional[CourseBlueprint]:
+        # Indices GLOBAUX dans le texte : les sections renvoyées sont directement dans le repère de la playlist
+        video_list_txt = "\n".join([f"[{i}] {videos[i].title[:80]}" for i in range(start, end)])
+        async with semaphore:
+            try:
+                return await asyncio.wait_for(
+                    chain.ainvoke({
+                        "user_input": user_input,
+                        "language": lang,
+                        "playlist_title": pl.playlist_title,
+                        "video_count": end - start,
+                        "min_index": start,
+                        "max_index": end - 1,
+                        "video_list_text": video_list_txt
+                    }),
+                    timeout=BLUEPRINT_TIMEOUT
+                )
+            except Exception as e:
+                print(f"--- Window [{start}-{end - 1}] of '{pl.playlist_title}' failed: {e} -> mechanical split ---")
+                return None
+
+    results = await asyncio.gather(*[run_window(start, end) for start, end in windows])
+
+    header = next((bp for bp in results if bp is not None), None)
+    if header is None:
+        raise ValueError("All blueprint windows failed")
+
+    merged_sections = []
+    for (start, end), bp in zip(windows, results):
+        plans = bp.sections if bp is not None else []
+        merged_sections.extend(_clamp_window_plans(plans, start, end))
+
+    return CourseBlueprint(
+        course_title=header.course_title,
+        course_introduction=header.course_introduction,
+        course_tag=header.course_tag,
+        sections=merged_sections
+    )
+
+
+@track("graph_node", "syllabus.collection")
+async def fast_data_collection(state: GraphState, config: RunnableConfig) -> dict:
     print("--- NODE: Smart Data Collection ---")
+    thread_id = (config or {}).get("configurable", {}).get("thread_id")
     user_links = state.get('user_input_links', [])
     user_text = state.get('user_input_text', "")
     history = state.get('conversation_history', [])
@@ -111,18 +215,33 @@ async def fast_data_collection(state: GraphState) -> dict:
         is_premium = await check_user_premium_status(user_id)
     
     # Définition de la limite : 10 pour Premium, 2 pour Free/Anon
-    SEARCH_LIMIT = 10 if is_premium else 2
+    SEARCH_LIMIT = search_limit(is_premium)
     print(f"--- 🔒 Access Level: {'PREMIUM (10)' if is_premium else 'STANDARD (2)'} ---")
     
     playlists = []
     
+    # Résultats préchauffés pendant la conversation (course_gen/prefetch.py), sinon appel à froid
+    async def warm_playlist(source: str):
+        if thread_id:
+            warm = await get_prefetched_playlist(thread_id, source)
+            if warm:
+                return warm
+        return await fetch_playlist_light(source)
+
+    async def warm_video(url: str):
+        if thread_id:
+            warm = await get_prefetched_video(thread_id, url)
+            if warm:
+                return warm
+        return await analyze_single_video(url)
+
     # CAS A: LIENS DIRECTS (Priorité absolue)
     if user_links:
         tasks = []
         for link in user_links:
             l_type = classify_youtube_url(link)
-            if l_type == 'playlist': tasks.append(fetch_playlist_light(link))
-            elif l_type == 'video': tasks.append(analyze_single_video(link))
+            if l_type == 'playlist': tasks.append(warm_playlist(link))
+            elif l_type == 'video': tasks.append(warm_video(link))
         
         results = await asyncio.gather(*tasks, return_exceptions=True)
         for r in results:
@@ -133,20 +252,23 @@ async def fast_data_collection(state: GraphState) -> dict:
     # CAS B: RECHERCHE INTELLIGENTE
     if not playlists:
         # Contextualisation légère
-        query = user_text
-        summary = ""
-        if history: 
-            summary = "\n".join([f"{h} -> {a}" for h, a in history])
-            query = f"{user_text} {history[-1][0]}"
+        query, summary = build_search_inputs(user_text, history)
         
         # 1. Recherche + Curation (Max 3s)
-        # On passe le résumé de conversation pour que l'IA choisisse bien
-        target_ids = await smart_search_and_curate(query, summary, lang, limit=SEARCH_LIMIT)
+        # Si le prefetch a déjà fait EXACTEMENT cette recherche pendant la conversation, on la réutilise
+        target_ids = None
+        if thread_id:
+            target_ids = await get_prefetched_search(thread_id, search_fingerprint(query, summary, lang, SEARCH_LIMIT))
+            if target_ids is not None:
+                print(f"--- ♨️ Using prefetched curation ({len(target_ids)} playlists) ---")
+        if target_ids is None:
+            # On passe le résumé de conversation pour que l'IA choisisse bien
+            target_ids = await smart_search_and_curate(query, summary, lang, limit=SEARCH_LIMIT)
         
         # 2. Fetching des résultats sélectionnés
         if target_ids:
             print(f"--- Fetching {len(target_ids)} curated playlists ---")
-            fetched = await asyncio.gather(*[fetch_playlist_light(pid) for pid in target_ids])
+            fetched = await asyncio.gather(*[warm_playlist(pid) for pid in target_ids])
             playlists = [p for p in fetched if p and p.videos]
 
     # ---------------------------------------------------------
@@ -159,9 +281,10 @@ async def fast_data_collection(state: GraphState) -> dict:
         try:
             print("--- Attempting Broad Search Fallback ---")
             service = get_youtube_service()
-            broad_res = await asyncio.to_thread(
-                service.search().list(q=user_text, type="playlist", part="snippet", maxResults=1).execute
-            )
+            with track("youtube_call", "search.list"):
+                broad_res = await asyncio.to_thread(
+                    service.search().list(q=user_text, type="playlist", part="snippet", maxResults=1).execute
+                )
             items = broad_res.get("items", [])
             if items:
                 pid = items[0]["id"]["playlistId"]
@@ -199,8 +322,11 @@ async def fast_data_collection(state: GraphState) -> dict:
     return {"merged_resources_str": serialized, "status": "resources_merged"}
 
 
-async def fast_syllabus_generation(state: GraphState) -> dict:
+@track("graph_node", "syllabus.generation")
+async def fast_syllabus_generation(state: GraphState, config: RunnableConfig) -> dict:
     print("--- NODE: Fast Syllabus Generation ---")
+    thread_id = (config or {}).get("configurable", {}).get("thread_id")
+    incremental = SYLLABUS_INCREMENTAL_OPTIONS and thread_id is not None
     merged_str = state.get('merged_resources_str', [])
     if not merged_str:
         return {"status": "generation_failed_empty", "final_syllabus_options_str": None}
@@ -213,14 +339,26 @@ async def fast_syllabus_generation(state: GraphState) -> dict:
     llm = get_llm() 
     structured_llm = llm.with_structured_output(CourseBlueprint)
 
+    prompt = ChatPromptTemplate.from_template(Prompts.STRUCTURE_GENERATION_PROMPT)
+    chain = prompt | structured_llm
+    # Partagé entre toutes les playlists : borne le nombre d'appels LLM simultanés pour les grandes playlists
+    window_semaphore = asyncio.Semaphore(BLUEPRINT_WINDOW_CONCURRENCY)
+
     async def process_playlist_async(pl: AnalyzedPlaylist):
-        if not pl.videos: return None
+        """Retourne (cours, statut) avec statut = completed | fallback | failed."""
+        if not pl.videos: return None, "failed"
+
+        # Grandes playlists : mode hiérarchique (fenêtres parallèles)
+        if len(pl.videos) > BLUEPRINT_WINDOW_SIZE:
+            try:
+                blueprint = await blueprint_windowed(chain, pl, user_input, lang, window_semaphore)
+                return build_course_from_blueprint(blueprint, pl.videos), "completed"
+            except Exception as e:
+                print(f"--- Error '{pl.playlist_title}': {e} -> Fallback ---")
+                return create_fallback_course(pl), "fallback"
         
         # Optimisation Token: On envoie index + titre tronqué
         video_list_txt = "\n".join([f"[{i}] {v.title[:80]}" for i, v in enumerate(pl.videos)])
-        
-        prompt = ChatPromptTemplate.from_template(Prompts.STRUCTURE_GENERATION_PROMPT)
-        chain = prompt | structured_llm
 
         try:
             print(f"--- Generating blueprint for '{pl.playlist_title}' ({len(pl.videos)} videos)...")
@@ -231,19 +369,35 @@ async def fast_syllabus_generation(state: GraphState) -> dict:
                     "language": lang,
                     "playlist_title": pl.playlist_title,
                     "video_count": len(pl.videos),
+                    "min_index": 0,
                     "max_index": len(pl.videos) - 1,
                     "video_list_text": video_list_txt
                 }), 
-                timeout=25.0 
+                timeout=BLUEPRINT_TIMEOUT
             )
-            return build_course_from_blueprint(blueprint, pl.videos)
+            return build_course_from_blueprint(blueprint, pl.videos), "completed"
 
         except Exception as e:
             print(f"--- Error '{pl.playlist_title}': {e} -> Fallback ---")
-            return create_fallback_course(pl)
+            return create_fallback_course(pl), "fallback"
+
+    async def process_and_publish(index: int, pl: AnalyzedPlaylist):
+        course, option_status = await process_playlist_async(pl)
+        if incremental:
+            # Persistée + publiée immédiatement : la première option arrive au rythme de la playlist la plus rapide
+            await publish_option(
+                thread_id, index, option_status, pl.playlist_title,
+                course.model_dump(mode="json") if course is not None else None
+            )
+        return course
+
+    if incremental:
+        await publish_status(thread_id, "generating_options")
+        for index, pl in enumerate(playlists):
+            await publish_option(thread_id, index, "pending", pl.playlist_title)
 
-    # Exécution Parallèle
-    tasks = [process_playlist_async(pl) for pl in playlists]
+    # Exécution Parallèle (l'ordre final des options reste celui des playlists)
+    tasks = [process_and_publish(i, pl) for i, pl in enumerate(playlists)]
     results = await asyncio.gather(*tasks)
     
     valid_courses = [c for c in results if c is not None]
@@ -182,10 +182,17 @@ class JourneyProgress(BaseModel):
     label: str              # Ex: "Searching YouTube"
     description: str        # Ex: "Analyzing top 50 playlists for relevance..."
 
+class SyllabusOptionStatus(BaseModel):
+    index: int              # Position de la playlist dans les options
+    playlist_title: str
+    status: str             # pending | completed | fallback | failed
+
 class JourneyStatusResponse(BaseModel):
     status: str
     thread_id: str
     output: Optional[Dict] = None
     next_question: Optional[str] = None
     # Ajout du champ optionnel pour le tracking
-    progress: Optional[JourneyProgress] = None
\ No newline at end of file
+    progress: Optional[JourneyProgress] = None
+    # Statut de chaque option de syllabus (publiées au fil de l'eau pendant la génération)
+    options: Optional[List[SyllabusOptionStatus]] = None
\ No newline at end of file
@@ -0,0 +1,211 @@
+# in prefetch.py
+import os
+import json
+import asyncio
+import hashlib
+from typing import Dict, List, Optional, Tuple
+from src.cleeroute.db.redis_client import get_redis
+from src.cleeroute.db.user_service import check_user_premium_status
+from .models import AnalyzedPlaylist, VideoInfo
+from .state import PydanticSerializer
+from .services import smart_search_and_curate, fetch_playlist_light, classify_youtube_url, analyze_single_video, youtube_api_key_var, YOUTUBE_API_KEY
+
+# Les résultats spéculatifs restent disponibles le temps d'une conversation
+PREFETCH_TTL_SECONDS = int(os.getenv("PREFETCH_TTL_SECONDS", 3600))
+# Attente max côté collecte si le prefetch correspondant est encore en cours
+PREFETCH_WAIT_SECONDS = float(os.getenv("PREFETCH_WAIT_SECONDS", 8))
+PREFETCH_ENABLED = os.getenv("SYLLABUS_PREFETCH_ENABLED", "true").lower() == "true"
+# Délai avant la recherche : un tour plus récent annule le prefetch avant qu'il ne consomme du quota
+PREFETCH_DEBOUNCE_SECONDS = float(os.getenv("PREFETCH_DEBOUNCE_SECONDS", 3))
+# Recherches spéculatives max par conversation (une recherche YouTube = 100 unités de quota)
+PREFETCH_MAX_SEARCHES = int(os.getenv("PREFETCH_MAX_SEARCHES", 3))
+
+# Tâches en cours dans CE process (une par thread : la plus récente remplace la précédente)
+_prefetch_tasks: Dict[str, asyncio.Task] = {}
+
+
+def _key(thread_id: str) -> str:
+    return f"syllabus:prefetch:{thread_id}"
+
+
+def build_search_inputs(user_text: str, history: List[Tuple[str, str]]) -> Tuple[str, str]:
+    """Contextualisation légère de la recherche (partagée avec fast_data_collection)."""
+    query = user_text
+    summary = ""
+    if history:
+        summary = "\n".join([f"{h} -> {a}" for h, a in history])
+        query = f"{user_text} {history[-1][0]}"
+    return query, summary
+
+
+def search_fingerprint(query: str, summary: str, language: str, limit: int) -> str:
+    raw = json.dumps([query, summary, language, limit])
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:24]
+
+
+def search_limit(is_premium: bool) -> int:
+    # 10 pour Premium, 2 pour Free/Anon
+    return 10 if is_premium else 2
+
+
+# ---------------------------------------------------------------------------
+# LECTURE (nœud de collecte, côté worker)
+# ---------------------------------------------------------------------------
+
+async def get_prefetched_search(thread_id: str, fingerprint: str, wait_seconds: float = PREFETCH_WAIT_SECONDS) -> Optional[List[str]]:
+    """
+    IDs curés par le prefetch pour exactement cette recherche.
+    Si le prefetch tourne encore, on l'attend un peu (il a de l'avance sur un appel à froid).
+    """
+    redis = get_redis()
+    if redis is None:
+        return None
+
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + wait_seconds
+    while True:
+        try:
+            raw = await redis.hget(_key(thread_id), f"search:{fingerprint}")
+        except Exception as e:
+            print(f"[PREFETCH] Read failed: {e}")
+            return None
+        if raw is None:
+            return None
+
+        entry = json.loads(raw)
+        if entry["status"] == "ready":
+            return entry["ids"]
+        if loop.time() >= deadline:
+            return None
+        await asyncio.sleep(0.5)
+
+
+async def get_prefetched_playlist(thread_id: str, source: str) -> Optional[AnalyzedPlaylist]:
+    """Playlist déjà récupérée par le prefetch (source = ID ou URL de playlist)."""
+    redis = get_redis()
+    if redis is None:
+        return None
+    try:
+        raw = await redis.hget(_key(thread_id), f"playlist:{source}")
+    except Exception:
+        return None
+    return PydanticSerializer.loads(raw, AnalyzedPlaylist) if raw else None
+
+
+async def get_prefetched_video(thread_id: str, url: str) -> Optional[VideoInfo]:
+    redis = get_redis()
+    if redis is None:
+        return None
+    try:
+        raw = await redis.hget(_key(thread_id), f"video:{url}")
+    except Exception:
+        return None
+    return PydanticSerializer.loads(raw, VideoInfo) if raw else None
+
+
+# ---------------------------------------------------------------------------
+# ÉCRITURE (spéculative, côté API pendant la conversation)
+# ---------------------------------------------------------------------------
+
+async def _hset(redis, thread_id: str, field: str, value: str):
+    key = _key(thread_id)
+    await redis.hset(key, field, value)
+    await redis.expire(key, PREFETCH_TTL_SECONDS)
+
+
+async def _prefetch_playlist(redis, thread_id: str, source: str):
+    # Déjà en cache pour ce thread (tour précédent) : rien à refaire
+    if await redis.hexists(_key(thread_id), f"playlist:{source}"):
+        return
+    playlist = await fetch_playlist_light(source)
+    if playlist and playlist.videos:
+        await _hset(redis, thread_id, f"playlist:{source}", PydanticSerializer.dumps(playlist))
+
+
+async def _run_prefetch(thread_id: str, user_text: str, links: List[str], history: List[Tuple[str, str]],
+                        language: str, user_id: Optional[str], youtube_api_key: Optional[str]):
+    redis = get_redis()
+    if redis is None:
+        return
+    # Clé de l'apprenant, sinon la clé par défaut du serveur (jamais os.environ, partagé entre requêtes)
+    youtube_api_key_var.set(youtube_api_key or YOUTUBE_API_KEY)
+
+    # CAS A : liens directs (indépendants des réponses, prefetchés une seule fois)
+    if links:
+        for link in links:
+            l_type = classify_youtube_url(link)
+            if l_type == 'playlist':
+                await _prefetch_playlist(redis, thread_id, link)
+            elif l_type == 'video' and not await redis.hexists(_key(thread_id), f"video:{link}"):
+                video = await analyze_single_video(link)
+                if video:
+                    await _hset(redis, thread_id, f"video:{link}", PydanticSerializer.dumps(video))
+        return
+
+    # CAS B : recherche + curation, avec exactement les entrées qu'utilisera la collecte
+    is_premium = await check_user_premium_status(user_id) if user_id else False
+    limit = search_limit(is_premium)
+    query, summary = build_search_inputs(user_text, history)
+    fingerprint = search_fingerprint(query, summary, language, limit)
+    field = f"search:{fingerprint}"
+
+    if await redis.hexists(_key(thread_id), field):
+        return
+
+    # Debounce : annulé pendant l'attente si l'apprenant répond de nouveau
+    if PREFETCH_DEBOUNCE_SECONDS > 0:
+        await asyncio.sleep(PREFETCH_DEBOUNCE_SECONDS)
+    searches = await redis.hincrby(_key(thread_id), "searches", 1)
+    await redis.expire(_key(thread_id), PREFETCH_TTL_SECONDS)
+    if PREFETCH_MAX_SEARCHES > 0 and searches > PREFETCH_MAX_SEARCHES:
+        print(f"--- [PREFETCH] {thread_id}: search budget exhausted ({PREFETCH_MAX_SEARCHES}), skipping ---")
+        return
+    await _hset(redis, thread_id, field, json.dumps({"status": "running", "ids": []}))
+
+    try:
+        target_ids = await smart_search_and_curate(query, summary, language, limit=limit)
+        await _hset(redis, thread_id, field, json.dumps({"status": "ready", "ids": target_ids}))
+        await asyncio.gather(*[_prefetch_playlist(redis, thread_id, pid) for pid in target_ids])
+        print(f"--- [PREFETCH] {thread_id}: {len(target_ids)} playlists warmed ---")
+    except asyncio.CancelledError:
+        # Remplacé par un prefetch plus récent : la collecte ne doit pas attendre celui-ci
+        await redis.hdel(_key(thread_id), field)
+        raise
+
+
+async def _run_prefetch_safe(thread_id: str, **kwargs):
+    try:
+        await _run_prefetch(thread_id, **kwargs)
+    except asyncio.CancelledError:
+        pass
+    except Exception as e:
+        # Purement spéculatif : un échec ne doit jamais impacter la conversation
+        print(f"[PREFETCH] {thread_id} failed: {e}")
+    finally:
+        if _prefetch_tasks.get(thread_id) is asyncio.current_task():
+            _prefetch_tasks.pop(thread_id, None)
+
+
+def start_prefetch(thread_id: str, user_text: str, links: List[str], history: List[Tuple[str, str]],
+                   language: str, user_id: Optional[str] = None, youtube_api_key: Optional[str] = None):
+    """
+    Lance (en arrière-plan) la recherche YouTube + curation + récupération des playlists
+    pendant que l'apprenant répond aux questions. Un nouvel appel pour le même thread
+    remplace le prefetch précédent (la requête a été affinée par la dernière réponse).
+    """
+    if not PREFETCH_ENABLED:
+        return
+
+    previous = _prefetch_tasks.get(thread_id)
+    if previous and not previous.done() and not links:
+        previous.cancel()
+
+    _prefetch_tasks[thread_id] = asyncio.create_task(_run_prefetch_safe(
+        thread_id,
+        user_text=user_text,
+        links=links,
+        history=list(history),
+        language=language,
+        user_id=user_id,
+        youtube_api_key=youtube_api_key
+    ))
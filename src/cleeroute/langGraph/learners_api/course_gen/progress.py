@@ -0,0 +1,154 @@
+# in progress.py
+import json
+import time
+from typing import Optional, Dict, Any, AsyncGenerator, Awaitable, Callable
+from src.cleeroute.db.redis_client import get_redis
+
+# Le statut d'une génération reste lisible 24h (le résultat final est aussi dans le checkpoint)
+STATUS_TTL_SECONDS = 24 * 3600
+TERMINAL_STATUSES = ("completed", "generation_failed_empty", "failed")
+
+
+def _status_key(thread_id: str) -> str:
+    return f"syllabus:status:{thread_id}"
+
+
+def _channel(thread_id: str) -> str:
+    return f"syllabus:events:{thread_id}"
+
+
+async def publish_event(thread_id: str, event: str, data: Dict[str, Any]):
+    """Publie un événement sur le canal de la génération (sans toucher à la ligne de statut)."""
+    redis = get_redis()
+    if redis is None:
+        return
+    try:
+        await redis.publish(_channel(thread_id), json.dumps({"event": event, **data}))
+    except Exception as e:
+        print(f"[PROGRESS] Publish failed for {thread_id}: {e}")
+
+
+async def publish_status(thread_id: str, status: str, output: Optional[Dict] = None):
+    """
+    Met à jour la ligne de statut (hash Redis, lue par le polling) puis notifie les abonnés SSE.
+    `output` (SyllabusOptions sérialisé) n'est envoyé qu'à la fin.
+    """
+    redis = get_redis()
+    if redis is None:
+        return
+
+    fields = {"status": status, "updated_at": str(time.time())}
+    if output is not None:
+        fields["output"] = json.dumps(output)
+
+    try:
+        key = _status_key(thread_id)
+        if status == "starting":
+            # Nouvelle génération (ou relance) sur ce thread : on efface le résultat et les options précédents
+            await redis.delete(key)
+        await redis.hset(key, mapping=fields)
+        await redis.expire(key, STATUS_TTL_SECONDS)
+    except Exception as e:
+        print(f"[PROGRESS] Status write failed for {thread_id}: {e}")
+
+    payload = {"status": status}
+    if output is not None:
+        payload["output"] = output
+    await publish_event(thread_id, "status", payload)
+
+
+async def publish_option(thread_id: str, index: int, status: str, playlist_title: str, course: Optional[Dict] = None):
+    """
+    Persiste et publie UNE option de syllabus dès que sa playlist est traitée.
+    status : pending | completed | fallback | failed
+    """
+    redis = get_redis()
+    if redis is None:
+        return
+
+    option = {"index": index, "status": status, "playlist_title": playlist_title}
+    if course is not None:
+        option["course"] = course
+
+    try:
+        key = _status_key(thread_id)
+        await redis.hset(key, f"option:{index}", json.dumps(option))
+        await redis.expire(key, STATUS_TTL_SECONDS)
+    except Exception as e:
+        print(f"[PROGRESS] Option write failed for {thread_id}: {e}")
+
+    await publish_event(thread_id, "option", option)
+
+
+async def read_status(thread_id: str) -> Optional[Dict[str, Any]]:
+    """Lecture de la ligne de statut (None si inconnue ou Redis indisponible)."""
+    redis = get_redis()
+    if redis is None:
+        return None
+    try:
+        fields = await redis.hgetall(_status_key(thread_id))
+    except Exception as e:
+        print(f"[PROGRESS] Status read failed for {thread_id}: {e}")
+        return None
+    if not fields:
+        return None
+
+    status = {k: v for k, v in fields.items() if not k.startswith("option:")}
+    if "output" in status:
+        status["output"] = json.loads(status["output"])
+
+    options = [json.loads(v) for k, v in fields.items() if k.startswith("option:")]
+    if options:
+        status["options"] = sorted(options, key=lambda o: o["index"])
+    return status
+
+
+async def subscribe_events(
+    thread_id: str,
+    heartbeat_seconds: float = 15.0,
+    fallback: Optional[Callable[[str], Awaitable[Optional[Dict[str, Any]]]]] = None
+) -> AsyncGenerator[Optional[Dict[str, Any]], None]:
+    """
+    Itère sur les événements de la génération.
+    Émet d'abord l'état courant, puis relaie le canal ; `None` signale un heartbeat (aucun message).
+    S'arrête sur un statut terminal.
+    `fallback` : lecture de l'état quand la ligne de statut manque (ex: checkpoint du graphe) ;
+    si elle ne connaît pas non plus la génération, un événement `error` est émis et le flux se ferme.
+    """
+    redis = get_redis()
+    if redis is None:
+        raise RuntimeError("Progress channel unavailable (REDIS_URL not configured).")
+
+    pubsub = redis.pubsub()
+    # On s'abonne AVANT de lire l'état courant : aucun événement ne peut tomber entre les deux
+    await pubsub.subscribe(_channel(thread_id))
+    try:
+        snapshot = await read_status(thread_id)
+        if not snapshot and fallback is not None:
+            # Ligne de statut expirée (24h) ou génération antérieure : sans ce repli, le flux ne ferait
+            # qu'émettre des heartbeats pour une génération déjà terminée
+            snapshot = await fallback(thread_id)
+            if snapshot is None:
+                yield {"event": "error", "content": "Journey thread not found."}
+                return
+        if snapshot:
+            yield {"event": "status", **snapshot}
+            if snapshot.get("status") in TERMINAL_STATUSES:
+                return
+
+        while True:
+            message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=heartbeat_seconds)
+            if message is None:
+                yield None
+                continue
+
+            event = json.loads(message["data"])
+            yield event
+            if event.get("event") == "status" and event.get("status") in TERMINAL_STATUSES:
+                return
+    finally:
+        try:
+            await pubsub.unsubscribe(_channel(thread_id))
+            await pubsub.close()
+        except Exception:
+            pass
@@ -90,11 +90,12 @@ class Prompts:
         - Playlist Title: "{playlist_title}"
         - Language: "{language}"
 
-        **VIDEO LIST (Indexed):**
+        **VIDEO LIST ({video_count} videos, indexed from {min_index} to {max_index}):**
         {video_list_text}
 
         **CRITICAL RULES (MUST FOLLOW):**
-        1. **NO REORDERING:** The course MUST follow the exact order of the indices provided [0, 1, 2, ...]. Do NOT shuffle the videos.
+        1. **NO REORDERING:** The course MUST follow the exact order of the indices provided [{min_index}, {min_index} + 1, ..., {max_index}]. Do NOT shuffle the videos.
+           Use the indices EXACTLY as written in the list (do not renumber them from 0).
 
         2. **CONTIGUOUS BLOCKS:** Every section must consist of a block of contiguous indices (e.g., [0, 1, 2, 3]). Do not skip numbers within a section.
 
@@ -109,5 +110,5 @@ class Prompts:
 
         **OUTPUT:**
         Return ONLY a valid JSON object matching the `CourseBlueprint` schema.
-        In `video_indices`, list the integers belonging to each section.
+        In `start_index` / `end_index`, give the first and last index of each section, between {min_index} and {max_index}.
     """
\ No newline at end of file
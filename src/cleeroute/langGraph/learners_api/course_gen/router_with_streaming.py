@@ -2,7 +2,6 @@
 
 import uuid
 from typing import Optional
-import os
 from fastapi import APIRouter, HTTPException, Depends, BackgroundTasks, Header
 from langgraph.pregel import Pregel
 
@@ -14,6 +13,7 @@ from .models import (
 )
 
 from .state import PydanticSerializer
+from .prefetch import start_prefetch
 from .dependencies import get_conversation_graph
 
 # for treamings APIs 
@@ -85,8 +85,6 @@ async def start_learning_journey(
     thread_id = str(uuid.uuid4())
     config = {"configurable": {"thread_id": thread_id}}
 
-    os.environ['YOUTUBE_API_KEY'] = x_youtube_api_key if x_youtube_api_key else os.getenv("YOUTUBE_API_KEY")
-
     # Préparation de l'état initial (comme avant)
     user_links_str = []
     if request.user_input_links:
@@ -100,6 +98,12 @@ async def start_learning_journey(
         "user_id": request.user_id 
     }
 
+    # Recherche spéculative des ressources pendant que la conversation se déroule
+    start_prefetch(
+        thread_id, request.user_input_text, user_links_str, [],
+        request.language, user_id=request.user_id, youtube_api_key=x_youtube_api_key
+    )
+
     # RETOURNER UNE STREAMING RESPONSE
     # Le frontend devra lire ce flux ligne par ligne
     return StreamingResponse(
@@ -112,6 +116,7 @@ async def start_learning_journey(
 async def continue_learning_journey(
     thread_id: str,
     request: ContinueJourneyRequest,
+    x_youtube_api_key: Optional[str] = Header(None, alias="X-Youtube-Api-Key"),
     app_graph: Pregel = Depends(get_conversation_graph)
 ):
     config = {"configurable": {"thread_id": thread_id}}
@@ -125,6 +130,15 @@ async def continue_learning_journey(
     update_payload = {"conversation_history": [(request.user_answer, "")]}
     await app_graph.aupdate_state(config, update_payload)
 
+    # Prefetch affiné avec la nouvelle réponse (identique à ce que verra la collecte si c'est le dernier tour)
+    current_values = current_snapshot.values or {}
+    start_prefetch(
+        thread_id, current_values.get('user_input_text', ''), current_values.get('user_input_links', []),
+        list(current_values.get('conversation_history', [])) + [(request.user_answer, "")],
+        current_values.get('language', 'English'), user_id=current_values.get('user_id'),
+        youtube_api_key=x_youtube_api_key
+    )
+
     # Lancement du stream
     return StreamingResponse(
         stream_graph_execution(app_graph, None, config),
@@ -1,11 +1,10 @@
 # In routers.py
 
 import uuid
-from typing import Dict, Optional
+from typing import Dict, List, Optional
 from .tasks import generate_syllabus_task
 
-import os
-from fastapi import APIRouter, HTTPException, Body, Depends, BackgroundTasks, Header
+from fastapi import APIRouter, HTTPException, Body, Depends, BackgroundTasks, Header, Request
 from langgraph.pregel import Pregel
 
 from .config import PROGRESS_MAPPING, TOTAL_STEPS
@@ -15,13 +14,16 @@ from .models import (
     SyllabusOptions, 
     StartJourneyResponse, 
     ContinueJourneyRequest, 
-    JourneyStatusResponse
+    JourneyStatusResponse,
+    SyllabusOptionStatus
 )
 
 from .state import GraphState, PydanticSerializer
+from .prefetch import start_prefetch
 from .dependencies import get_conversation_graph, get_syllabus_graph
 from .tasks import generate_syllabus_task
 from .models import JourneyProgress, JourneyStatusResponse
+from .progress import read_status, subscribe_events, publish_status
 
 # for treamings APIs 
 from fastapi.responses import StreamingResponse
@@ -63,8 +65,6 @@ async def start_learning_journey(
     thread_id = str(uuid.uuid4())
     config = {"configurable": {"thread_id": thread_id}}
 
-    os.environ['YOUTUBE_API_KEY'] = x_youtube_api_key if x_youtube_api_key else os.getenv("YOUTUBE_API_KEY")
-
     user_links_str = []
     if request.user_input_links:
         # On convertit la liste de HttpUrl en une liste de chaînes de caractères
@@ -76,8 +76,15 @@ async def start_learning_journey(
         "user_input_links": user_links_str,
         "metadata_str": PydanticSerializer.dumps(request.metadata),
         "language": request.language,
+        "user_id": request.user_id
     }
 
+    # Recherche spéculative des ressources pendant que la conversation se déroule
+    start_prefetch(
+        thread_id, request.user_input_text, user_links_str, [],
+        request.language, user_id=request.user_id, youtube_api_key=x_youtube_api_key
+    )
+
 
     # Stream the graph. It will run until the first interruption (the first question).
     last_state = None
@@ -108,6 +115,7 @@ async def start_learning_journey(
 async def continue_learning_journey(
     thread_id: str,
     request: ContinueJourneyRequest,
+    x_youtube_api_key: Optional[str] = Header(None, alias="X-Youtube-Api-Key"),
     app_graph: Pregel = Depends(get_conversation_graph)
 ):
     """
@@ -143,6 +151,14 @@ async def continue_learning_journey(
 
     await app_graph.aupdate_state(config, update_payload)
 
+    # Prefetch affiné avec la nouvelle réponse (identique à ce que verra la collecte si c'est le dernier tour)
+    start_prefetch(
+        thread_id, current_values.get('user_input_text', ''), current_values.get('user_input_links', []),
+        list(current_history) + [(request.user_answer, "")],
+        current_values.get('language', 'English'), user_id=current_values.get('user_id'),
+        youtube_api_key=x_youtube_api_key
+    )
+
     async for final_state in app_graph.astream(None, config, stream_mode="values"):
         pass
 
@@ -197,9 +213,13 @@ async def generate_syllabus(
         3.  **Immediate Return:** Returns a 202 Accepted status to unblock the UI.
 
         **Next Steps:**
-        - The client must poll the **GET /gen_syllabus/{thread_id}/status** endpoint every few seconds to check progress and retrieve the final JSON result.
+        - The client should listen to **GET /gen_syllabus/{thread_id}/events** (SSE) to follow progress and receive the final JSON result.
+        - Polling **GET /gen_syllabus/{thread_id}/status** every few seconds remains available as a fallback.
     """
 
+    # Ligne de statut initialisée tout de suite (le worker peut mettre quelques secondes à démarrer)
+    await publish_status(thread_id, "starting")
+
     # Lancement de la tâche Celery
     task = generate_syllabus_task.delay(thread_id, x_youtube_api_key)
     print(f"Tâche envoyée à Celery avec l'ID: {task.id}")  # Log pour confirmer l'envoi
@@ -209,36 +229,21 @@ async def generate_syllabus(
         next_question="Syllabus generation has started. Please check the status endpoint in a few moments."
     )
 
-@syllabus_router.get("/gen_syllabus/{thread_id}/status", response_model=JourneyStatusResponse, summary="Get the status of a journey")
-async def get_journey_status(
-    thread_id: str,
-    app_graph: Pregel = Depends(get_syllabus_graph)
-):
+def _build_journey_response(thread_id: str, graph_status: str, output_dict: Optional[Dict], options: Optional[List[Dict]] = None) -> JourneyStatusResponse:
     """
-    Checks the progress of the background syllabus generation task.
-    Poll this every 3-5 seconds.
+    Construit la réponse de statut (commune au polling Redis et au fallback checkpoint).
+    `options` : statut de chaque option publiée au fil de l'eau par le worker (avec le cours une fois prêt).
     """
-    config = {"configurable": {"thread_id": thread_id}}
-
-    # 1. Récupération de l'état du Graphe
-    try:
-        snapshot = await app_graph.aget_state(config)
-    except Exception:
-        # Si le thread_id n'existe pas ou erreur de connexion DB
-        raise HTTPException(status_code=404, detail="Journey thread not found.")
-
-    if not snapshot:
-        raise HTTPException(status_code=404, detail="Journey state is empty.")
-
-    state = snapshot.values
-    
-    # Récupération du statut actuel (défini dans graph.py)
-    graph_status = state.get('status', 'starting')
-    final_syllabus_str = state.get('final_syllabus_options_str')
+    option_statuses = None
+    if options:
+        option_statuses = [
+            SyllabusOptionStatus(index=o["index"], playlist_title=o["playlist_title"], status=o["status"])
+            for o in options
+        ]
 
     # CAS 1 : PROCESSUS TERMINÉ (Succès ou Échec vide)
     if graph_status in ["completed", "generation_failed_empty"]:
-        
+
         # Statut 100%
         progress = JourneyProgress(
             current_step=TOTAL_STEPS,
@@ -248,25 +253,14 @@ async def get_journey_status(
             description="Generation complete."
         )
 
-        output_dict = {"syllabi": []}
-        
-        # Désérialisation sécurisée
-        if final_syllabus_str and final_syllabus_str != 'null':
-            try:
-                syllabus_obj = PydanticSerializer.loads(final_syllabus_str, SyllabusOptions)
-                if syllabus_obj.syllabi:
-                    output_dict = syllabus_obj.model_dump()
-            except Exception as e:
-                print(f"Error parsing final syllabus: {e}")
-                # On laisse output_dict vide en cas d'erreur de parsing
-
         # Réponse finale
-        if output_dict["syllabi"]:
+        if output_dict and output_dict.get("syllabi"):
             return JourneyStatusResponse(
                 status="completed",
                 thread_id=thread_id,
                 output=output_dict,
-                progress=progress
+                progress=progress,
+                options=option_statuses
             )
         else:
             # Cas où le graphe a fini mais n'a rien trouvé/généré
@@ -280,12 +274,12 @@ async def get_journey_status(
 
     # On récupère les infos d'affichage basées sur le statut technique
     mapping = PROGRESS_MAPPING.get(graph_status, PROGRESS_MAPPING["unknown"])
-    
+
     # Calcul du pourcentage
     percent = int((mapping["step"] / TOTAL_STEPS) * 100)
     # On plafonne à 90% tant que ce n'est pas fini pour l'UX
-    if percent >= 100: 
-        percent = 90 
+    if percent >= 100:
+        percent = 90
 
     progress_data = JourneyProgress(
         current_step=mapping["step"],
@@ -295,8 +289,110 @@ async def get_journey_status(
         description=mapping["desc"]
     )
 
+    # Options déjà prêtes : le front peut afficher le premier syllabus sans attendre les autres
+    partial_output = None
+    if options:
+        ready = [o["course"] for o in options if o.get("course")]
+        if ready:
+            partial_output = {"syllabi": ready}
+
     return JourneyStatusResponse(
-        status="in_progress",
+        status="failed" if graph_status == "failed" else "in_progress",
         thread_id=thread_id,
-        progress=progress_data
-    )
\ No newline at end of file
+        output=partial_output,
+        progress=progress_data,
+        options=option_statuses
+    )
+
+
+@syllabus_router.get("/gen_syllabus/{thread_id}/status", response_model=JourneyStatusResponse, summary="Get the status of a journey")
+async def get_journey_status(thread_id: str):
+    """
+    Checks the progress of the background syllabus generation task.
+    Prefer the streaming endpoint **GET /gen_syllabus/{thread_id}/events**; polling (every 3-5 seconds) remains supported.
+    """
+    # 1. Chemin rapide : la ligne de statut publiée par le worker (pas de chargement de checkpoint)
+    cached = await read_status(thread_id)
+    if cached:
+        return _build_journey_response(thread_id, cached.get("status", "starting"), cached.get("output"), cached.get("options"))
+
+    # 2. Fallback : état du Graphe (générations antérieures, Redis indisponible...)
+    checkpoint = await _read_checkpoint_status(thread_id)
+    if checkpoint is None:
+        raise HTTPException(status_code=404, detail="Journey thread not found.")
+    return _build_journey_response(thread_id, checkpoint["status"], checkpoint["output"])
+
+
+async def _read_checkpoint_status(thread_id: str) -> Optional[Dict]:
+    """
+    Statut et résultat lus dans le checkpoint du graphe, quand la ligne de statut Redis manque
+    (expirée après 24h, génération antérieure, Redis indisponible...). None si le thread est inconnu.
+    """
+    app_graph = await get_syllabus_graph()
+    config = {"configurable": {"thread_id": thread_id}}
+
+    try:
+        snapshot = await app_graph.aget_state(config)
+    except Exception:
+        # Si le thread_id n'existe pas ou erreur de connexion DB
+        return None
+
+    if not snapshot or not snapshot.values:
+        return None
+
+    state = snapshot.values
+
+    # Récupération du statut actuel (défini dans graph.py)
+    graph_status = state.get('status', 'starting')
+    final_syllabus_str = state.get('final_syllabus_options_str')
+
+    output_dict = None
+    # Désérialisation sécurisée
+    if graph_status in ["completed", "generation_failed_empty"] and final_syllabus_str and final_syllabus_str != 'null':
+        try:
+            syllabus_obj = PydanticSerializer.loads(final_syllabus_str, SyllabusOptions)
+            if syllabus_obj.syllabi:
+                output_dict = syllabus_obj.model_dump()
+        except Exception as e:
+            print(f"Error parsing final syllabus: {e}")
+            # On laisse output_dict vide en cas d'erreur de parsing
+
+    return {"status": graph_status, "output": output_dict}
+
+
+@syllabus_router.get("/gen_syllabus/{thread_id}/events", summary="Stream the progress of a journey (SSE)")
+async def stream_journey_events(thread_id: str, request: Request):
+    """
+    **Server-Sent Events stream of the background syllabus generation.**
+
+    Replaces status polling. The worker publishes every step, the endpoint relays it:
+    - `{"event": "status", "status": "...", "progress": {...}}` on each transition,
+    - `{"event": "option", "index": 0, "status": "completed", "playlist_title": "...", "course": {...}}` as soon as each course option is ready,
+    - the final event carries `output` (the syllabi) when `status` is `completed`.
+
+    The stream starts with the current status (read from the graph checkpoint when the status line
+    has expired) and closes itself on a terminal status (`completed`, `generation_failed_empty`, `failed`)
+    or with an `error` event if the journey is unknown.
+    """
+    async def event_generator():
+        try:
+            async for event in subscribe_events(thread_id, fallback=_read_checkpoint_status):
+                if await request.is_disconnected():
+                    break
+                if event is None:
+                    # Heartbeat : garde la connexion ouverte derrière les proxies
+                    yield ": keep-alive\n\n"
+                    continue
+
+                if event.get("event") == "status":
+                    # Options déjà prêtes (état initial lu dans Redis) : un client qui (re)connecte les reçoit aussi
+                    response = _build_journey_response(
+                        thread_id, event.get("status", "starting"), event.get("output"), event.get("options")
+                    )
+                    event = {"event": "status", **response.model_dump(exclude_none=True)}
+                yield f"data: {json.dumps(event)}\n\n"
+        except Exception as e:
+            print(f"Progress stream error: {e}")
+            yield f"data: {json.dumps({'event': 'error', 'content': str(e)})}\n\n"
+
+    return StreamingResponse(event_generator(), media_type="text/event-stream")
@@ -3,6 +3,7 @@ import json
 import asyncio
 import re
 import logging
+from contextvars import ContextVar
 from datetime import datetime
 from typing import List, Optional, Dict
 from urllib.parse import urlparse, parse_qs
@@ -18,14 +19,17 @@ from .models import AnalyzedPlaylist, VideoInfo, FilteredPlaylistSelection
 from .prompt import Prompts
 
 from src.cleeroute.langGraph.learners_api.utils import get_llm
-from src.cleeroute.db.user_service import get_active_pool
+from src.cleeroute.db.app_db import get_active_pool
+from src.cleeroute.metrics import track
 
 load_dotenv()
 
-# Vérification de la clé API au chargement du module
+# Clé par défaut ; vérifiée à la création du client (l'import du module ne doit pas échouer)
 YOUTUBE_API_KEY = os.getenv("YOUTUBE_API_KEY")
-if not YOUTUBE_API_KEY:
-    raise ValueError("YOUTUBE_API_KEY must be set in env")
+
+# Clé YouTube de la tâche en cours : les workers exécutent plusieurs générations en parallèle
+# dans le même process, os.environ ne peut donc pas porter une clé par tâche.
+youtube_api_key_var: ContextVar[Optional[str]] = ContextVar("youtube_api_key", default=None)
 
 def get_youtube_service():
     """
@@ -38,7 +42,10 @@ def get_youtube_service():
     Returns:
         googleapiclient.discovery.Resource: An authenticated YouTube API service object.
     """
-    return build('youtube', 'v3', developerKey=os.getenv("YOUTUBE_API_KEY"), cache_discovery=False)
+    api_key = youtube_api_key_var.get() or YOUTUBE_API_KEY
+    if not api_key:
+        raise ValueError("YOUTUBE_API_KEY must be set in env")
+    return build('youtube', 'v3', developerKey=api_key, cache_discovery=False)
 
 
 def get_video_id_from_url(url: str) -> Optional[str]:
@@ -159,7 +166,8 @@ async def fetch_playlist_light(playlist_input: str, limit: int = None) -> Option
                 videos=video_infos
             )
 
-        return await asyncio.to_thread(fetch_sync)
+        with track("youtube_call", "playlist.fetch"):
+            return await asyncio.to_thread(fetch_sync)
     except Exception as e:
         print(f"Error fetching playlist {playlist_id}: {e}")
         return None
@@ -184,7 +192,8 @@ async def analyze_single_video(video_url: str) -> Optional[VideoInfo]:
                 thumbnail_url=snippet.get("thumbnails", {}).get("medium", {}).get("url")
             )
             
-        return await asyncio.to_thread(fetch_sync)
+        with track("youtube_call", "videos.list"):
+            return await asyncio.to_thread(fetch_sync)
     except:
         return None
 
@@ -211,7 +220,8 @@ async def smart_search_and_curate(
                 q=search_term, part="snippet", type="playlist",
                 maxResults=fetch_count, relevanceLanguage=language[:2]
             ).execute()
-        response = await asyncio.to_thread(search_sync)
+        with track("youtube_call", "search.list"):
+            response = await asyncio.to_thread(search_sync)
     except Exception as e:
         print(f"Search API Error: {e}")
         return []
@@ -239,7 +249,7 @@ async def smart_search_and_curate(
     # sauf si c'est vraiment vide.
 
     # 2. LLM SELECTION
-    llm = get_llm() # Gemini Flash
+    llm = get_llm(cache="playlist_curation") # Gemini Flash
     
     prompt = Prompts.CURATE_PLAYLISTS_PROMPT.format(
         limit=limit,
@@ -309,7 +319,8 @@ async def get_emergency_video_resource(user_input: str) -> Optional[AnalyzedPlay
                 maxResults=1
             ).execute()
             
-        res = await asyncio.to_thread(search_sync)
+        with track("youtube_call", "search.list"):
+            res = await asyncio.to_thread(search_sync)
         items = res.get("items", [])
         
         if not items:
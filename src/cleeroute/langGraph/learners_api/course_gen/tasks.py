@@ -1,60 +1,57 @@
-from src.cleeroute.db.checkpointer import db_pool, PickleSerde
 from src.cleeroute.langGraph.learners_api.course_gen.graph_gen import create_syllabus_generation_graph
-from langgraph.checkpoint.postgres.aio import AsyncPostgresSaver
+from src.cleeroute.langGraph.learners_api.course_gen.services import youtube_api_key_var, YOUTUBE_API_KEY
+from src.cleeroute.langGraph.learners_api.course_gen.progress import publish_status
+from src.cleeroute.langGraph.learners_api.course_gen.models import SyllabusOptions
+from src.cleeroute.langGraph.learners_api.course_gen.state import PydanticSerializer
 
-from psycopg_pool import AsyncConnectionPool 
-import asyncio
-import psycopg
 import logging
-from src.cleeroute.tasks import celery_app
+from src.cleeroute.tasks import celery_app, TASK_PRIORITY_INTERACTIVE
+from src.cleeroute.worker_runtime import get_runtime
 
-import os
 from dotenv import load_dotenv
 load_dotenv()
 
 logger = logging.getLogger(__name__)
-DB_URL = os.getenv("DATABASE_URL") 
 
-@celery_app.task(bind=True)
+MAX_RETRIES = 3
+
+# Priorité par défaut de la tâche : s'applique à l'envoi initial comme aux retries
+@celery_app.task(bind=True, priority=TASK_PRIORITY_INTERACTIVE)
 def generate_syllabus_task(self, thread_id: str, youtube_api_key: str):
+    runtime = get_runtime()
     try:
-        result = asyncio.run(_generate_syllabus_async(thread_id, youtube_api_key))
+        result = runtime.run(_generate_syllabus_async(runtime.checkpointer, thread_id, youtube_api_key))
         return result
     except Exception as e:
         logger.error(f"Erreur dans la tâche generate_syllabus_task: {e}", exc_info=True)
-        raise self.retry(exc=e, countdown=15, max_retries=3)
-
-async def _generate_syllabus_async(thread_id: str, youtube_api_key: str):
-    
-    conn_kwargs = {"autocommit": True}
-
-    if "azure.com" in DB_URL or "52." in DB_URL:
-         conn_kwargs["sslmode"] = "require"
-
-    async with AsyncConnectionPool(
-        conninfo=DB_URL,
-        min_size=1,
-        max_size=10,
-        timeout=30.0, 
-        kwargs=conn_kwargs 
-    ) as temp_pool:
-        
-        checkpointer = AsyncPostgresSaver(conn=temp_pool, serde=PickleSerde)
-        
-        # Setup résilient
-        try:
-            await checkpointer.setup()
-        except (psycopg.errors.DuplicateColumn, psycopg.errors.DuplicateTable, psycopg.errors.UniqueViolation):
-            pass
-        except Exception as e:
-            logger.warning(f"Note setup DB: {e}")
-
-        # Lancement LangGraph
-        syllabus_graph = create_syllabus_generation_graph(checkpointer)
-        config = {"configurable": {"thread_id": thread_id}}
-        
-        os.environ['YOUTUBE_API_KEY'] = youtube_api_key if youtube_api_key else os.getenv("YOUTUBE_API_KEY")
-
-        final_state = await syllabus_graph.ainvoke({}, config)
-
-        return {"status": "completed", "thread_id": thread_id}
\ No newline at end of file
+        if self.request.retries >= MAX_RETRIES:
+            # Plus de retry : on prévient les clients abonnés au lieu de les laisser attendre
+            runtime.run(publish_status(thread_id, "failed"))
+        raise self.retry(exc=e, countdown=15, max_retries=MAX_RETRIES)
+
+async def _generate_syllabus_async(checkpointer, thread_id: str, youtube_api_key: str):
+    # Checkpointer partagé du worker (pool + setup faits une seule fois par process)
+    syllabus_graph = create_syllabus_generation_graph(checkpointer)
+    config = {"configurable": {"thread_id": thread_id}}
+
+    # Clé propre à cette tâche : plusieurs générations tournent en parallèle dans le même process
+    youtube_api_key_var.set(youtube_api_key if youtube_api_key else YOUTUBE_API_KEY)
+
+    await publish_status(thread_id, "starting")
+
+    # On suit les transitions de nœuds pour les publier (SSE + ligne de statut pour le polling)
+    async for update in syllabus_graph.astream({}, config, stream_mode="updates"):
+        for node_name, values in update.items():
+            if not isinstance(values, dict) or not values.get("status"):
+                continue
+            status = values["status"]
+            output = None
+            if status in ("completed", "generation_failed_empty"):
+                output = {"syllabi": []}
+                final_str = values.get("final_syllabus_options_str")
+                if final_str and final_str != 'null':
+                    output = PydanticSerializer.loads(final_str, SyllabusOptions).model_dump(mode="json")
+            print(f"--- [PROGRESS] {thread_id}: node '{node_name}' -> {status} ---")
+            await publish_status(thread_id, status, output=output)
+
+    return {"status": "completed", "thread_id": thread_id}
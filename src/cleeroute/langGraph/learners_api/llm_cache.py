@@ -0,0 +1,163 @@
+# Cache de réponses LLM (correspondance exacte) pour les prompts déterministes.
+# Branché via le champ `cache` des chat models LangChain : un hit court-circuite
+# complètement l'appel (et la file de la passerelle LLM).
+import os
+import time
+import hashlib
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Sequence, Tuple
+
+from langchain_core.caches import BaseCache, RETURN_VAL_TYPE
+from langchain_core.load import dumps, loads
+from dotenv import load_dotenv
+
+from src.cleeroute.db.redis_client import get_redis
+from src.cleeroute.metrics import record_cache
+
+load_dotenv()
+
+LLM_RESPONSE_CACHE_ENABLED = os.getenv("LLM_RESPONSE_CACHE_ENABLED", "true").lower() == "true"
+# Entrées gardées en mémoire par namespace (niveau 1, par process)
+LLM_RESPONSE_CACHE_LRU_SIZE = int(os.getenv("LLM_RESPONSE_CACHE_LRU_SIZE", 512))
+
+# Opt-in explicite par chaîne : namespace -> TTL (secondes)
+CACHE_TTLS: Dict[str, int] = {
+    "session_title": 7 * 24 * 3600,
+    "course_metadata": 24 * 3600,
+    "quiz_summary": 24 * 3600,
+    # Les candidats YouTube changent : on garde la curation moins longtemps
+    "playlist_curation": 6 * 3600,
+}
+
+
+def _cache_key(namespace: str, prompt: str, llm_string: str) -> str:
+    # llm_string contient modèle, température et outils liés (donc le schéma de with_structured_output)
+    digest = hashlib.sha256(f"{llm_string}\x00{prompt}".encode("utf-8")).hexdigest()
+    return f"llmcache:{namespace}:{digest}"
+
+
+class TieredLLMCache(BaseCache):
+    """
+    Cache à deux niveaux pour UNE chaîne (namespace) :
+        - LRU en mémoire (microsecondes, propre au process),
+        - Redis (partagé entre l'API et les workers), avec TTL.
+    Redis indisponible = simple cache mémoire ; une erreur de cache ne fait jamais échouer l'appel.
+    """
+
+    def __init__(self, namespace: str, ttl_seconds: int, max_entries: int = LLM_RESPONSE_CACHE_LRU_SIZE):
+        self.namespace = namespace
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._lru: "OrderedDict[str, Tuple[float, Sequence]]" = OrderedDict()
+        self.hits_memory = 0
+        self.hits_redis = 0
+        self.misses = 0
+
+    # --- Niveau mémoire ---
+    def _memory_get(self, key: str) -> Optional[RETURN_VAL_TYPE]:
+        entry = self._lru.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            self._lru.pop(key, None)
+            return None
+        self._lru.move_to_end(key)
+        return value
+
+    def _memory_set(self, key: str, value: RETURN_VAL_TYPE):
+        self._lru[key] = (time.monotonic() + self.ttl_seconds, value)
+        self._lru.move_to_end(key)
+        while len(self._lru) > self.max_entries:
+            self._lru.popitem(last=False)
+
+    # --- Interface synchrone (invoke) : mémoire uniquement ---
+    def lookup(self, prompt: str, llm_string: str) -> Optional[RETURN_VAL_TYPE]:
+        value = self._memory_get(_cache_key(self.namespace, prompt, llm_string))
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits_memory += 1
+        record_cache(f"llm:{self.namespace}", value is not None)
+        return value
+
+    def update(self, prompt: str, llm_string: str, return_val: RETURN_VAL_TYPE) -> None:
+        self._memory_set(_cache_key(self.namespace, prompt, llm_string), return_val)
+
+    def clear(self, **kwargs: Any) -> None:
+        self._lru.clear()
+
+    # --- Interface asynchrone (ainvoke / graphes) : mémoire puis Redis ---
+    async def alookup(self, prompt: str, llm_string: str) -> Optional[RETURN_VAL_TYPE]:
+        key = _cache_key(self.namespace, prompt, llm_string)
+        value = self._memory_get(key)
+        if value is not None:
+            self.hits_memory += 1
+            record_cache(f"llm:{self.namespace}", True)
+            return value
+
+        redis = get_redis()
+        if redis is not None:
+            try:
+                raw = await redis.get(key)
+                if raw:
+                    value = loads(raw)
+                    self._memory_set(key, value)
+                    self.hits_redis += 1
+                    record_cache(f"llm:{self.namespace}", True)
+                    return value
+            except Exception as e:
+                print(f"[LLM CACHE] Redis read failed ({self.namespace}): {e}")
+
+        self.misses += 1
+        record_cache(f"llm:{self.namespace}", False)
+        return None
+
+    async def aupdate(self, prompt: str, llm_string: str, return_val: RETURN_VAL_TYPE) -> None:
+        key = _cache_key(self.namespace, prompt, llm_string)
+        self._memory_set(key, return_val)
+
+        redis = get_redis()
+        if redis is None:
+            return
+        try:
+            await redis.set(key, dumps(list(return_val)), ex=self.ttl_seconds)
+        except Exception as e:
+            print(f"[LLM CACHE] Redis write failed ({self.namespace}): {e}")
+
+    async def aclear(self, **kwargs: Any) -> None:
+        self._lru.clear()
+        redis = get_redis()
+        if redis is None:
+            return
+        async for key in redis.scan_iter(match=f"llmcache:{self.namespace}:*"):
+            await redis.delete(key)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits_memory + self.hits_redis + self.misses
+        return {
+            "ttl_seconds": self.ttl_seconds,
+            "memory_entries": len(self._lru),
+            "hits_memory": self.hits_memory,
+            "hits_redis": self.hits_redis,
+            "misses": self.misses,
+            "hit_rate": round((self.hits_memory + self.hits_redis) / lookups, 4) if lookups else 0.0,
+        }
+
+
+_caches: Dict[str, TieredLLMCache] = {}
+
+
+def get_response_cache(namespace: Optional[str]) -> Optional[TieredLLMCache]:
+    """Cache de la chaîne `namespace` (None si la chaîne n'est pas opt-in ou si le cache est désactivé)."""
+    if not namespace or not LLM_RESPONSE_CACHE_ENABLED:
+        return None
+    if namespace not in CACHE_TTLS:
+        raise ValueError(f"Unknown LLM cache namespace '{namespace}'. Declare it in CACHE_TTLS.")
+    if namespace not in _caches:
+        _caches[namespace] = TieredLLMCache(namespace, CACHE_TTLS[namespace])
+    return _caches[namespace]
+
+
+def response_cache_stats() -> Dict[str, Any]:
+    return {name: cache.stats() for name, cache in _caches.items()}
@@ -0,0 +1,476 @@
+# Passerelle LLM partagée : clients mis en cache, ordonnancement par priorité
+# et respect des quotas Gemini (RPM / TPM) par clé API.
+# Le quota d'une clé est partagé entre tous les process via Redis (GEMINI_SHARED_QUOTA) ; la file par
+# priorité, la concurrence et le cooldown après un 429 restent propres à chaque process.
+import os
+import time
+import heapq
+import asyncio
+import hashlib
+import itertools
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from fastapi import APIRouter
+from google.api_core import exceptions
+from langchain_core.messages import BaseMessage
+from langchain_core.outputs import ChatGenerationChunk, ChatResult
+from langchain_google_genai import ChatGoogleGenerativeAI, GoogleGenerativeAIEmbeddings
+from dotenv import load_dotenv
+
+from src.cleeroute.db.redis_client import get_redis
+from src.cleeroute.langGraph.learners_api.llm_cache import get_response_cache, response_cache_stats
+from src.cleeroute.metrics import track, record_retry, record_llm_tokens
+
+load_dotenv()
+
+# --- Classes de priorité (0 = servi en premier) ---
+PRIORITY_INTERACTIVE = 0   # l'utilisateur attend la réponse en direct (chat, quiz, conversation)
+PRIORITY_STANDARD = 1      # travail utilisateur asynchrone (génération de syllabus)
+PRIORITY_BACKGROUND = 2    # préchauffage / ingestion
+PRIORITY_NAMES = {"interactive": PRIORITY_INTERACTIVE, "standard": PRIORITY_STANDARD, "background": PRIORITY_BACKGROUND}
+
+# --- Quotas par clé (valeurs par défaut du palier payant Flash, à ajuster par env) ---
+GEMINI_RPM_LIMIT = int(os.getenv("GEMINI_RPM_LIMIT", 1000))
+GEMINI_TPM_LIMIT = int(os.getenv("GEMINI_TPM_LIMIT", 1_000_000))
+# Appels simultanés par clé ET par process, jusqu'au premier chunk pour un flux (voir GatewayChatModel._astream)
+GEMINI_MAX_CONCURRENCY = int(os.getenv("GEMINI_MAX_CONCURRENCY", 32))
+# RPM / TPM partagés entre tous les process (API + workers) via Redis ; sans Redis, chaque process
+# n'applique que ses seaux locaux et le débit réel peut atteindre N fois le quota
+GEMINI_SHARED_QUOTA = os.getenv("GEMINI_SHARED_QUOTA", "true").lower() == "true"
+# Pause imposée à une clé après un 429 (au lieu de laisser chaque appel re-tenter en rafale)
+GEMINI_429_COOLDOWN_SECONDS = float(os.getenv("GEMINI_429_COOLDOWN_SECONDS", 10))
+# Réserve de tokens de sortie ajoutée à l'estimation d'entrée (corrigée avec l'usage réel après l'appel)
+ESTIMATED_OUTPUT_TOKENS = 512
+CHARS_PER_TOKEN = 4
+# Coût forfaitaire d'une image (Gemini : 258 tokens par image <= 384px, par tuile au-delà) :
+# compter son base64 comme du texte surestimerait l'appel de plusieurs centaines de milliers de tokens
+ESTIMATED_IMAGE_TOKENS = int(os.getenv("ESTIMATED_IMAGE_TOKENS", 258))
+# Clients et ordonnanceurs gardés par process : les clés utilisateurs (BYOK) ne doivent pas s'accumuler
+LLM_GATEWAY_MAX_CLIENTS = int(os.getenv("LLM_GATEWAY_MAX_CLIENTS", 256))
+LLM_GATEWAY_MAX_KEYS = int(os.getenv("LLM_GATEWAY_MAX_KEYS", 256))
+
+
+# Quota partagé (GCRA, comme le limiteur du préchauffage) : une heure théorique (TAT) par ressource et par clé.
+# Chaque appel réserve atomiquement 1 requête et `cost` tokens ; la capacité est d'une minute de quota.
+# Retourne l'attente (s) avant de pouvoir émettre l'appel.
+_SHARED_QUOTA_SCRIPT = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local wait = 0
+for i = 1, 2 do
+    local interval = 60.0 / tonumber(ARGV[i * 2 - 1])
+    local cost = tonumber(ARGV[i * 2])
+    local tat = tonumber(redis.call('GET', KEYS[i]) or '0')
+    if tat < now then
+        tat = now
+    end
+    tat = tat + cost * interval
+    local allowed_at = tat - 60.0
+    if allowed_at - now > wait then
+        wait = allowed_at - now
+    end
+    redis.call('SET', KEYS[i], tostring(tat), 'EX', math.ceil(tat - now) + 60)
+end
+return tostring(wait)
+"""
+
+# Correction après l'appel : rend (ou reprend) l'écart entre tokens estimés et réels
+_SHARED_QUOTA_ADJUST_SCRIPT = """
+local tat = redis.call('GET', KEYS[1])
+if not tat then
+    return 0
+end
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local new_tat = math.max(now, tonumber(tat) + tonumber(ARGV[1]) * 60.0 / tonumber(ARGV[2]))
+redis.call('SET', KEYS[1], tostring(new_tat), 'EX', math.ceil(new_tat - now) + 60)
+return 1
+"""
+
+
+def key_id(api_key: Optional[str]) -> str:
+    """Identifiant non réversible d'une clé API (jamais de clé en clair dans les stats/logs)."""
+    return hashlib.sha256((api_key or "default").encode("utf-8")).hexdigest()[:12]
+
+
+def resolve_priority(priority) -> int:
+    if isinstance(priority, int):
+        return priority
+    return PRIORITY_NAMES.get(priority or "standard", PRIORITY_STANDARD)
+
+
+def _content_tokens(content) -> int:
+    if isinstance(content, str):
+        return len(content) // CHARS_PER_TOKEN
+    tokens = 0
+    # Contenu multimodal : liste de parts texte / image (ex: OCR des uploads)
+    for part in content or []:
+        if isinstance(part, str):
+            tokens += len(part) // CHARS_PER_TOKEN
+        elif isinstance(part, dict) and part.get("type") == "text":
+            tokens += len(part.get("text") or "") // CHARS_PER_TOKEN
+        elif isinstance(part, dict) and part.get("type") in ("image_url", "image", "media"):
+            tokens += ESTIMATED_IMAGE_TOKENS
+        else:
+            tokens += len(str(part)) // CHARS_PER_TOKEN
+    return tokens
+
+
+def estimate_tokens(messages: List[BaseMessage]) -> int:
+    return sum(_content_tokens(m.content) for m in messages) + ESTIMATED_OUTPUT_TOKENS
+
+
+class KeyScheduler:
+    """
+    Ordonnanceur d'une clé API :
+        - seau de requêtes (RPM) et seau de tokens (TPM), rechargés en continu,
+        - plafond d'appels simultanés,
+        - file d'attente par priorité (FIFO à priorité égale),
+        - cooldown après un 429.
+    """
+
+    def __init__(self, rpm: int, tpm: int, max_concurrency: int):
+        self.rpm, self.tpm, self.max_concurrency = rpm, tpm, max_concurrency
+        self.request_tokens = float(rpm)
+        self.token_tokens = float(tpm)
+        self.last_refill = time.monotonic()
+        self.cooldown_until = 0.0
+        self.in_flight = 0
+        self._waiters: List[Tuple[int, int, int, asyncio.Future]] = []
+        self._seq = itertools.count()
+        self._timer: Optional[asyncio.TimerHandle] = None
+        # Métriques
+        self.granted = 0
+        self.rate_limited = 0
+        self.total_wait_seconds = 0.0
+
+    def is_idle(self) -> bool:
+        return self.in_flight == 0 and all(fut.done() for *_, fut in self._waiters)
+
+    def _refill(self):
+        now = time.monotonic()
+        elapsed = now - self.last_refill
+        self.last_refill = now
+        self.request_tokens = min(self.rpm, self.request_tokens + elapsed * self.rpm / 60.0)
+        self.token_tokens = min(self.tpm, self.token_tokens + elapsed * self.tpm / 60.0)
+
+    def _schedule_wakeup(self, delay: float):
+        if self._timer is not None:
+            self._timer.cancel()
+        loop = asyncio.get_running_loop()
+        self._timer = loop.call_later(max(delay, 0.01), self._dispatch)
+
+    def _dispatch(self):
+        self._timer = None
+        self._refill()
+        now = time.monotonic()
+
+        while self._waiters:
+            priority, seq, tokens, fut = self._waiters[0]
+            if fut.done():  # annulé par l'appelant
+                heapq.heappop(self._waiters)
+                continue
+            if self.in_flight >= self.max_concurrency:
+                return  # release() relancera le dispatch
+            if now < self.cooldown_until:
+                self._schedule_wakeup(self.cooldown_until - now)
+                return
+
+            needed_tokens = min(tokens, self.tpm)
+            if self.request_tokens < 1 or self.token_tokens < needed_tokens:
+                wait_req = (1 - self.request_tokens) * 60.0 / self.rpm if self.request_tokens < 1 else 0
+                wait_tok = (needed_tokens - self.token_tokens) * 60.0 / self.tpm if self.token_tokens < needed_tokens else 0
+                self._schedule_wakeup(max(wait_req, wait_tok))
+                return
+
+            heapq.heappop(self._waiters)
+            self.request_tokens -= 1
+            self.token_tokens -= needed_tokens
+            self.in_flight += 1
+            self.granted += 1
+            fut.set_result(None)
+
+    async def acquire(self, priority: int, tokens: int):
+        loop = asyncio.get_running_loop()
+        fut = loop.create_future()
+        heapq.heappush(self._waiters, (priority, next(self._seq), tokens, fut))
+        started = time.monotonic()
+        self._dispatch()
+        try:
+            await fut
+        except asyncio.CancelledError:
+            if fut.done() and not fut.cancelled():
+                # Le slot avait été accordé juste avant l'annulation : on le rend
+                self.release(tokens, 0)
+            raise
+        self.total_wait_seconds += time.monotonic() - started
+
+    def release_concurrency(self):
+        """Libère la place de concurrence seule (flux en cours : le quota reste compté)."""
+        self.in_flight -= 1
+        self._dispatch()
+
+    def release(self, estimated_tokens: int, actual_tokens: Optional[int], concurrency_released: bool = False):
+        if not concurrency_released:
+            self.in_flight -= 1
+        if actual_tokens is not None:
+            # Correction de l'estimation avec l'usage réel (peut rendre ou reprendre des tokens)
+            self.token_tokens = min(self.tpm, self.token_tokens + estimated_tokens - actual_tokens)
+        self._dispatch()
+
+    def penalize(self):
+        self.rate_limited += 1
+        self.cooldown_until = max(self.cooldown_until, time.monotonic() + GEMINI_429_COOLDOWN_SECONDS)
+
+    def stats(self) -> Dict[str, Any]:
+        self._refill()
+        depth = {name: 0 for name in PRIORITY_NAMES}
+        names = {v: k for k, v in PRIORITY_NAMES.items()}
+        for priority, _, _, fut in self._waiters:
+            if not fut.done():
+                depth[names.get(priority, "standard")] += 1
+        return {
+            "queue_depth": depth,
+            "in_flight": self.in_flight,
+            "granted_total": self.granted,
+            "rate_limited_total": self.rate_limited,
+            "avg_wait_seconds": round(self.total_wait_seconds / self.granted, 4) if self.granted else 0.0,
+            "requests_available": int(self.request_tokens),
+            "tokens_available": int(self.token_tokens),
+            "cooling_down": time.monotonic() < self.cooldown_until,
+        }
+
+
+class _Slot:
+    """Résultat d'un acquire : l'appelant y note l'usage réel de tokens."""
+    def __init__(self, scheduler: KeyScheduler):
+        self.actual_tokens: Optional[int] = None
+        self.concurrency_released = False
+        self._scheduler = scheduler
+
+    def release_concurrency(self):
+        """Rend la place de concurrence avant la fin de l'appel (flux : dès le premier chunk)."""
+        if not self.concurrency_released:
+            self.concurrency_released = True
+            self._scheduler.release_concurrency()
+
+
+async def _reserve_shared_quota(kid: str, estimated_tokens: int) -> float:
+    """Réserve 1 requête + les tokens estimés sur le quota partagé de la clé ; retourne l'attente (s)."""
+    redis = get_redis()
+    if redis is None or not GEMINI_SHARED_QUOTA:
+        return 0.0
+    try:
+        wait = await redis.eval(
+            _SHARED_QUOTA_SCRIPT, 2, f"llmquota:rpm:{kid}", f"llmquota:tpm:{kid}",
+            GEMINI_RPM_LIMIT, 1, GEMINI_TPM_LIMIT, min(estimated_tokens, GEMINI_TPM_LIMIT)
+        )
+    except Exception as e:
+        # Redis indisponible : les seaux locaux du process restent appliqués
+        print(f"[LLM GATEWAY] Shared quota unavailable: {e}")
+        return 0.0
+    return float(wait)
+
+
+async def _adjust_shared_quota(kid: str, delta_tokens: int):
+    redis = get_redis()
+    if redis is None or not GEMINI_SHARED_QUOTA or not delta_tokens:
+        return
+    try:
+        await redis.eval(_SHARED_QUOTA_ADJUST_SCRIPT, 1, f"llmquota:tpm:{kid}", delta_tokens, GEMINI_TPM_LIMIT)
+    except Exception as e:
+        print(f"[LLM GATEWAY] Shared quota adjustment failed: {e}")
+
+
+def _lru_get(cache: "OrderedDict", key):
+    value = cache.get(key)
+    if value is not None:
+        cache.move_to_end(key)
+    return value
+
+
+def _lru_set(cache: "OrderedDict", key, value, max_entries: int):
+    cache[key] = value
+    cache.move_to_end(key)
+    while len(cache) > max_entries:
+        cache.popitem(last=False)
+
+
+class LLMGateway:
+    def __init__(self):
+        # LRU bornés : une entrée par clé API utilisateur, sinon croissance sans fin
+        self._schedulers: "OrderedDict[str, KeyScheduler]" = OrderedDict()
+        self._chat_models: "OrderedDict[Tuple, ChatGoogleGenerativeAI]" = OrderedDict()
+        self._embeddings: "OrderedDict[Tuple, GoogleGenerativeAIEmbeddings]" = OrderedDict()
+
+    def scheduler(self, api_key: Optional[str]) -> KeyScheduler:
+        kid = key_id(api_key)
+        scheduler = _lru_get(self._schedulers, kid)
+        if scheduler is None:
+            scheduler = self._schedulers[kid] = KeyScheduler(GEMINI_RPM_LIMIT, GEMINI_TPM_LIMIT, GEMINI_MAX_CONCURRENCY)
+            self._evict_schedulers()
+        return scheduler
+
+    def _evict_schedulers(self):
+        # Seules les clés inactives sont oubliées (une clé active garde sa file et ses quotas)
+        for kid in list(self._schedulers):
+            if len(self._schedulers) <= LLM_GATEWAY_MAX_KEYS:
+                return
+            if self._schedulers[kid].is_idle():
+                del self._schedulers[kid]
+
+    @asynccontextmanager
+    async def slot(self, api_key: Optional[str], priority: int, estimated_tokens: int, model: str = "") -> AsyncIterator[_Slot]:
+        kid = key_id(api_key)
+        scheduler = self.scheduler(api_key)
+        priority_name = next((n for n, p in PRIORITY_NAMES.items() if p == priority), "standard")
+        with track("llm_queue_wait", priority_name):
+            await scheduler.acquire(priority, estimated_tokens)
+            # Les process réservent dans l'ordre où leur file locale (par priorité) les libère
+            try:
+                wait = await _reserve_shared_quota(kid, estimated_tokens)
+                if wait > 0:
+                    await asyncio.sleep(wait)
+            except asyncio.CancelledError:
+                scheduler.release(estimated_tokens, 0)
+                raise
+        slot = _Slot(scheduler)
+        try:
+            yield slot
+        except exceptions.ResourceExhausted:
+            scheduler.penalize()
+            record_retry("llm_call", model)
+            raise
+        except Exception as e:
+            if "RESOURCE_EXHAUSTED" in str(e) or "429" in str(e):
+                scheduler.penalize()
+                record_retry("llm_call", model)
+            raise
+        finally:
+            scheduler.release(estimated_tokens, slot.actual_tokens, slot.concurrency_released)
+            if slot.actual_tokens is not None:
+                await _adjust_shared_quota(kid, slot.actual_tokens - min(estimated_tokens, GEMINI_TPM_LIMIT))
+
+    def get_chat_model(self, model: str, api_key: Optional[str], temperature: Optional[float] = None, priority="standard",
+                       cache: Optional[str] = None) -> "GatewayChatModel":
+        """
+        Client mis en cache par (modèle, clé, température, priorité, cache) au lieu d'un nouveau client par appel.
+        `cache` : namespace du cache de réponses (opt-in par chaîne, voir llm_cache.CACHE_TTLS).
+        """
+        priority = resolve_priority(priority)
+        cache_key = (model, key_id(api_key), temperature, priority, cache)
+        client = _lru_get(self._chat_models, cache_key)
+        if client is None:
+            params = {"model": model, "google_api_key": api_key, "gateway_priority": priority}
+            if temperature is not None:
+                params["temperature"] = temperature
+            response_cache = get_response_cache(cache)
+            if response_cache is not None:
+                params["cache"] = response_cache
+            client = GatewayChatModel(**params)
+            _lru_set(self._chat_models, cache_key, client, LLM_GATEWAY_MAX_CLIENTS)
+        return client
+
+    def get_embeddings(self, model: str, api_key: Optional[str], task_type: str = "retrieval_document") -> GoogleGenerativeAIEmbeddings:
+        cache_key = (model, key_id(api_key), task_type)
+        client = _lru_get(self._embeddings, cache_key)
+        if client is None:
+            client = GatewayEmbeddings(model=model, google_api_key=api_key, task_type=task_type)
+            _lru_set(self._embeddings, cache_key, client, LLM_GATEWAY_MAX_CLIENTS)
+        return client
+
+    def stats(self) -> Dict[str, Any]:
+        keys = {kid: s.stats() for kid, s in self._schedulers.items()}
+        total_depth = sum(sum(s["queue_depth"].values()) for s in keys.values())
+        return {
+            "limits": {"rpm": GEMINI_RPM_LIMIT, "tpm": GEMINI_TPM_LIMIT, "max_concurrency": GEMINI_MAX_CONCURRENCY,
+                       "shared_quota": GEMINI_SHARED_QUOTA and get_redis() is not None},
+            "cached_clients": len(self._chat_models),
+            "total_queue_depth": total_depth,
+            "keys": keys,
+            "response_cache": response_cache_stats(),
+        }
+
+
+gateway = LLMGateway()
+
+
+def _usage_tokens(message) -> Optional[int]:
+    usage = getattr(message, "usage_metadata", None)
+    if usage and usage.get("total_tokens"):
+        return usage["total_tokens"]
+    return None
+
+
+def _record_usage(model: str, message):
+    usage = getattr(message, "usage_metadata", None)
+    if usage:
+        record_llm_tokens(model, usage.get("input_tokens"), usage.get("output_tokens"))
+
+
+class GatewayChatModel(ChatGoogleGenerativeAI):
+    """
+    ChatGoogleGenerativeAI dont chaque appel asynchrone passe par la passerelle
+    (invoke, stream, with_structured_output... utilisent tous _agenerate / _astream).
+    """
+    gateway_priority: int = PRIORITY_STANDARD
+
+    def _raw_api_key(self) -> Optional[str]:
+        key = self.google_api_key
+        return key.get_secret_value() if hasattr(key, "get_secret_value") else key
+
+    async def _agenerate(self, messages: List[BaseMessage], stop=None, run_manager=None, **kwargs) -> ChatResult:
+        async with gateway.slot(self._raw_api_key(), self.gateway_priority, estimate_tokens(messages), self.model) as slot:
+            with track("llm_call", self.model):
+                result = await super()._agenerate(messages, stop=stop, run_manager=run_manager, **kwargs)
+            if result.generations:
+                message = result.generations[0].message
+                slot.actual_tokens = _usage_tokens(message)
+                _record_usage(self.model, message)
+            return result
+
+    async def _astream(self, messages: List[BaseMessage], stop=None, run_manager=None, **kwargs) -> AsyncIterator[ChatGenerationChunk]:
+        async with gateway.slot(self._raw_api_key(), self.gateway_priority, estimate_tokens(messages), self.model) as slot:
+            total = 0
+            # Durée du flux complet (jusqu'au dernier chunk)
+            with track("llm_call", self.model):
+                async for chunk in super()._astream(messages, stop=stop, run_manager=run_manager, **kwargs):
+                    # Le flux ne retient pas sa place de concurrence pendant toute la lecture (un chat lent
+                    # bloquerait les autres) : seuls RPM / TPM restent comptés jusqu'à la fin
+                    slot.release_concurrency()
+                    total += _usage_tokens(chunk.message) or 0
+                    _record_usage(self.model, chunk.message)
+                    yield chunk
+            slot.actual_tokens = total or None
+
+
+class GatewayEmbeddings(GoogleGenerativeAIEmbeddings):
+    """Embeddings Gemini instrumentés (durée de chaque lot / requête)."""
+
+    async def aembed_documents(self, texts: List[str], *args, **kwargs) -> List[List[float]]:
+        with track("embedding_batch", self.model):
+            return await super().aembed_documents(texts, *args, **kwargs)
+
+    async def aembed_query(self, text: str, *args, **kwargs) -> List[float]:
+        with track("embedding_batch", self.model):
+            return await super().aembed_query(text, *args, **kwargs)
+
+    def embed_documents(self, texts: List[str], *args, **kwargs) -> List[List[float]]:
+        with track("embedding_batch", self.model):
+            return super().embed_documents(texts, *args, **kwargs)
+
+
+# --- Observabilité ---
+llm_gateway_router = APIRouter()
+
+
+@llm_gateway_router.get("/llm-gateway/stats", summary="LLM gateway queue depth and quota usage")
+async def get_llm_gateway_stats():
+    """
+    Returns, per API key (hashed): queue depth per priority class, in-flight calls,
+    remaining RPM/TPM budget, 429 count and average queueing time.
+    Also reports hit rates of the per-chain response caches.
+    """
+    return gateway.stats()
@@ -13,8 +13,8 @@ from langchain_google_genai import ChatGoogleGenerativeAI
 
 # On suppose que ton utilitaire est ici
 from src.cleeroute.langGraph.learners_api.utils import get_llm
-# Si tu as besoin du contexte externe
-from src.cleeroute.langGraph.learners_api.metadata_from_learner.prompt_tamplate import CONTEXTE
+# Seules les branches de la taxonomie (CONTEXTE) pertinentes pour la demande sont injectées
+from src.cleeroute.langGraph.learners_api.metadata_from_learner.taxonomy_index import retrieve_taxonomy_context
 from src.cleeroute.langGraph.learners_api.metadata_from_learner.prompt_tamplate import SUMMARY_PROMPT_MSGS, DETAILS_PROMPT_MSGS
 
 load_dotenv()
@@ -59,7 +59,7 @@ async def get_llm_service(
         )
     
     # Assure-toi que get_llm configure bien le modèle (ex: gemini-1.5-flash est BEAUCOUP plus rapide)
-    return get_llm(api_key=api_key)
+    return get_llm(api_key=api_key, priority="interactive", cache="course_metadata")
 
 async def generate_summary_task(llm, user_prompt: str, language: str, context: str) -> CourseSummary:
     prompt_template = ChatPromptTemplate.from_messages(SUMMARY_PROMPT_MSGS)
@@ -100,8 +100,9 @@ async def generate_full_metadata(
 
     try:
         # Lancement des deux tâches en parallèle
-        # On passe CONTEXTE pour le résumé, et le user_prompt (ou CONTEXTE) pour les détails
-        summary_task = generate_summary_task(llm, request.user_prompt, request.language, CONTEXTE)
+        # On passe les branches pertinentes de la taxonomie pour le résumé, et le user_prompt pour les détails
+        taxonomy_context = await retrieve_taxonomy_context(request.user_prompt)
+        summary_task = generate_summary_task(llm, request.user_prompt, request.language, taxonomy_context)
         details_task = generate_details_task(llm, request.user_prompt, request.language, request.user_prompt)
 
         # Attente simultanée
@@ -124,7 +125,8 @@ async def generate_summary_only(
 ):
     """Optimized async summary generation."""
     try:
-        return await generate_summary_task(llm, request.user_prompt, request.language, CONTEXTE)
+        taxonomy_context = await retrieve_taxonomy_context(request.user_prompt)
+        return await generate_summary_task(llm, request.user_prompt, request.language, taxonomy_context)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -0,0 +1,190 @@
+# Index de recherche sur la taxonomie domaines / catégories (CONTEXTE).
+# Au lieu d'envoyer les ~480 lignes de la taxonomie à chaque appel /metadata/*,
+# on n'injecte que les quelques branches pertinentes pour la demande de l'apprenant.
+import os
+import re
+import json
+import math
+import asyncio
+import hashlib
+import logging
+from collections import Counter
+from typing import List, Optional, Tuple
+
+from src.cleeroute.langGraph.learners_api.utils import get_embedding_model
+from src.cleeroute.langGraph.learners_api.metadata_from_learner.prompt_tamplate import CONTEXTE
+
+logger = logging.getLogger("uvicorn.error")
+
+# Nombre de domaines (branches complètes) injectés dans le prompt
+TAXONOMY_TOP_DOMAINS = int(os.getenv("TAXONOMY_TOP_DOMAINS", 4))
+# Poids du score sémantique vs mots-clés (le sémantique couvre les demandes non anglaises)
+TAXONOMY_SEMANTIC_WEIGHT = float(os.getenv("TAXONOMY_SEMANTIC_WEIGHT", 0.7))
+# Embeddings précalculés (reconstruits si la taxonomie ou le modèle change)
+TAXONOMY_INDEX_PATH = os.getenv("TAXONOMY_INDEX_PATH", "/tmp/cleeroute_taxonomy_index.json")
+
+_STOPWORDS = {
+    "a", "an", "and", "the", "of", "to", "for", "in", "on", "with", "how", "i", "want", "learn",
+    "learning", "my", "me", "about", "be", "become", "de", "la", "le", "les", "des", "et", "je",
+    "veux", "apprendre", "un", "une", "pour", "en", "du",
+}
+
+
+def parse_taxonomy(text: str = CONTEXTE) -> List[Tuple[str, List[str]]]:
+    """'- Domaine' / '\\t- Catégorie' -> [(domaine, [catégories])] (doublons retirés, ordre conservé)."""
+    branches: List[Tuple[str, List[str]]] = []
+    for line in text.splitlines():
+        if not line.strip():
+            continue
+        label = line.strip().lstrip("-").strip()
+        if line.startswith("-"):
+            branches.append((label, []))
+        elif branches and label not in branches[-1][1]:
+            branches[-1][1].append(label)
+    return branches
+
+
+def _tokenize(text: str) -> List[str]:
+    tokens = re.findall(r"[a-z0-9+#]+", text.lower())
+    # Stemming minimal : "databases" ~ "database"
+    return [t[:-1] if len(t) > 4 and t.endswith("s") else t for t in tokens if t not in _STOPWORDS]
+
+
+def _cosine(a: List[float], b: List[float]) -> float:
+    dot = sum(x * y for x, y in zip(a, b))
+    na = math.sqrt(sum(x * x for x in a))
+    nb = math.sqrt(sum(y * y for y in b))
+    return dot / (na * nb) if na and nb else 0.0
+
+
+def format_branches(branches: List[Tuple[str, List[str]]]) -> str:
+    lines = []
+    for domain, categories in branches:
+        lines.append(f"- {domain}")
+        lines.extend(f"\t- {c}" for c in categories)
+    return "\n".join(lines)
+
+
+class TaxonomyIndex:
+    """
+    Index hybride par domaine :
+        - mots-clés (BM25 sur "domaine + catégories"), sans coût réseau,
+        - embeddings de chaque branche (une fois, persistés sur disque).
+    """
+
+    def __init__(self, text: str = CONTEXTE):
+        self.branches = parse_taxonomy(text)
+        self.fingerprint = hashlib.sha256(text.encode("utf-8")).hexdigest()[:16]
+        self.embeddings = get_embedding_model(api_key=os.getenv("GEMINI_API_KEY"))
+        self.branch_vectors: Optional[List[List[float]]] = None
+        # Requêtes à froid simultanées : une seule construction, les autres attendent son résultat
+        self._build_lock = asyncio.Lock()
+
+        # --- Index mots-clés ---
+        self.docs = [Counter(_tokenize(f"{d} {' '.join(cats)}")) for d, cats in self.branches]
+        self.avg_len = sum(sum(doc.values()) for doc in self.docs) / max(len(self.docs), 1)
+        df = Counter(token for doc in self.docs for token in doc)
+        n = len(self.docs)
+        self.idf = {t: math.log(1 + (n - f + 0.5) / (f + 0.5)) for t, f in df.items()}
+
+    def _branch_text(self, i: int) -> str:
+        domain, categories = self.branches[i]
+        return f"{domain}: {', '.join(categories)}"
+
+    def _cache_id(self) -> str:
+        return f"{self.fingerprint}:{os.getenv('EMBEDDING_MODEL')}"
+
+    async def build(self):
+        """Calcule (ou recharge depuis le disque) les embeddings des branches."""
+        if self.branch_vectors is not None:
+            return
+        async with self._build_lock:
+            # Construit entre-temps par l'appel qui détenait le verrou
+            if self.branch_vectors is None:
+                await self._build()
+
+    async def _build(self):
+        try:
+            with open(TAXONOMY_INDEX_PATH, "r", encoding="utf-8") as f:
+                stored = json.load(f)
+            if stored.get("id") == self._cache_id() and len(stored["vectors"]) == len(self.branches):
+                self.branch_vectors = stored["vectors"]
+                return
+        except (OSError, ValueError, KeyError):
+            pass
+
+        vectors = await self.embeddings.aembed_documents([self._branch_text(i) for i in range(len(self.branches))])
+        self.branch_vectors = vectors
+        try:
+            with open(TAXONOMY_INDEX_PATH, "w", encoding="utf-8") as f:
+                json.dump({"id": self._cache_id(), "vectors": vectors}, f)
+        except OSError as e:
+            logger.warning(f"Taxonomy index not persisted: {e}")
+        logger.info(f"Taxonomy index built ({len(self.branches)} domains)")
+
+    def _keyword_scores(self, query: str) -> List[float]:
+        k1, b = 1.2, 0.75
+        terms = _tokenize(query)
+        scores = []
+        for doc in self.docs:
+            length = sum(doc.values())
+            score = 0.0
+            for t in terms:
+                tf = doc.get(t, 0)
+                if tf:
+                    score += self.idf[t] * tf * (k1 + 1) / (tf + k1 * (1 - b + b * length / self.avg_len))
+            scores.append(score)
+        return scores
+
+    async def search(self, query: str, top_k: int = TAXONOMY_TOP_DOMAINS) -> List[Tuple[str, List[str]]]:
+        keyword = self._keyword_scores(query)
+        max_kw = max(keyword) or 1.0
+        keyword = [s / max_kw for s in keyword]
+
+        semantic = None
+        try:
+            await self.build()
+            query_vector = await self.embeddings.aembed_query(query)
+            semantic = [_cosine(query_vector, v) for v in self.branch_vectors]
+        except Exception as e:
+            logger.warning(f"Taxonomy semantic search unavailable, keyword only: {e}")
+
+        if semantic is None:
+            if not any(keyword):
+                return []
+            scores = keyword
+        else:
+            w = TAXONOMY_SEMANTIC_WEIGHT
+            scores = [w * s + (1 - w) * k for s, k in zip(semantic, keyword)]
+
+        ranked = sorted(range(len(self.branches)), key=lambda i: scores[i], reverse=True)
+        return [self.branches[i] for i in ranked[:top_k]]
+
+
+_taxonomy_index: Optional[TaxonomyIndex] = None
+
+
+def get_taxonomy_index() -> TaxonomyIndex:
+    global _taxonomy_index
+    if _taxonomy_index is None:
+        _taxonomy_index = TaxonomyIndex()
+    return _taxonomy_index
+
+
+async def warm_taxonomy_index():
+    """Construction au démarrage de l'API (les premiers appels /metadata/* n'attendent pas)."""
+    try:
+        await get_taxonomy_index().build()
+    except Exception as e:
+        logger.warning(f"Taxonomy index warm-up failed (built on first request): {e}")
+
+
+async def retrieve_taxonomy_context(user_prompt: str) -> str:
+    """
+    Sous-ensemble de CONTEXTE pertinent pour la demande.
+    Retombe sur la taxonomie complète si aucune branche ne ressort.
+    """
+    branches = await get_taxonomy_index().search(user_prompt)
+    if not branches:
+        return CONTEXTE
+    return format_branches(branches)
@@ -18,12 +18,22 @@ from src.cleeroute.langGraph.learners_api.quiz.services.user_service import buil
 from src.cleeroute.langGraph.learners_api.quiz.models import UserProfile
 
 from src.cleeroute.langGraph.learners_api.utils import get_llm, resilient_retry_policy
+from src.cleeroute.metrics import track
+from src.cleeroute.lazy_init import lazy_resource, register_async_warmup
 from dotenv import load_dotenv
 load_dotenv()
 
-# Initialisation du LLM
-llm = get_llm(api_key=os.getenv("GEMINI_API_KEY"))
+# Initialisation du LLM (au premier usage, pas à l'import)
+@lazy_resource("quiz.llm")
+def quiz_llm():
+    return get_llm(api_key=os.getenv("GEMINI_API_KEY"), priority="interactive")
 
+# Le récap ne dépend que du score et de la langue : mis en cache
+@lazy_resource("quiz.summary_llm")
+def summary_llm():
+    return get_llm(api_key=os.getenv("GEMINI_API_KEY"), priority="interactive", cache="quiz_summary")
+
+@track("graph_node", "quiz.generate_questions")
 async def generate_questions_node(state: QuizGraphState) -> dict:
     """
     Nœud d'initialisation. Génère un titre pour le quiz ET la liste complète des questions.
@@ -57,7 +67,7 @@ async def generate_questions_node(state: QuizGraphState) -> dict:
         
         # Configure le LLM pour qu'il retourne notre nouvel objet conteneur
         print("--- Configuring structured output for QuizContent... ---")
-        structured_llm = llm.with_structured_output(QuizContent)
+        structured_llm = quiz_llm.get().with_structured_output(QuizContent)
         
         # Fait l'appel unique
         print("--- Invoking LLM for quiz content generation... ---")
@@ -104,6 +114,7 @@ def format_quiz_context(question: QuizQuestionInternal, footer_text: str) -> str
 **{footer_text}**"""
 
 
+@track("graph_node", "quiz.process_interaction")
 async def process_interaction_node(state: QuizGraphState) -> dict:
 
     interaction = state.get("current_interaction")
@@ -171,7 +182,7 @@ async def process_interaction_node(state: QuizGraphState) -> dict:
             language=profile.language
         )
 
-        response = await llm.ainvoke(prompt)
+        response = await quiz_llm.get().ainvoke(prompt)
         
         ai_message = ChatMessage(
             id=f"chat_{uuid.uuid4()}",
@@ -206,7 +217,7 @@ async def process_interaction_node(state: QuizGraphState) -> dict:
             language=profile.language,
             personalization_block=persona_block,
         )
-        response = await llm.ainvoke(prompt)
+        response = await quiz_llm.get().ainvoke(prompt)
 
         ai_message = ChatMessage(
             id=f"chat_{uuid.uuid4()}",
@@ -240,7 +251,7 @@ async def process_interaction_node(state: QuizGraphState) -> dict:
         )
         # user_message_content = f"Requested a hint."
         
-        response = await llm.ainvoke(prompt)
+        response = await quiz_llm.get().ainvoke(prompt)
 
         ai_message = ChatMessage(
             id=f"chat_{uuid.uuid4()}",
@@ -269,7 +280,7 @@ async def process_interaction_node(state: QuizGraphState) -> dict:
         )
         # user_message_content = user_query
         
-        response = await llm.ainvoke(prompt)
+        response = await quiz_llm.get().ainvoke(prompt)
 
         ai_message = ChatMessage(
             id=f"chat_{uuid.uuid4()}",
@@ -279,7 +290,7 @@ async def process_interaction_node(state: QuizGraphState) -> dict:
         )
         # chat_history.append(ai_message)
 
-        response = await llm.ainvoke(prompt)
+        response = await quiz_llm.get().ainvoke(prompt)
         ai_message = ChatMessage(id=f"chat_{uuid.uuid4()}", sender="ai", content=response.content, type="answer")
 
 
@@ -298,6 +309,7 @@ async def process_interaction_node(state: QuizGraphState) -> dict:
     return updated_state
 
 
+@track("graph_node", "quiz.generate_summary")
 async def generate_summary_node(state: QuizGraphState) -> dict:
     """
     Nœud final. Calcule les statistiques et génère un texte de résumé.
@@ -345,7 +357,7 @@ async def generate_summary_node(state: QuizGraphState) -> dict:
         language=profile.language,
     )
     
-    response = await llm.ainvoke(prompt)
+    response = await summary_llm.get().ainvoke(prompt)
     recap_text = response.content
     
     summary_message = ChatMessage(
@@ -442,3 +454,6 @@ async def get_quiz_graph() -> Pregel:
             _quiz_graph = workflow.compile(checkpointer=checkpointer)
             
     return _quiz_graph
+
+
+register_async_warmup("quiz.graph", get_quiz_graph)
@@ -17,7 +17,6 @@ from src.cleeroute.langGraph.learners_api.course_gen.state import PydanticSerial
 from src.cleeroute.db.app_db import get_app_db_connection, get_active_pool
 from src.cleeroute.langGraph.learners_api.quiz.services.quiz_services import save_quiz_progress
 from src.cleeroute.langGraph.learners_api.quiz.services.ingestion_services import STREAM_DOCS
-import os
 
 from dotenv import load_dotenv
 load_dotenv()
@@ -29,9 +28,7 @@ from src.cleeroute.langGraph.learners_api.quiz.services.user_service import buil
 from ..chats.course_context_for_global_chat import get_student_quiz_context, extract_context_from_course, fetch_course_hierarchy
 
 from src.cleeroute.langGraph.learners_api.quiz.services.ingestion_services import FileIngestionService
-from src.cleeroute.langGraph.learners_api.utils import get_llm
 
-qa_llm = get_llm(api_key=os.getenv("GEMINI_API_KEY"))
 
 
 
@@ -401,6 +398,13 @@ async def get_summary(
         new_status = "completed" if is_complete else "in_progress"
 
         chat_history = PydanticSerializer.loads(final_values.get("chat_history"), List[ChatMessage])
+
+        # Récap servi par le cache de réponses : aucun token streamé, on envoie le texte d'un bloc
+        if not full_text:
+            recap = next((m for m in reversed(chat_history) if m.type == "recap"), None)
+            if recap and recap.content:
+                full_text = recap.content
+                yield f"data: {json.dumps({'type': 'token', 'content': full_text})}\n\n"
         
         # Stats
         correct = sum(1 for a in user_answers.values() if a.get("isCorrect"))
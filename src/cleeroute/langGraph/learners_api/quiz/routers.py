@@ -20,8 +20,8 @@ from src.cleeroute.langGraph.learners_api.course_gen.models import CompleteCours
 from .graph import get_quiz_graph
 # Import du sérialiseur que nous utilisons de manière cohérente
 from src.cleeroute.langGraph.learners_api.course_gen.state import PydanticSerializer
-from src.cleeroute.db.app_db import get_app_db_connection
-from langchain_google_genai import ChatGoogleGenerativeAI
+from src.cleeroute.db.app_db import get_app_db_connection, get_active_pool
+from src.cleeroute.db.lease import lease
 import os
 
 from dotenv import load_dotenv
@@ -36,7 +36,6 @@ from src.cleeroute.langGraph.learners_api.quiz.services.ingestion_services impor
 from src.cleeroute.langGraph.learners_api.quiz.services.quiz_context_extractor import build_quiz_context_from_db
 from src.cleeroute.langGraph.learners_api.quiz.services.quiz_services import get_quiz_state_from_db
 
-qa_llm = ChatGoogleGenerativeAI(model=os.getenv("MODEL"), google_api_key=os.getenv("GEMINI_API_KEY"))
 
 
 quiz_router = APIRouter()
@@ -156,7 +155,6 @@ async def start_quiz_attempt(
     graph=Depends(get_quiz_graph),
     userId: str = Header(..., alias="userId"),
     x_gemini_api_key: Optional[str] = Header(None, alias="X-gemini-Api-Key"),
-    db: AsyncConnection = Depends(get_app_db_connection)
 ):
     """
     **Initializes a new adaptive quiz session.**
@@ -186,10 +184,14 @@ async def start_quiz_attempt(
     config = {"configurable": {"thread_id": attempt_id}}
     
     # 1. Profil & Contexte
-    profile = await get_user_profile(userId, db)
+    # Baux courts : aucune connexion tenue pendant l'embedding de la requête ni la génération du graphe
+    pool = get_active_pool()
+    # Profil en cache : le pool n'est emprunté qu'en cas de miss
+    profile = await get_user_profile(userId, pool)
     db_content = await build_quiz_context_from_db(
-        db=db, scope=request.scope, course_id=request.courseId,
-        section_id=request.sectionId, subsection_id=request.subsectionId
+        db=pool, scope=request.scope, course_id=request.courseId,
+        section_id=request.sectionId, subsection_id=request.subsectionId,
+        query=request.content_for_quiz
     )
     
     initial_state = {
@@ -232,21 +234,22 @@ async def start_quiz_attempt(
     quiz_title = final_values.get("title", "New Quiz")
     
     try:
-        await db.execute(
-            """
-            INSERT INTO quiz_attempts (
-                attempt_id, course_id, title, status, 
-                questions_json, interaction_json, user_answers_json, original_content
-            )
-            VALUES (%s, %s, %s, 'started', %s, %s, '{}', %s)
-            """,
-            (
-                attempt_id, request.courseId, quiz_title, 
-                json.dumps(questions_json), 
-                json.dumps([intro_msg.model_dump()]), 
-                request.content_for_quiz
+        async with lease(pool) as db:
+            await db.execute(
+                """
+                INSERT INTO quiz_attempts (
+                    attempt_id, course_id, title, status, 
+                    questions_json, interaction_json, user_answers_json, original_content
+                )
+                VALUES (%s, %s, %s, 'started', %s, %s, '{}', %s)
+                """,
+                (
+                    attempt_id, request.courseId, quiz_title, 
+                    json.dumps(questions_json), 
+                    json.dumps([intro_msg.model_dump()]), 
+                    request.content_for_quiz
+                )
             )
-        )
         
         # Mise à jour du state LangGraph avec ce message initial
         await graph.aupdate_state(config, {"chat_history": PydanticSerializer.dumps(initial_chat)})
@@ -533,7 +536,6 @@ async def get_quiz_summary(
     attemptId: str, 
     graph: Pregel = Depends(get_quiz_graph),
     x_gemini_api_key: Optional[str] = Header(None, alias="X-gemini-Api-Key"),
-    db: AsyncConnection = Depends(get_app_db_connection)
 ):
     """
         **Finalizes the quiz attempt and provides a performance recap.**\\
@@ -590,21 +592,23 @@ async def get_quiz_summary(
                 total_questions = stats.get('pass', 0) + stats.get('fail', 0) + stats.get('skipped', 0)
                 pass_percentage = (stats.get('pass', 0) / total_questions) * 100 if total_questions > 0 else 0
 
-                await db.execute(
-                    """
-                    UPDATE quiz_attempts
-                    SET status = 'completed', 
-                        pass_percentage = %s,
-                        correct_count = %s,
-                        incorrect_count = %s,
-                        skipped_count = %s,
-                        completed_at = CURRENT_TIMESTAMP,
-                        summary_text = %s, 
-                        interaction_json = %s
-                    WHERE attempt_id = %s
-                    """,
-                    (pass_percentage, stats.get('pass'), stats.get('fail'), stats.get('skipped'),recap_text,json.dumps(history_json), attemptId)
-                )
+                # Connexion empruntée APRÈS la génération du récapitulatif
+                async with lease() as db:
+                    await db.execute(
+                        """
+                        UPDATE quiz_attempts
+                        SET status = 'completed', 
+                            pass_percentage = %s,
+                            correct_count = %s,
+                            incorrect_count = %s,
+                            skipped_count = %s,
+                            completed_at = CURRENT_TIMESTAMP,
+                            summary_text = %s, 
+                            interaction_json = %s
+                        WHERE attempt_id = %s
+                        """,
+                        (pass_percentage, stats.get('pass'), stats.get('fail'), stats.get('skipped'),recap_text,json.dumps(history_json), attemptId)
+                    )
                 print(f"--- [APP DB] Successfully updated quiz attempt '{attemptId}' with final score. ---")
 
     except Exception as e:
@@ -3,7 +3,7 @@ import os
 import uuid
 from pypdf import PdfReader
 from docx import Document
-from langchain_google_genai import ChatGoogleGenerativeAI
+from src.cleeroute.langGraph.learners_api.llm_gateway import gateway
 from langchain_core.messages import HumanMessage
 
 # On garde le modèle Vision pour les images
@@ -11,9 +11,10 @@ VISION_MODEL = os.getenv("MODEL")
 
 class FileIngestionService:
     def __init__(self):
-        self.vision_llm = ChatGoogleGenerativeAI(
-            model=VISION_MODEL, 
-            google_api_key=os.getenv("GEMINI_API_KEY")
+        self.vision_llm = gateway.get_chat_model(
+            VISION_MODEL,
+            os.getenv("GEMINI_API_KEY"),
+            priority="interactive"
         )
 
     async def process_file(self, session_id: str, filename: str, file_bytes: bytes, file_type: str, db):
@@ -1,91 +1,134 @@
+import os
 from psycopg.connection_async import AsyncConnection
 from src.cleeroute.langGraph.learners_api.chats.course_context_for_global_chat import fetch_course_hierarchy
+from src.cleeroute.langGraph.learners_api.chats.services.course_digest import CourseDigestService, CHARS_PER_TOKEN
+from src.cleeroute.db.lease import DbSource, lease
+
+# Budget total du contexte quiz (en tokens approx.), réparti entre digest global et passages ciblés
+QUIZ_CONTEXT_TOKEN_BUDGET = int(os.getenv("QUIZ_CONTEXT_TOKEN_BUDGET", 6000))
+QUIZ_DIGEST_BUDGET_SHARE = 0.4
+QUIZ_CONTEXT_TOP_K = int(os.getenv("QUIZ_CONTEXT_TOP_K", 12))
+
+
+def _fit(text: str, max_chars: int) -> str:
+    """Tronque proprement un bloc de texte au budget."""
+    if len(text) <= max_chars:
+        return text
+    return text[:max_chars].rsplit("\n", 1)[0] + "\n(...)\n"
+
+
+async def _legacy_summaries_block(db: AsyncConnection, course_id: str) -> str:
+    """Fallback quand le digest n'existe pas encore : résumés bruts par section."""
+    cursor = await db.execute(
+        """
+        SELECT sec.title AS section_title, sub.title AS video_title, ts.summary_text
+        FROM transcript_summaries ts
+        JOIN subsection sub ON ts.subsection_id = sub.id
+        JOIN section sec ON sub.section_id = sec.id
+        WHERE sec.course_id = %s
+        ORDER BY sec.position, sub.position
+        """,
+        (course_id,)
+    )
+    all_summaries = await cursor.fetchall()
+    if not all_summaries:
+        return ""
+
+    block = ""
+    current_sec = ""
+    for row in all_summaries:
+        # Gestion Tuple vs Dict
+        if isinstance(row, tuple):
+            sec_title, vid_title, summary = row
+        else:
+            sec_title, vid_title, summary = row['section_title'], row['video_title'], row['summary_text']
+
+        if sec_title != current_sec:
+            block += f"\n-- MODULE: {sec_title} --\n"
+            current_sec = sec_title
+        block += f"Video '{vid_title}': {summary}\n"
+    return block
+
 
 async def build_quiz_context_from_db(
-    db: AsyncConnection, 
-    scope: str, 
-    course_id: str, 
-    section_id: str = None, 
-    subsection_id: str = None
+    db: DbSource,
+    scope: str,
+    course_id: str,
+    section_id: str = None,
+    subsection_id: str = None,
+    query: str = None
 ) -> str:
     """
-    Construit le contexte pour le Quiz selon la stratégie 'Global Summary + Local Deep Dive'.
-    
+    Construit le contexte pour le Quiz selon la stratégie 'Digest Global + Passages Ciblés'.
+
     1. Structure du cours (Titres).
-    2. Résumés de TOUTES les vidéos du cours (Contexte Global).
-    3. Transcript INTÉGRAL de la vidéo courante (si applicable).
+    2. Digest matérialisé du cours (un résumé condensé par section).
+    3. Top-k passages de transcripts pertinents pour `query`, restreints au scope.
+
+    Le tout tient dans QUIZ_CONTEXT_TOKEN_BUDGET.
+    `db` : le pool de préférence, la connexion est rendue avant la vectorisation de `query` (étape 3).
     """
     context_text = ""
+    course_title = course_id
+    budget_chars = QUIZ_CONTEXT_TOKEN_BUDGET * CHARS_PER_TOKEN
+    digest_service = CourseDigestService()
 
     try:
-        # --- 1. STRUCTURE & INTRO (Métadonnées) ---
-        course_obj = await fetch_course_hierarchy(db, course_id)
-        context_text += f"=== COURSE OVERVIEW ===\nTitle: {course_obj.title}\nIntroduction: {course_obj.introduction}\n"
-
-        # --- 2. CONTEXTE GLOBAL (Résumés de TOUTES les vidéos) ---
-        # Peu importe le scope, on veut que l'IA connaisse tout le programme.
-        # On joint pour récupérer les résumés liés à ce cours.
-        cursor = await db.execute(
-            """
-            SELECT sec.title AS section_title, sub.title AS video_title, ts.summary_text
-            FROM transcript_summaries ts
-            JOIN subsection sub ON ts.subsection_id = sub.id
-            JOIN section sec ON sub.section_id = sec.id
-            WHERE sec.course_id = %s
-            ORDER BY sec.position, sub.position
-            """,
-            (course_id,)
-        )
-        all_summaries = await cursor.fetchall()
-        
-        if all_summaries:
-            context_text += "\n=== GLOBAL VIDEO SUMMARIES (All Modules) ===\n"
-            current_sec = ""
-            for row in all_summaries:
-                # Gestion Tuple vs Dict
-                if isinstance(row, tuple):
-                    sec_title, vid_title, summary = row
-                else:
-                    sec_title, vid_title, summary = row['section_title'], row['video_title'], row['summary_text']
-                
-                # Organisation visuelle par section
-                if sec_title != current_sec:
-                    context_text += f"\n-- MODULE: {sec_title} --\n"
-                    current_sec = sec_title
-                
-                context_text += f"Video '{vid_title}': {summary}\n"
-        else:
-            context_text += "\n(No video summaries available yet. The course might be new.)\n"
-
-        # --- 3. CONTEXTE LOCAL (Transcript COMPLET de la vidéo active) ---
-        # Si l'utilisateur est sur une vidéo précise, on veut que le quiz soit très précis dessus.
-        if subsection_id:
-            # On récupère tous les chunks de texte de cette vidéo et on les recolle
-            cursor = await db.execute(
-                """
-                SELECT content 
-                FROM transcript_chunks 
-                WHERE subsection_id = %s 
-                ORDER BY chunk_index ASC
-                """,
-                (subsection_id,)
-            )
-            chunks = await cursor.fetchall()
-            
-            if chunks:
-                full_transcript = " ".join([c[0] if isinstance(c, tuple) else c['content'] for c in chunks])
-                
-                # On ajoute ce gros bloc de texte avec une instruction de priorité
-                context_text += f"\n\n=== 🎯 CURRENT VIDEO FULL TRANSCRIPT (High Priority) ===\n"
-                context_text += f"Use the specific details below to generate precise questions for this video:\n\n"
-                context_text += full_transcript
+        async with lease(db) as conn:
+            # --- 1. STRUCTURE & INTRO (Métadonnées) ---
+            course_obj = await fetch_course_hierarchy(conn, course_id)
+            course_title = course_obj.title
+            context_text += f"=== COURSE OVERVIEW ===\nTitle: {course_obj.title}\nIntroduction: {course_obj.introduction}\n"
+
+            # --- 2. CONTEXTE GLOBAL (Digest par section) ---
+            digest_budget = int(budget_chars * QUIZ_DIGEST_BUDGET_SHARE)
+            digests = await digest_service.get_course_digest(conn, course_id)
+
+            if digests:
+                block = ""
+                for d in digests:
+                    block += f"\n-- MODULE: {d['section_title']} --\n{d['digest_text']}\n"
+                context_text += "\n=== COURSE DIGEST (All Modules) ===\n" + _fit(block, digest_budget)
             else:
-                # Fallback: Si pas de chunks, on vérifie si un résumé existe dans la liste globale (déjà ajouté plus haut)
-                context_text += "\n(Full transcript not processed yet for this video. Using summary above.)\n"
+                # Cours pas encore digéré (ingestions antérieures au digest)
+                block = await _legacy_summaries_block(conn, course_id)
+                if block:
+                    context_text += "\n=== GLOBAL VIDEO SUMMARIES (All Modules) ===\n" + _fit(block, digest_budget)
+                else:
+                    context_text += "\n(No video summaries available yet. The course might be new.)\n"
+
+        # --- 3. CONTEXTE LOCAL (Top-k passages pertinents) ---
+        remaining = budget_chars - len(context_text)
+        search_query = query or course_obj.title
+        chunks = []
+        if remaining > 0 and search_query:
+            try:
+                chunks = await digest_service.search_chunks(
+                    db, course_id, search_query,
+                    section_id=section_id if scope == "section" else None,
+                    subsection_id=subsection_id,
+                    top_k=QUIZ_CONTEXT_TOP_K
+                )
+            except Exception as e:
+                print(f"Quiz context retrieval error: {e}")
+
+        if chunks:
+            header = "\n\n=== 🎯 RELEVANT TRANSCRIPT PASSAGES (High Priority) ===\n"
+            header += "Use the specific details below to generate precise questions:\n\n"
+            block = ""
+            for c in chunks:
+                passage = f"[{c['video_title']}] {c['content']}\n\n"
+                if len(header) + len(block) + len(passage) > remaining:
+                    break
+                block += passage
+            if block:
+                context_text += header + block
+        elif subsection_id:
+            context_text += "\n(Full transcript not processed yet for this video. Using summaries above.)\n"
 
         return context_text
 
     except Exception as e:
         print(f"Error building rich quiz context: {e}")
         # En cas d'erreur SQL, on renvoie au moins le titre pour ne pas crash
-        return f"Course: {course_obj.title} (Detailed context unavailable due to error)"
\ No newline at end of file
+        return f"Course: {course_title} (Detailed context unavailable due to error)"
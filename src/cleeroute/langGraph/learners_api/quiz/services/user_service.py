@@ -1,7 +1,6 @@
 from src.cleeroute.langGraph.learners_api.quiz.models import UserProfile, ResponseStyle
-from psycopg.connection_async import AsyncConnection
-from src.cleeroute.db.app_db import get_app_db_connection
-from fastapi import Depends
+from src.cleeroute.db.lease import DbSource, lease
+from src.cleeroute.db.user_cache import user_cache
 
 # 1. Mapping SOTA des styles vers des instructions LLM
 STYLE_INSTRUCTIONS = {
@@ -15,22 +14,33 @@ STYLE_INSTRUCTIONS = {
 }
 
 
-async def get_user_profile(user_id: str, db: AsyncConnection = Depends(get_app_db_connection)) -> UserProfile:
+async def get_user_profile(user_id: str, db: DbSource = None) -> UserProfile:
     """
     Récupère les infos de personnalisation depuis la BDD métier.
     Gère la conversion des types PostgreSQL vers Pydantic.
+    Profil mis en cache (db/user_cache.py, USER_PROFILE_CACHE_TTL) : `db` (pool, connexion ou None)
+    n'est emprunté qu'en cas de miss. Le profil par défaut renvoyé sur erreur n'est jamais mis en cache.
     """
+    cached = await user_cache.get("profile", user_id)
+    if cached is not None:
+        try:
+            return UserProfile.model_validate_json(cached)
+        except Exception as e:
+            # Modèle modifié depuis la mise en cache : on relit la base
+            print(f"[USER CACHE] Stale profile entry for {user_id}: {e}")
+
     try:
         # Note: Assurez-vous que les noms de colonnes ici correspondent exactement à votre table
-        cursor = await db.execute(
-            """
-            SELECT preferred_language, professional_status, industries, motivation, ai_response_type 
-            FROM profiles
-            WHERE id = %s
-            """, 
-            (user_id,)
-        )
-        row = await cursor.fetchone()
+        async with lease(db) as conn:
+            cursor = await conn.execute(
+                """
+                SELECT preferred_language, professional_status, industries, motivation, ai_response_type 
+                FROM profiles
+                WHERE id = %s
+                """, 
+                (user_id,)
+            )
+            row = await cursor.fetchone()
         
         if row:
             # 1. Extraction sécurisée (Tuple vs Dict selon la config du driver)
@@ -78,7 +88,7 @@ async def get_user_profile(user_id: str, db: AsyncConnection = Depends(get_app_d
             # On récupère le bon Enum, ou CASUAL par défaut si inconnu
             final_style = style_map.get(style_key, ResponseStyle.CASUAL)
 
-            return UserProfile(
+            profile = UserProfile(
                 user_id=user_id,
                 language=lang or "English",
                 profession=prof or "Learner",
@@ -87,8 +97,11 @@ async def get_user_profile(user_id: str, db: AsyncConnection = Depends(get_app_d
                 response_style=final_style 
             )
         else:
-            # Profil introuvable
-            return UserProfile(user_id=user_id)
+            # Profil introuvable (mis en cache aussi : invalidé dès que le profil est créé)
+            profile = UserProfile(user_id=user_id)
+
+        await user_cache.set("profile", user_id, profile.model_dump_json())
+        return profile
             
     except Exception as e:
         print(f"Error fetching user profile: {e}")
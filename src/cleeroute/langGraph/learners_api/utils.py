@@ -1,42 +1,46 @@
 # for retrying after an error or llm timeout anf hallucination
 from langgraph.types import RetryPolicy
 from google.api_core import exceptions
-from langchain_google_genai import ChatGoogleGenerativeAI, GoogleGenerativeAIEmbeddings
+from langchain_google_genai import ChatGoogleGenerativeAI
+from src.cleeroute.langGraph.learners_api.llm_gateway import gateway
+from src.cleeroute.metrics import record_retry
 import os
 from dotenv import load_dotenv
 load_dotenv()
 
 
-def get_llm(api_key: str = None) -> ChatGoogleGenerativeAI:
+def get_llm(api_key: str = None, priority: str = "standard", cache: str = None) -> ChatGoogleGenerativeAI:
+    """
+    Client partagé (mis en cache par la passerelle) : ses appels passent par l'ordonnanceur
+    RPM/TPM de la clé. priority : interactive | standard | background.
+    cache : namespace du cache de réponses exact (uniquement pour les prompts déterministes).
+    """
     if not api_key:
         api_key = os.getenv("GEMINI_API_KEY")
-    return ChatGoogleGenerativeAI(
-        model=os.getenv("MODEL"), 
-        google_api_key=api_key,
-        temperature=0.2
-    )
+    return gateway.get_chat_model(os.getenv("MODEL"), api_key, temperature=0.2, priority=priority, cache=cache)
 
-def get_vision_model(api_key: str = None) -> ChatGoogleGenerativeAI:
+def get_vision_model(api_key: str = None, priority: str = "standard") -> ChatGoogleGenerativeAI:
     if not api_key:
         api_key = os.getenv("GEMINI_API_KEY")
-    return ChatGoogleGenerativeAI(
-        model=os.getenv("VISION_MODEL", "gemini-2.5-flash"), 
-        google_api_key=api_key,
-        temperature=0.1
-    )
+    return gateway.get_chat_model(os.getenv("VISION_MODEL", "gemini-2.5-flash"), api_key, temperature=0.1, priority=priority)
 
 def get_embedding_model(api_key: str = None):
     if not api_key:
         api_key = os.getenv("GEMINI_API_KEY")
-    return GoogleGenerativeAIEmbeddings(
-        model=os.getenv("EMBEDDING_MODEL"),
-        google_api_key=api_key,
-        task_type="retrieval_document"
-    )
+    return gateway.get_embeddings(os.getenv("EMBEDDING_MODEL"), api_key, task_type="retrieval_document")
+
+_RETRYABLE_ERRORS = (TimeoutError, ConnectionError, exceptions.ResourceExhausted)
+
+def _retry_on(exc: Exception) -> bool:
+    """Mêmes erreurs qu'avant ; chaque nouvelle tentative est comptée (cleeroute_retries_total)."""
+    if isinstance(exc, _RETRYABLE_ERRORS):
+        record_retry("graph_node", type(exc).__name__)
+        return True
+    return False
 
 resilient_retry_policy = RetryPolicy(
     max_attempts=3,
-    retry_on=[TimeoutError, ConnectionError, exceptions.ResourceExhausted ],
+    retry_on=_retry_on,
     initial_interval=1.0,
     backoff_factor=2.0,
     jitter=True
@@ -99,4 +99,11 @@ class Subsection(BaseModel):
     description: str = Field(description="A description of what the learner will learn in this subsection.")
 
 class SubsectionOutput(BaseModel):
-    subsections: Optional[List[Subsection]] = None
\ No newline at end of file
+    subsections: Optional[List[Subsection]] = None
+
+
+# --- Génération des sous-sections de TOUTES les sections d'une esquisse (mode batch) ---
+class SubsectionBatchInput(BaseModel):
+    course_title: str = Field(description="The overall title of the course.")
+    course_introduction: str = Field(description="The main course introduction of the overall course.")
+    sections: List[Section] = Field(description="The sections of the outline (as returned by /course_outline).")
@@ -1,19 +1,27 @@
+import os
+import json
+import asyncio
+from collections import OrderedDict
+from typing import Callable, TypedDict, Optional
+from fastapi import APIRouter, Header, HTTPException
+from fastapi.responses import StreamingResponse
 from langchain_google_genai import ChatGoogleGenerativeAI
 # from langchain_groq import ChatGroq
 from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.runnables import Runnable
 from langgraph.graph import StateGraph, END
-from typing import TypedDict
-from fastapi import APIRouter, Header, HTTPException
-from typing import Optional
-import os
+from langgraph.pregel import Pregel
 from dotenv import load_dotenv
 
+from src.cleeroute.langGraph.learners_api.llm_gateway import gateway, key_id
+
 # Importations des modeles
 from src.cleeroute.langGraph.sections_subsections_sep.models import ( # Assurez-vous que le chemin est correct
     CourseInput, 
     SubsectionOutput,
     Course_section,
     SubsectionGenerationInput,
+    SubsectionBatchInput,
 )
 
 # Importations des prompts
@@ -31,6 +39,33 @@ load_dotenv()
 #     temperature=0.2, # Un peu plus de créativité pour les descriptions
 # )
 
+# Borne du nombre de sections générées en même temps par /generate_subsections/batch
+SUBSECTIONS_BATCH_CONCURRENCY = int(os.getenv("SUBSECTIONS_BATCH_CONCURRENCY", 8))
+# Graphes / chaînes compilés gardés en mémoire (une entrée par clé API utilisateur, LRU)
+COMPILED_CHAINS_CACHE_SIZE = int(os.getenv("COMPILED_CHAINS_CACHE_SIZE", 128))
+
+
+def _lru_get_or_create(cache: "OrderedDict", key: str, factory: Callable):
+    value = cache.get(key)
+    if value is None:
+        value = cache[key] = factory()
+        while len(cache) > COMPILED_CHAINS_CACHE_SIZE:
+            cache.popitem(last=False)
+    cache.move_to_end(key)
+    return value
+
+
+def _resolve_api_key(x_gemini_api_key: Optional[str]) -> str:
+    api_key_to_use = x_gemini_api_key if x_gemini_api_key else os.getenv("GEMINI_API_KEY")
+    if not api_key_to_use:
+        raise HTTPException(status_code=400, detail="Gemini API key is not provided. Please provide it via 'X-Gemini-Api-Key' header or set GEMINI_API_KEY in .env.")
+    return api_key_to_use
+
+
+def _get_llm(api_key: str) -> ChatGoogleGenerativeAI:
+    # Client mis en cache par la passerelle (un seul par clé, plus de client neuf à chaque requête)
+    return gateway.get_chat_model(os.getenv("MODEL"), api_key, priority="interactive")
+
 # =============================== API 1: Génération de l'esquisse du cours (Header + Sections Skeletons) ================
 
 # Graph State pour la première API.
@@ -41,7 +76,7 @@ class CourseOutlineGraphState(TypedDict):
 
 # Node unique: Générer l'esquisse complète du cours
 # The LLM in param is just for developpement purposes
-def generate_course_outline_node(
+async def generate_course_outline_node(
         state: CourseOutlineGraphState, 
         llm_instance: ChatGoogleGenerativeAI
     ) -> CourseOutlineGraphState:
@@ -56,7 +91,7 @@ def generate_course_outline_node(
     # Utilise le prompt unifié et le modèle CourseOutline comme sortie structurée
     combined_chain = ChatPromptTemplate.from_template(PROMPT_GENERATE_COURSE_OUTLINE) | llm_instance.with_structured_output(Course_section)
     
-    response: Course_section = combined_chain.invoke({
+    response: Course_section = await combined_chain.ainvoke({
         "title": metadata.title,
         "domains": metadata.domains,
         "categories": metadata.categories,
@@ -74,15 +109,25 @@ def get_course_outline_graph(llm_instance: ChatGoogleGenerativeAI):
     """
     Create and return the graph for generating the course outline.
     """
+    async def generate_outline(state: CourseOutlineGraphState):
+        return await generate_course_outline_node(state, llm_instance=llm_instance)
+
     workflow = StateGraph(CourseOutlineGraphState)
     # Un seul nœud suffit maintenant
-    workflow.add_node("generate_outline", lambda state: generate_course_outline_node(state, llm_instance = llm_instance))
+    workflow.add_node("generate_outline", generate_outline)
     
     workflow.set_entry_point("generate_outline")
     workflow.add_edge("generate_outline", END) # Le nœud mène directement à la fin
     
     return workflow.compile()
 
+
+# Graphes compilés une seule fois par clé API (empreinte de la clé, jamais la clé en clair)
+_outline_graphs: "OrderedDict[str, Pregel]" = OrderedDict()
+
+def get_cached_course_outline_graph(api_key: str) -> Pregel:
+    return _lru_get_or_create(_outline_graphs, key_id(api_key), lambda: get_course_outline_graph(llm_instance=_get_llm(api_key)))
+
 # API Router pour la première API
 course_outline_router = APIRouter() # Renommé pour correspondre à la fonction de sortie
 
@@ -94,18 +139,10 @@ async def get_course_outline(
     """
     Endpoint for generating the course outline, including title, introduction, and main sections.
     """
-    api_key_to_use = x_gemini_api_key if x_gemini_api_key else os.getenv("GEMINI_API_KEY")
-
-    if not api_key_to_use:
-        raise HTTPException(status_code=400, detail="Gemini API key is not provided. Please provide it via 'X-Gemini-Api-Key' header or set GEMINI_API_KEY in .env.")
-    
-    llm_to_use = ChatGoogleGenerativeAI(
-        model=os.getenv("MODEL"), # Utilisez un modèle robuste pour la génération de structure
-        google_api_key=api_key_to_use,
-    )
+    api_key_to_use = _resolve_api_key(x_gemini_api_key)
     
-    graph = get_course_outline_graph(llm_instance = llm_to_use)
-    result = graph.invoke({
+    graph = get_cached_course_outline_graph(api_key_to_use)
+    result = await graph.ainvoke({
         "metadata": metadata,
         "course_section": None # Initialiser l'état avec None pour la sortie
     })
@@ -121,6 +158,12 @@ def generate_subsections_chain(llm_instance: ChatGoogleGenerativeAI = None):
     prompt = ChatPromptTemplate.from_template(PROMPT_GENERATE_SUBSECTIONS)
     return prompt | llm_instance.with_structured_output(SubsectionOutput) # Utilisation de llm_gemini pour la cohérence
 
+
+_subsection_chains: "OrderedDict[str, Runnable]" = OrderedDict()
+
+def get_cached_subsections_chain(api_key: str) -> Runnable:
+    return _lru_get_or_create(_subsection_chains, key_id(api_key), lambda: generate_subsections_chain(llm_instance=_get_llm(api_key)))
+
 # API Router pour la deuxième API
 course_subsections_router = APIRouter()
 
@@ -132,23 +175,69 @@ async def generate_subsections_for_section(
     """
     Endpoint for generating subsections for a specific section.
     """
-    api_key_to_use = x_gemini_api_key if x_gemini_api_key else os.getenv("GEMINI_API_KEY")
+    api_key_to_use = _resolve_api_key(x_gemini_api_key)
 
-    if not api_key_to_use:
-        raise HTTPException(status_code=400, detail="Gemini API key is not provided. Please provide it via 'X-Gemini-Api-Key' header or set GEMINI_API_KEY in .env.")
-    
-    llm_to_use = ChatGoogleGenerativeAI(
-        model=os.getenv("MODEL"),
-        google_api_key=api_key_to_use,
-    )
-
-    sub_chain = generate_subsections_chain(llm_instance=llm_to_use)
+    sub_chain = get_cached_subsections_chain(api_key_to_use)
     
-    response: SubsectionOutput = sub_chain.invoke({
+    response: SubsectionOutput = await sub_chain.ainvoke({
         "course_title": input_data.course_title,
         "course_introduction": input_data.course_introduction,
         "section_title": input_data.section_title,
         "section_description": input_data.section_description
     })
     
-    return response
\ No newline at end of file
+    return response
+
+
+@course_subsections_router.post("/generate_subsections/batch")
+async def generate_subsections_for_all_sections(
+    input_data: SubsectionBatchInput,
+    x_gemini_api_key: Optional[str] = Header(None, alias="X-Gemini-Api-Key")
+):
+    """
+    Generates the subsections of EVERY section of an outline concurrently (SSE).\n
+    Each section is streamed as soon as it is ready (arrival order, not outline order):\n
+        {"type": "section", "index": 2, "section_title": "...", "subsections": [...]}\n
+        {"type": "section_error", "index": 5, "section_title": "...", "error": "..."}\n
+        {"type": "end", "completed": 9, "failed": 1}
+    """
+    api_key_to_use = _resolve_api_key(x_gemini_api_key)
+    sub_chain = get_cached_subsections_chain(api_key_to_use)
+    semaphore = asyncio.Semaphore(SUBSECTIONS_BATCH_CONCURRENCY)
+
+    async def generate_one(index: int, section):
+        async with semaphore:
+            try:
+                response: SubsectionOutput = await sub_chain.ainvoke({
+                    "course_title": input_data.course_title,
+                    "course_introduction": input_data.course_introduction,
+                    "section_title": section.title,
+                    "section_description": section.description
+                })
+                return index, section, response, None
+            except Exception as e:
+                print(f"Subsection generation failed for section {index}: {e}")
+                return index, section, None, str(e)
+
+    async def event_stream():
+        tasks = [asyncio.create_task(generate_one(i, s)) for i, s in enumerate(input_data.sections)]
+        completed = failed = 0
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                index, section, response, error = await next_done
+                if error is None:
+                    completed += 1
+                    subsections = [s.model_dump() for s in (response.subsections or [])]
+                    payload = {"type": "section", "index": index, "section_title": section.title, "subsections": subsections}
+                else:
+                    failed += 1
+                    payload = {"type": "section_error", "index": index, "section_title": section.title, "error": error}
+                yield f"data: {json.dumps(payload)}\n\n"
+
+            yield f"data: {json.dumps({'type': 'end', 'completed': completed, 'failed': failed})}\n\n"
+        finally:
+            # Client déconnecté : on n'épuise pas le quota pour des sections que personne ne lira
+            for task in tasks:
+                task.cancel()
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream")
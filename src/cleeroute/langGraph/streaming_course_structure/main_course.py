@@ -2,14 +2,18 @@
 import os
 import json
 from dotenv import load_dotenv
-from typing import TypedDict, Dict, Any, Optional, List
+from typing import TypedDict, Dict, Any, Optional, List, Annotated
 
 from fastapi import FastAPI, APIRouter
 from fastapi.responses import StreamingResponse
 
-from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_core.prompts import ChatPromptTemplate
 from langgraph.graph import StateGraph, END
+from langgraph.types import Send
+
+from src.cleeroute.langGraph.learners_api.llm_gateway import gateway
+from src.cleeroute.lazy_init import LazyResource, lazy_resource
+from src.cleeroute.metrics import track
 
 # Importe tes modèles et prompts
 from src.cleeroute.langGraph.streaming_course_structure.models_course import CourseInput, Course, CourseHeader, SectionSkeletonList, SubsectionsList
@@ -21,79 +25,110 @@ from src.cleeroute.langGraph.streaming_course_structure.prompts_course import (
 
 load_dotenv()
 
+# Nombre max de sections traitées en parallèle (borne le fan-out)
+COURSE_STRUCTURE_MAX_CONCURRENCY = int(os.getenv("COURSE_STRUCTURE_MAX_CONCURRENCY", 8))
+
 # --- Configuration du LLM ---
-llm = ChatGoogleGenerativeAI(
-    model=os.getenv("MODEL"),
-    google_api_key=os.getenv("GEMINI_API_KEY"),
-    temperature=0.3 # Plus factuel pour la structure
-)
+# Chaînes construites une seule fois, au premier usage (client partagé via la passerelle)
+@lazy_resource("course_structure.chains")
+def course_structure_chains():
+    llm = gateway.get_chat_model(
+        os.getenv("MODEL"),
+        os.getenv("GEMINI_API_KEY"),
+        temperature=0.3, # Plus factuel pour la structure
+        priority="interactive"
+    )
+    return {
+        "header": ChatPromptTemplate.from_template(PROMPT_GENERATE_COURSE_HEADER) | llm.with_structured_output(CourseHeader),
+        "sections": ChatPromptTemplate.from_template(PROMPT_GENERATE_SECTION_SKELETONS) | llm.with_structured_output(SectionSkeletonList),
+        "subsections": ChatPromptTemplate.from_template(PROMPT_GENERATE_SUBSECTIONS) | llm.with_structured_output(SubsectionsList),
+    }
+
+
+def _merge_subsections(left: Dict[int, List[dict]], right: Dict[int, List[dict]]) -> Dict[int, List[dict]]:
+    """Reducer : chaque branche parallèle ajoute les sous-sections de SA section."""
+    return {**(left or {}), **(right or {})}
+
 
 # --- Définition de l'état du Graphe ---
 class GraphState(TypedDict):
     metadata: CourseInput
     partial_course: Dict[str, Any]
-    section_index: int
+    subsections: Annotated[Dict[int, List[dict]], _merge_subsections]
     course: Optional[Course]
 
+
+class SectionTask(TypedDict):
+    """État envoyé (Send) à chaque branche de génération des sous-sections."""
+    metadata: CourseInput
+    course_title: str
+    section_index: int
+    section: Dict[str, Any]
+
 # --- Définition des Noeuds du Graphe ---
 
-def generate_header_node(state: GraphState):
+@track("graph_node", "course_structure.header")
+async def generate_header_node(state: GraphState):
     print("--- Couse title generation ---")
-    prompt = ChatPromptTemplate.from_template(PROMPT_GENERATE_COURSE_HEADER)
-    chain = prompt | llm.with_structured_output(CourseHeader)
-    response = chain.invoke(state["metadata"].model_dump())
+    response = await course_structure_chains.get()["header"].ainvoke(state["metadata"].model_dump())
     return {"partial_course": response.model_dump()}
 
-def generate_sections_node(state: GraphState):
+@track("graph_node", "course_structure.sections")
+async def generate_sections_node(state: GraphState):
     print("--- Squelleton's sections generation ---")
-    prompt = ChatPromptTemplate.from_template(PROMPT_GENERATE_SECTION_SKELETONS)
-    chain = prompt | llm.with_structured_output(SectionSkeletonList)
-    response = chain.invoke(state["metadata"].model_dump())
+    response = await course_structure_chains.get()["sections"].ainvoke(state["metadata"].model_dump())
     
-    # Fusionne avec l'état existant et initialise l'index pour la boucle
+    # Fusionne avec l'état existant
     updated_course = {**state["partial_course"], "sections": [s.model_dump() for s in response.sections]}
-    return {"partial_course": updated_course, "section_index": 0}
+    return {"partial_course": updated_course}
 
-def generate_subsections_node(state: GraphState):
+@track("graph_node", "course_structure.subsections")
+async def generate_subsections_node(state: SectionTask):
     """
-        This node generates subsections for a specific section in the course using loop strategie.
+        Generates the subsections of ONE section. One instance runs per section, in parallel (fan-out).
     """
     index = state["section_index"]
-    section_to_process = state["partial_course"]["sections"][index]
+    section_to_process = state["section"]
     print(f"--- 3.{index+1} Génération des sous-sections pour: '{section_to_process['title']}' ---")
     
-    prompt = ChatPromptTemplate.from_template(PROMPT_GENERATE_SUBSECTIONS)
-    chain = prompt | llm.with_structured_output(SubsectionsList)
-    
     context = {
-        "course_title": state["partial_course"]["title"],
+        "course_title": state["course_title"],
         "course_objectives": state["metadata"].objectives,
         "section_title": section_to_process["title"],
         "section_description": section_to_process["description"],
     }
-    response = chain.invoke(context)
+    response = await course_structure_chains.get()["subsections"].ainvoke(context)
     
-    # update the current course with the new subsections
-    current_course = state["partial_course"]
-    current_course["sections"][index]["subsections"] = [s.model_dump() for s in response.subsections]
-    
-    # Increment the index for the next iteration
-    return {"partial_course": current_course, "section_index": index + 1}
+    return {"subsections": {index: [s.model_dump() for s in response.subsections]}}
 
+@track("graph_node", "course_structure.finalize")
 def finalize_course_node(state: GraphState):
-    """Valide l'objet complet à la toute fin."""
+    """Assemble les sous-sections de chaque section et valide l'objet complet."""
     print("--- 4. Finalisation de la structure du cours ---")
-    final_course = Course.model_validate(state['partial_course'])
+    course = {**state["partial_course"]}
+    course["sections"] = [
+        {**section, "subsections": state.get("subsections", {}).get(i, [])}
+        for i, section in enumerate(course.get("sections", []))
+    ]
+    final_course = Course.model_validate(course)
     return {"course": final_course}
 
 # --- Defining conditional edges ---
 
-def should_continue(state: GraphState):
-    """Décide s'il faut continuer la boucle de génération des sous-sections."""
-    if state["section_index"] < len(state["partial_course"]["sections"]):
-        return "continue"
-    else:
-        return "end"
+def fan_out_sections(state: GraphState):
+    """Une branche par section : les sections sont indépendantes une fois le squelette généré."""
+    sections = state["partial_course"].get("sections", [])
+    if not sections:
+        return "finalize"
+    return [
+        Send("gen_subsections", {
+            "metadata": state["metadata"],
+            "course_title": state["partial_course"]["title"],
+            "section_index": i,
+            "section": section,
+        })
+        for i, section in enumerate(sections)
+    ]
 
 # --- Construction du Graphe ---
 def get_course_structure_graph():
@@ -106,17 +141,10 @@ def get_course_structure_graph():
     
     workflow.set_entry_point("gen_header")
     workflow.add_edge("gen_header", "gen_sections")
-    workflow.add_edge("gen_sections", "gen_subsections")
     
-    # La boucle est ici !
-    workflow.add_conditional_edges(
-        "gen_subsections",
-        should_continue,
-        {
-            "continue": "gen_subsections", # Boucle sur lui-même
-            "end": "finalize"              # Sort de la boucle
-        }
-    )
+    # Fan-out parallèle, puis toutes les branches convergent vers la finalisation
+    workflow.add_conditional_edges("gen_sections", fan_out_sections, ["gen_subsections", "finalize"])
+    workflow.add_edge("gen_subsections", "finalize")
     workflow.add_edge("finalize", END)
     
     return workflow.compile()
@@ -124,27 +152,31 @@ def get_course_structure_graph():
 # --- API Router ---
 app = FastAPI(title="API de Génération de Cours")
 course_structure_router_stream = APIRouter()
-graph = get_course_structure_graph()
+course_structure_graph = LazyResource("course_structure.graph", get_course_structure_graph)
 
 @course_structure_router_stream.post("/course_structure/stream")
 async def course_structure_stream(metadata: CourseInput):
     """
     Endpoint for streaming course structure generation.
     This endpoint uses Server-Sent Events (SSE) to stream the course structure generation process.
+    Each event is the partial course so far; the subsections of a section are sent as soon as
+    that section is ready (sections are generated in parallel, so their order may vary).
     """
     async def event_stream():
-        config = {"recursion_limit": 50}
-        async for event in graph.astream_events(
-            {"metadata": metadata}, 
-            config=config,
-            version="v1"
-        ):
-            kind = event["event"]
-            if kind == "on_chain_end":
-                node_name = event["name"]
-                if "partial_course" in event["data"]["output"]:
-                    print(f"Streaming de la sortie du noeud: {node_name}")
-                    data_to_send = event["data"]["output"]["partial_course"]
-                    yield f"data: {json.dumps(data_to_send)}\n\n"
-
-    return StreamingResponse(event_stream(), media_type="text/event-stream")
\ No newline at end of file
+        config = {"recursion_limit": 50, "max_concurrency": COURSE_STRUCTURE_MAX_CONCURRENCY}
+        partial_course: Dict[str, Any] = {}
+        async for update in course_structure_graph.get().astream({"metadata": metadata, "subsections": {}}, config=config, stream_mode="updates"):
+            for node_name, output in update.items():
+                if not output:
+                    continue
+                if "partial_course" in output:
+                    partial_course = output["partial_course"]
+                elif "subsections" in output:
+                    for index, subsections in output["subsections"].items():
+                        partial_course["sections"][index]["subsections"] = subsections
+                else:
+                    continue
+                print(f"Streaming de la sortie du noeud: {node_name}")
+                yield f"data: {json.dumps(partial_course)}\n\n"
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream")
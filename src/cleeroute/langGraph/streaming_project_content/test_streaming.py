@@ -2,14 +2,17 @@
 import os
 import json
 from dotenv import load_dotenv
-from typing import TypedDict, Dict, Any, Optional
+from typing import TypedDict, Dict, Any, Optional, Annotated
 from fastapi import FastAPI, APIRouter
 from fastapi.responses import StreamingResponse
 
-from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_core.prompts import ChatPromptTemplate
 from langgraph.graph import StateGraph, END
 
+from src.cleeroute.langGraph.learners_api.llm_gateway import gateway
+from src.cleeroute.lazy_init import LazyResource, lazy_resource
+from src.cleeroute.metrics import track
+
 # Importe tes modèles et prompts
 from src.cleeroute.langGraph.streaming_project_content.test_streaming_models import RequiredGenProjInput, Project, TitleDesc, ObjectivesPrereqs, Steps, Evaluation
 from src.cleeroute.langGraph.streaming_project_content.test_streaming_prompt import (
@@ -22,69 +25,82 @@ from src.cleeroute.langGraph.streaming_project_content.test_streaming_prompt imp
 load_dotenv()
 
 # --- Configuration du LLM ---
-llm = ChatGoogleGenerativeAI(
-    model=os.getenv("MODEL", "gemini-1.5-flash"), # Assure un fallback
-    google_api_key=os.getenv("GEMINI_API_KEY"),
-    temperature=0.7 # Un peu de créativité pour le Game Master
-)
+@lazy_resource("project_content.llm")
+def project_llm():
+    return gateway.get_chat_model(
+        os.getenv("MODEL", "gemini-1.5-flash"), # Assure un fallback
+        os.getenv("GEMINI_API_KEY"),
+        temperature=0.7, # Un peu de créativité pour le Game Master
+        priority="interactive"
+    )
+
+
+def _merge_project(left: Dict[str, Any], right: Dict[str, Any]) -> Dict[str, Any]:
+    """Reducer : steps et évaluation tournent en parallèle, chacun n'écrit que ses propres champs."""
+    return {**(left or {}), **(right or {})}
+
 
 # --- Définition de l'état du Graphe ---
 class GraphState(TypedDict):
     requiredInput: RequiredGenProjInput
-    partial_project: Dict[str, Any]
+    partial_project: Annotated[Dict[str, Any], _merge_project]
     project: Optional[Project]
 
-# --- Définition des Noeuds du Graphe ---
+# --- Construction du Graphe ---
+def get_streaming_project_graph(llm_instance=None):
+    """
+    DAG des dépendances réelles entre les étapes :
 
-def generate_title_desc_node(state: GraphState):
-    print("---Génération Titre & Description---")
-    prompt = ChatPromptTemplate.from_template(PROMPT_GENERATE_TITLE_DESC)
-    chain = prompt | llm.with_structured_output(TitleDesc)
-    
-    response = chain.invoke(state["requiredInput"].model_dump())
-    return {"partial_project": response.model_dump()}
+        title_desc -> objectives -> steps      -> finalize
+                                 -> evaluation ->
 
-def generate_objectives_node(state: GraphState):
-    print("---Génération Objectifs & Prérequis---")
-    prompt = ChatPromptTemplate.from_template(PROMPT_GENERATE_OBJECTIVES)
-    chain = prompt | llm.with_structured_output(ObjectivesPrereqs)
-    
-    context = {**state["requiredInput"].model_dump(), **state["partial_project"]}
-    response = chain.invoke(context)
-    
-    updated_project = {**state["partial_project"], **response.model_dump()}
-    return {"partial_project": updated_project}
+    steps et evaluation ne dépendent que du titre et des objectifs : ils s'exécutent en parallèle.
+    `llm_instance` permet d'injecter un autre modèle (benchmarks).
+    """
+    llm_to_use = llm_instance or project_llm.get()
 
-def generate_steps_node(state: GraphState):
-    print("---Génération des Étapes---")
-    prompt = ChatPromptTemplate.from_template(PROMPT_GENERATE_STEPS)
-    chain = prompt | llm.with_structured_output(Steps)
-    
-    context = {**state["requiredInput"].model_dump(), **state["partial_project"]}
-    response = chain.invoke(context)
-    
-    updated_project = {**state["partial_project"], **response.model_dump()}
-    return {"partial_project": updated_project}
+    # Chaînes construites une fois par graphe
+    title_chain = ChatPromptTemplate.from_template(PROMPT_GENERATE_TITLE_DESC) | llm_to_use.with_structured_output(TitleDesc)
+    objectives_chain = ChatPromptTemplate.from_template(PROMPT_GENERATE_OBJECTIVES) | llm_to_use.with_structured_output(ObjectivesPrereqs)
+    steps_chain = ChatPromptTemplate.from_template(PROMPT_GENERATE_STEPS) | llm_to_use.with_structured_output(Steps)
+    evaluation_chain = ChatPromptTemplate.from_template(PROMPT_GENERATE_EVALUATION) | llm_to_use.with_structured_output(Evaluation)
 
-def generate_evaluation_node(state: GraphState):
-    print("---Génération Évaluation---")
-    prompt = ChatPromptTemplate.from_template(PROMPT_GENERATE_EVALUATION)
-    chain = prompt | llm.with_structured_output(Evaluation)
-    
-    context = {**state["partial_project"]}
-    response = chain.invoke(context)
-    
-    updated_project = {**state["partial_project"], **response.model_dump()}
-    return {"partial_project": updated_project}
+    # --- Définition des Noeuds du Graphe ---
 
-def finalize_project_node(state: GraphState):
-    """Ce noeud final valide le dictionnaire complet et le convertit en objet Pydantic."""
-    print("---Finalisation du Projet---")
-    final_project = Project.model_validate(state['partial_project'])
-    return {"project": final_project}
+    @track("graph_node", "project_content.title_desc")
+    async def generate_title_desc_node(state: GraphState):
+        print("---Génération Titre & Description---")
+        response = await title_chain.ainvoke(state["requiredInput"].model_dump())
+        return {"partial_project": response.model_dump()}
+
+    @track("graph_node", "project_content.objectives")
+    async def generate_objectives_node(state: GraphState):
+        print("---Génération Objectifs & Prérequis---")
+        context = {**state["requiredInput"].model_dump(), **state["partial_project"]}
+        response = await objectives_chain.ainvoke(context)
+        return {"partial_project": response.model_dump()}
+
+    @track("graph_node", "project_content.steps")
+    async def generate_steps_node(state: GraphState):
+        print("---Génération des Étapes---")
+        context = {**state["requiredInput"].model_dump(), **state["partial_project"]}
+        response = await steps_chain.ainvoke(context)
+        return {"partial_project": response.model_dump()}
+
+    @track("graph_node", "project_content.evaluation")
+    async def generate_evaluation_node(state: GraphState):
+        print("---Génération Évaluation---")
+        context = {**state["partial_project"]}
+        response = await evaluation_chain.ainvoke(context)
+        return {"partial_project": response.model_dump()}
+
+    @track("graph_node", "project_content.finalize")
+    def finalize_project_node(state: GraphState):
+        """Ce noeud final valide le dictionnaire complet et le convertit en objet Pydantic."""
+        print("---Finalisation du Projet---")
+        final_project = Project.model_validate(state['partial_project'])
+        return {"project": final_project}
 
-# --- Construction du Graphe ---
-def get_streaming_project_graph():
     workflow = StateGraph(GraphState)
     
     # Ajout des noeuds
@@ -98,38 +114,39 @@ def get_streaming_project_graph():
     workflow.set_entry_point("gen_title_desc")
     workflow.add_edge("gen_title_desc", "gen_objectives")
     workflow.add_edge("gen_objectives", "gen_steps")
-    workflow.add_edge("gen_steps", "gen_evaluation")
-    workflow.add_edge("gen_evaluation", "finalize")
+    workflow.add_edge("gen_objectives", "gen_evaluation")
+    # finalize attend les DEUX branches
+    workflow.add_edge(["gen_steps", "gen_evaluation"], "finalize")
     workflow.add_edge("finalize", END)
     
     return workflow.compile()
 
+
+async def stream_partial_projects(graph, requiredInput: RequiredGenProjInput):
+    """Projet partiel (cumulé) après chaque noeud, dans l'ordre où les noeuds terminent."""
+    partial_project: Dict[str, Any] = {}
+    async for update in graph.astream({"requiredInput": requiredInput, "partial_project": {}}, stream_mode="updates"):
+        for node_name, output in update.items():
+            if output and "partial_project" in output:
+                partial_project = {**partial_project, **output["partial_project"]}
+                yield node_name, partial_project
+
 # --- API Router ---
 app = FastAPI(title="API de Génération de Projets Pédagogiques")
 project_content_router_stream = APIRouter()
-graph = get_streaming_project_graph()
+project_graph = LazyResource("project_content.graph", get_streaming_project_graph)
 
 @project_content_router_stream.post("/project_content/stream")
 async def course_structure_stream(requiredInput: RequiredGenProjInput):
     """
     Endpoint for streaming project content generation.
     This endpoint uses Server-Sent Events (SSE) to stream the project content generation process.
+    Steps and evaluation are generated concurrently; each event is the project accumulated so far.
     """
     async def event_stream():
-        # astream_events nous donne un flux d'événements du graphe
-        async for event in graph.astream_events(
-            { "requiredInput": requiredInput, "partial_project": {} }, 
-            version="v1"
-        ):
-            kind = event["event"]
-            # Nous envoyons une mise à jour au frontend à la fin de chaque noeud
-            if kind == "on_chain_end":
-                node_name = event["name"]
-                # On s'assure que le noeud a produit des données
-                if "partial_project" in event["data"]["output"]:
-                    print(f"Streaming de la sortie du noeud: {node_name}")
-                    data_to_send = event["data"]["output"]["partial_project"]
-                    # Format Server-Sent Events (SSE)
-                    yield f"data: {json.dumps(data_to_send)}\n\n"
-
-    return StreamingResponse(event_stream(), media_type="text/event-stream")
\ No newline at end of file
+        async for node_name, partial_project in stream_partial_projects(project_graph.get(), requiredInput):
+            print(f"Streaming de la sortie du noeud: {node_name}")
+            # Format Server-Sent Events (SSE)
+            yield f"data: {json.dumps(partial_project)}\n\n"
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream")
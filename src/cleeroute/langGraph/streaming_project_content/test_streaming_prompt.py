@@ -76,10 +76,11 @@ The quest is almost complete. How will the Hero prove their victory and how will
 
 # QUEST CONTEXT
 - Title: "{title}"
-- Steps to complete: {steps}
+- Victory conditions (objectives): {objectives}
 
 # TASK
 Define precisely what the Hero must submit (The Proof of Triumph) and how their work will be evaluated (The Judgment Criteria).
+Each deliverable and criterion must prove one of the victory conditions above.
 Be clear and fair. The JSON must be the ONLY thing in your response.
 
 # STRICT JSON FORMAT
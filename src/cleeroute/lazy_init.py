@@ -0,0 +1,129 @@
+# Fichier: src/cleeroute/lazy_init.py
+# Initialisation paresseuse des ressources lourdes (clients LLM, services Azure, graphes compilés).
+# Importer un module ne doit plus rien construire : la ressource est créée au premier `.get()`,
+# ou pendant le warm-up lancé par le lifespan de l'API (en tâche de fond, après le démarrage).
+import os
+import time
+import asyncio
+import logging
+import threading
+from typing import Awaitable, Callable, Dict, Generic, Iterable, Optional, TypeVar
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Construit les ressources enregistrées juste après le démarrage (false : uniquement au premier usage)
+LAZY_WARMUP_ENABLED = os.getenv("LAZY_WARMUP_ENABLED", "true").lower() == "true"
+
+_resources: Dict[str, "LazyResource"] = {}
+# Initialisations asynchrones (graphes qui ont besoin du checkpointer de la boucle courante)
+_async_warmups: Dict[str, Callable[[], Awaitable]] = {}
+
+
+class LazyResource(Generic[T]):
+    """
+    Ressource construite une seule fois, au premier `.get()` (thread-safe :
+    l'API et les threads des workers Celery peuvent y accéder en concurrence).
+    """
+
+    def __init__(self, name: str, factory: Callable[[], T]):
+        self.name = name
+        self.factory = factory
+        self._value: Optional[T] = None
+        self._ready = False
+        self._lock = threading.Lock()
+        self.init_seconds: Optional[float] = None
+        _resources[name] = self
+
+    @property
+    def ready(self) -> bool:
+        return self._ready
+
+    def get(self) -> T:
+        if self._ready:
+            return self._value
+        with self._lock:
+            if not self._ready:
+                start = time.perf_counter()
+                self._value = self.factory()
+                self.init_seconds = time.perf_counter() - start
+                self._ready = True
+                print(f"--- LAZY INIT: {self.name} ({self.init_seconds * 1000:.0f} ms) ---")
+        return self._value
+
+    def reset(self):
+        """Oublie l'instance (la prochaine lecture la reconstruit)."""
+        with self._lock:
+            self._value = None
+            self._ready = False
+            self.init_seconds = None
+
+
+def lazy_resource(name: str) -> Callable[[Callable[[], T]], LazyResource[T]]:
+    """
+    Décorateur : transforme une factory sans argument en ressource paresseuse.
+
+        @lazy_resource("chats.qa_llm")
+        def qa_llm():
+            return get_llm(...)
+
+        qa_llm.get().ainvoke(...)
+    """
+    def decorator(factory: Callable[[], T]) -> LazyResource[T]:
+        return LazyResource(name, factory)
+    return decorator
+
+
+def register_async_warmup(name: str, warmup: Callable[[], Awaitable]):
+    """Déclare une initialisation asynchrone (ex: `get_quiz_graph`) exécutée pendant le warm-up."""
+    _async_warmups[name] = warmup
+
+
+def warm_up(names: Optional[Iterable[str]] = None) -> Dict[str, Optional[float]]:
+    """
+    Construit les ressources synchrones (toutes, ou `names`). Un échec n'est pas fatal :
+    la ressource sera retentée au premier usage. Retourne {nom: secondes | None si échec}.
+    """
+    timings: Dict[str, Optional[float]] = {}
+    for name in list(names) if names is not None else list(_resources):
+        resource = _resources.get(name)
+        if resource is None:
+            continue
+        try:
+            resource.get()
+            timings[name] = resource.init_seconds
+        except Exception as e:
+            timings[name] = None
+            logger.warning(f"Lazy warm-up failed for '{name}' (retried on first use): {e}")
+    return timings
+
+
+async def warm_up_all() -> Dict[str, Optional[float]]:
+    """Warm-up complet depuis le lifespan : factories dans un thread, puis les init asynchrones."""
+    start = time.perf_counter()
+    timings = await asyncio.to_thread(warm_up)
+    for name, warmup in list(_async_warmups.items()):
+        step = time.perf_counter()
+        try:
+            await warmup()
+            timings[name] = time.perf_counter() - step
+        except Exception as e:
+            timings[name] = None
+            logger.warning(f"Lazy warm-up failed for '{name}' (retried on first use): {e}")
+    print(f"--- LAZY WARM-UP: {len(timings)} resources in {time.perf_counter() - start:.2f}s ---")
+    return timings
+
+
+def stats() -> Dict:
+    return {
+        "resources": {
+            name: {"ready": r.ready, "init_ms": round(r.init_seconds * 1000, 1) if r.init_seconds is not None else None}
+            for name, r in sorted(_resources.items())
+        },
+        "async_warmups": sorted(_async_warmups),
+    }
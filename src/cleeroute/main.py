@@ -1,12 +1,14 @@
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 import time
+import asyncio
 
 from src.cleeroute.db.checkpointer import lifespan as checkpointer_lifespan
 from src.cleeroute.db.app_db import app_db_lifespan as application_db_lifespan
 from contextlib import asynccontextmanager
 
 from src.cleeroute.langGraph.learners_api.metadata_from_learner.meta_data_gen import router_metadata
+from src.cleeroute.langGraph.learners_api.metadata_from_learner.taxonomy_index import warm_taxonomy_index
 # from src.cleeroute.langGraph.course_agents import course_structure_router
 # from src.cleeroute.langGraph.project_generator import project_content_router
 
@@ -21,6 +23,11 @@ from src.cleeroute.langGraph.learners_api.quiz.routers import quiz_router
 from src.cleeroute.langGraph.learners_api.chats.routers import global_chat_router, upload_file_router
 from src.cleeroute.langGraph.learners_api.chats.routers import stream_global_chat_router
 from src.cleeroute.langGraph.learners_api.quiz.router_with_streaming import stream_quiz_router
+from src.cleeroute.langGraph.learners_api.llm_gateway import llm_gateway_router
+from src.cleeroute.lazy_init import LAZY_WARMUP_ENABLED, warm_up_all
+from src.cleeroute.metrics import metrics_router, observe
+from src.cleeroute.db.user_cache import user_cache_router, start_invalidation_listener
+from src.cleeroute.tracing import setup_tracing, shutdown_tracing, server_span
 from fastapi import APIRouter
 # from contextlib import asynccontextmanager
 
@@ -32,10 +39,23 @@ async def main_lifespan(app: FastAPI):
     """
     Le gestionnaire de cycle de vie principal qui orchestre les autres.
     """
+    setup_tracing("cleeroute-api")
     # On entre dans le contexte de chaque gestionnaire de cycle de vie
     async with checkpointer_lifespan(app):
         async with application_db_lifespan(app):
+            # Index de la taxonomie construit en tâche de fond (ne retarde pas le démarrage)
+            taxonomy_warmup = asyncio.create_task(warm_taxonomy_index())
+            # Clients LLM / services / graphes : construits après le démarrage plutôt qu'à l'import
+            lazy_warmup = asyncio.create_task(warm_up_all()) if LAZY_WARMUP_ENABLED else None
+            # Invalidations du cache profil / premium émises par les autres process (NOTIFY)
+            user_cache_listener = start_invalidation_listener()
             yield
+            taxonomy_warmup.cancel()
+            if lazy_warmup:
+                lazy_warmup.cancel()
+            if user_cache_listener:
+                user_cache_listener.cancel()
+    shutdown_tracing()
 
 app = FastAPI(
     title="Cleeroute AI API",
@@ -84,14 +104,33 @@ MODEL_CONFIG = {
 @app.middleware("http")
 async def add_process_time_header(request: Request, call_next):
     start_time = time.perf_counter() 
-    response = await call_next(request)
-    
-    process_time = time.perf_counter() - start_time
-    response.headers["X-Process-Time-Seconds"] = f"{process_time:.4f}"
+    # Span racine de la requête : les tâches Celery et noeuds de graphe déclenchés s'y rattachent
+    with server_span(f"{request.method} {request.url.path}", dict(request.headers),
+                     {"http.method": request.method, "http.target": request.url.path}) as span:
+        try:
+            response = await call_next(request)
+        except Exception:
+            observe("http_request", _route_label(request), time.perf_counter() - start_time, "error")
+            raise
+        
+        process_time = time.perf_counter() - start_time
+        response.headers["X-Process-Time-Seconds"] = f"{process_time:.4f}"
+        # Pour un endpoint SSE, c'est le temps jusqu'au premier octet, pas la durée du flux
+        observe("http_request", _route_label(request), process_time, "error" if response.status_code >= 500 else "ok")
+        if span is not None:
+            span.update_name(_route_label(request))
+            span.set_attribute("http.status_code", response.status_code)
+            response.headers["X-Trace-Id"] = format(span.get_span_context().trace_id, "032x")
     
     return response
 
 
+def _route_label(request: Request) -> str:
+    # Gabarit de la route ("/sessions/{sessionId}/ask") : pas un label par identifiant
+    route = request.scope.get("route")
+    return f"{request.method} {route.path}" if route is not None else f"{request.method} unmatched"
+
+
 # ========================================================================================
 app.include_router(router_metadata, prefix="/metadata", tags=["Metadata Generators"])
 # =======================================================================================
@@ -123,6 +162,10 @@ app.include_router(stream_global_chat_router, prefix="", tags=["Streaming Global
 # =============================================================================================
 app.include_router(upload_file_router, prefix="", tags=["File Uploads for chat sessions"])
 # =============================================================================================
+app.include_router(llm_gateway_router, prefix="", tags=["Observability"])
+app.include_router(metrics_router, prefix="", tags=["Observability"])
+app.include_router(user_cache_router, prefix="", tags=["User cache"])
+# =============================================================================================
     
 if __name__ == "__main__":
     import uvicorn
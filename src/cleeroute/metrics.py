@@ -0,0 +1,241 @@
+# Fichier: src/cleeroute/metrics.py
+# Métriques Prometheus : latence par étape (DB, attente du pool, LLM, YouTube, embeddings,
+# Azure, noeuds LangGraph, requêtes HTTP), tokens LLM, hits/miss des caches, retries et statistiques
+# des pools Postgres (db/pools.py).
+#
+#     with track("youtube_call", "playlists.list"):
+#         ...
+#
+#     @track("graph_node", "quiz.generate_questions")
+#     async def generate_questions_node(state): ...
+#
+# Exposées sur GET /metrics (API) et, côté worker Celery, sur WORKER_METRICS_PORT.
+import os
+import time
+import functools
+import inspect
+from typing import Optional
+
+from fastapi import APIRouter, Response
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    REGISTRY,
+    generate_latest,
+    multiprocess,
+    start_http_server,
+)
+from dotenv import load_dotenv
+
+from src.cleeroute.tracing import stage_span
+
+load_dotenv()
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+# Port HTTP des métriques d'un worker Celery (0 = désactivé)
+WORKER_METRICS_PORT = int(os.getenv("WORKER_METRICS_PORT", 0))
+
+# Étapes connues (label "stage") : le label "name" précise l'opération (modèle, requête, noeud...)
+STAGES = ("http_request", "db_query", "pool_wait", "pool_hold", "llm_call", "llm_queue_wait",
+          "youtube_call", "embedding_batch", "azure_upload", "graph_node")
+# Étapes qui sortent du process : aucune connexion du pool ne doit être tenue pendant ces appels (db/lease.py)
+EXTERNAL_STAGES = frozenset({"llm_call", "llm_queue_wait", "youtube_call", "embedding_batch", "azure_upload"})
+
+# Des millisecondes (DB, pool) aux dizaines de secondes (LLM, génération)
+_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+STAGE_LATENCY = Histogram(
+    "cleeroute_stage_duration_seconds",
+    "Duration of an instrumented stage",
+    ["stage", "name", "status"],
+    buckets=_BUCKETS,
+)
+LLM_TOKENS = Counter(
+    "cleeroute_llm_tokens_total",
+    "LLM tokens reported by the provider",
+    ["model", "kind"],
+)
+CACHE_EVENTS = Counter(
+    "cleeroute_cache_events_total",
+    "Cache lookups by cache and result (hit / miss)",
+    ["cache", "result"],
+)
+RETRIES = Counter(
+    "cleeroute_retries_total",
+    "Retried or rate-limited operations",
+    ["stage", "name"],
+)
+LEASE_VIOLATIONS = Counter(
+    "cleeroute_db_lease_violations_total",
+    "External calls started while the task still held a pooled DB connection",
+    ["pool", "stage"],
+)
+# Statistiques psycopg_pool (relevées périodiquement par db/pools.py) ; livesum : total sur les process uvicorn
+POOL_CONNECTIONS = Gauge(
+    "cleeroute_db_pool_connections",
+    "Connections of a pool by state (size, available, min, max)",
+    ["pool", "state"],
+    multiprocess_mode="livesum",
+)
+POOL_REQUESTS_WAITING = Gauge(
+    "cleeroute_db_pool_requests_waiting",
+    "Requests currently waiting for a connection",
+    ["pool"],
+    multiprocess_mode="livesum",
+)
+POOL_EVENTS = Counter(
+    "cleeroute_db_pool_events_total",
+    "Pool events: requests served / queued / failed, connections opened / failed / lost, bad returns",
+    ["pool", "event"],
+)
+POOL_USAGE = Counter(
+    "cleeroute_db_pool_usage_seconds_total",
+    "Total time connections were lent out by the pool",
+    ["pool"],
+)
+
+# Vérifications exécutées à l'entrée d'une étape externe (enregistrées par db/lease.py, sans import circulaire)
+_external_call_checks = []
+
+
+def register_external_call_check(check):
+    _external_call_checks.append(check)
+
+
+def observe(stage: str, name: str, seconds: float, status: str = "ok"):
+    if METRICS_ENABLED:
+        STAGE_LATENCY.labels(stage=stage, name=name or "-", status=status).observe(seconds)
+
+
+def record_cache(cache: str, hit: bool):
+    if METRICS_ENABLED:
+        CACHE_EVENTS.labels(cache=cache, result="hit" if hit else "miss").inc()
+
+
+def record_retry(stage: str, name: str = ""):
+    if METRICS_ENABLED:
+        RETRIES.labels(stage=stage, name=name or "-").inc()
+
+
+def record_lease_violation(pool: str, stage: str):
+    if METRICS_ENABLED:
+        LEASE_VIOLATIONS.labels(pool=pool or "-", stage=stage).inc()
+
+
+# Clés de pool.pop_stats() (psycopg_pool) -> label "state" / "event"
+_POOL_GAUGE_STATS = {"pool_size": "size", "pool_available": "available", "pool_min": "min", "pool_max": "max"}
+_POOL_EVENT_STATS = {
+    "requests_num": "requests",
+    "requests_queued": "requests_queued",
+    "requests_errors": "request_errors",
+    "connections_num": "connections_opened",
+    "connections_errors": "connection_errors",
+    "connections_lost": "connections_lost",
+    "returns_bad": "returns_bad",
+}
+
+
+def record_pool_stats(pool: str, stats: dict):
+    """`stats` = pool.pop_stats() : jauges instantanées + compteurs remis à zéro depuis le relevé précédent."""
+    if not METRICS_ENABLED:
+        return
+    for key, state in _POOL_GAUGE_STATS.items():
+        if key in stats:
+            POOL_CONNECTIONS.labels(pool=pool, state=state).set(stats[key])
+    POOL_REQUESTS_WAITING.labels(pool=pool).set(stats.get("requests_waiting", 0))
+    for key, event in _POOL_EVENT_STATS.items():
+        if stats.get(key):
+            POOL_EVENTS.labels(pool=pool, event=event).inc(stats[key])
+    if stats.get("usage_ms"):
+        POOL_USAGE.labels(pool=pool).inc(stats["usage_ms"] / 1000)
+
+
+def record_llm_tokens(model: str, input_tokens: Optional[int], output_tokens: Optional[int]):
+    if not METRICS_ENABLED:
+        return
+    if input_tokens:
+        LLM_TOKENS.labels(model=model, kind="input").inc(input_tokens)
+    if output_tokens:
+        LLM_TOKENS.labels(model=model, kind="output").inc(output_tokens)
+
+
+class track:
+    """
+    Mesure une étape : context manager (sync ou async) ou décorateur (fonction sync ou async).
+    Le label status vaut "error" si l'étape lève une exception.
+    Ouvre aussi un span de trace (src/cleeroute/tracing.py) lorsque le tracing est activé.
+    """
+
+    def __init__(self, stage: str, name: str = ""):
+        self.stage = stage
+        self.name = name
+        self._start: Optional[float] = None
+        self._span = None
+
+    def __enter__(self):
+        if self.stage in EXTERNAL_STAGES:
+            for check in _external_call_checks:
+                check(self.stage, self.name)
+        self._span = stage_span(self.stage, self.name)
+        self._span.__enter__()
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        observe(self.stage, self.name, time.perf_counter() - self._start, "error" if exc_type else "ok")
+        self._span.__exit__(exc_type, exc, tb)
+        return False
+
+    async def __aenter__(self):
+        return self.__enter__()
+
+    async def __aexit__(self, exc_type, exc, tb):
+        return self.__exit__(exc_type, exc, tb)
+
+    def __call__(self, func):
+        stage, name = self.stage, self.name or func.__qualname__
+
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with track(stage, name):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with track(stage, name):
+                return func(*args, **kwargs)
+        return wrapper
+
+
+def _registry() -> CollectorRegistry:
+    # uvicorn --workers N : chaque process écrit dans PROMETHEUS_MULTIPROC_DIR, on agrège ici
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return registry
+    return REGISTRY
+
+
+def start_worker_metrics_server():
+    """Appelé au démarrage d'un process worker Celery (pas de FastAPI pour exposer /metrics)."""
+    if METRICS_ENABLED and WORKER_METRICS_PORT:
+        try:
+            start_http_server(WORKER_METRICS_PORT, registry=_registry())
+            print(f"--- [METRICS] Worker metrics on :{WORKER_METRICS_PORT}/metrics ---")
+        except OSError as e:
+            # Plusieurs process sur la même machine : seul le premier obtient le port
+            print(f"--- [METRICS] Worker metrics server not started: {e} ---")
+
+
+metrics_router = APIRouter()
+
+
+@metrics_router.get("/metrics", include_in_schema=False)
+async def get_metrics():
+    """Prometheus scrape endpoint."""
+    return Response(generate_latest(_registry()), media_type=CONTENT_TYPE_LATEST)
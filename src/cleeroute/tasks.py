@@ -1,10 +1,11 @@
 import os
 import ssl
-import asyncio
 from celery import Celery
-from celery.signals import worker_process_init, worker_process_shutdown
+from celery.signals import worker_init, worker_process_init, worker_process_shutdown, worker_shutdown
 from dotenv import load_dotenv
-from src.cleeroute.db.checkpointer import db_pool
+from src.cleeroute.worker_runtime import get_runtime, shutdown_runtime
+from src.cleeroute.metrics import start_worker_metrics_server
+from src.cleeroute.tracing import setup_tracing, shutdown_tracing, instrument_celery
 
 # Charger les variables
 load_dotenv()
@@ -26,6 +27,10 @@ transport_opts = {
     'socket_keepalive': True,   
     'health_check_interval': 10,
     'visibility_timeout': 3600,
+    # Priorités émulées côté Redis (0 = plus prioritaire), utilisées par le préchauffage des transcripts
+    'priority_steps': list(range(10)),
+    'sep': ':',
+    'queue_order_strategy': 'priority',
 }
 
 # On prépare la config SSL
@@ -42,32 +47,46 @@ celery_app.conf.update(
     result_serializer='json',
     timezone='UTC',
     enable_utc=True,
-    worker_pool='solo',                 # Mode Solo pour stabilité mémoire/CPU
+    # Threads + boucle asyncio partagée (worker_runtime) : plusieurs tâches I/O-bound en parallèle par process
+    worker_pool='threads',
+    worker_concurrency=int(os.getenv("CELERY_WORKER_CONCURRENCY", 8)),
+    worker_prefetch_multiplier=1,       # Pas de réservation en avance : les priorités restent respectées
     broker_transport_options= transport_opts,
     broker_use_ssl=ssl_conf,            # Applique SSL au Broker
     redis_backend_use_ssl=ssl_conf,     # Applique SSL au Backend (résultats)
     broker_connection_retry_on_startup=True, # Recommandé pour Celery 5+
+    task_default_priority=3,            # Tâches sans priorité explicite : après les vidéos proches de l'apprenant (0-2)
 )
 
-# --- 3. Gestion du cycle de vie (DB Pool) ---  
+# Priorités explicites (0 = traité en premier) : l'apprenant attend le résultat des tâches interactives
+# (génération de syllabus) : même rang que la vidéo courante, devant le reste du préchauffage (1-9, voir prewarm_scheduler)
+TASK_PRIORITY_INTERACTIVE = 0
+
+# --- 3. Gestion du cycle de vie (Runtime asynchrone + Pools) ---
+# Métriques Prometheus du worker (process principal ; pool 'threads' => un seul process)
+@worker_init.connect
+def init_worker_metrics(**kwargs):
+    start_worker_metrics_server()
+    setup_tracing("cleeroute-worker")
+
+# Contexte de trace transmis dans les headers des messages (API -> worker, tâche -> re-planification)
+instrument_celery()
+
+# Le runtime est aussi créé paresseusement à la première tâche (pools 'solo' / 'threads').
 @worker_process_init.connect
 def init_worker(**kwargs):
-    print("--- [CELERY WORKER LIFECYCLE] Worker process starting. Opening DB pool. ---")
-    try:
-        loop = asyncio.get_event_loop()
-    except RuntimeError:
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-    loop.run_until_complete(db_pool.open())
+    print("--- [CELERY WORKER LIFECYCLE] Worker process starting. Opening async runtime. ---")
+    get_runtime()
 
 @worker_process_shutdown.connect
+@worker_shutdown.connect
 def shutdown_worker(**kwargs):
-    print("--- [CELERY WORKER LIFECYCLE] Worker process shutting down. Closing DB pool. ---")
+    print("--- [CELERY WORKER LIFECYCLE] Worker shutting down. Closing async runtime. ---")
     try:
-        loop = asyncio.get_event_loop()
-        loop.run_until_complete(db_pool.close())
+        shutdown_runtime()
     except Exception as e:
-        print(f"Error closing pool: {e}")
+        print(f"Error closing runtime: {e}")
+    shutdown_tracing()
 
 # Configuration pour trouver les tâches
 celery_app.autodiscover_tasks([
@@ -0,0 +1,185 @@
+# Fichier: src/cleeroute/tracing.py
+# Traces distribuées (OpenTelemetry) : une requête HTTP, la tâche Celery qu'elle déclenche,
+# les noeuds LangGraph et les appels DB / LLM / YouTube / Azure forment UNE seule trace.
+#
+#   - API : span serveur par requête (contexte W3C `traceparent` entrant respecté),
+#   - Celery : contexte injecté dans les headers du message, restauré par le worker,
+#   - étapes : chaque `metrics.track(...)` ouvre aussi un span (voir stage_span).
+#
+# Désactivé par défaut (TRACING_ENABLED=false) : l'API OpenTelemetry reste alors un no-op.
+import os
+import json
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+from opentelemetry import context as otel_context
+from opentelemetry import propagate, trace
+from opentelemetry.trace import SpanKind, Status, StatusCode
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+TRACING_ENABLED = os.getenv("TRACING_ENABLED", "false").lower() == "true"
+# otlp (collecteur local, OTEL_EXPORTER_OTLP_ENDPOINT) | file (JSON lines) | console
+TRACING_EXPORTER = os.getenv("TRACING_EXPORTER", "otlp").lower()
+TRACING_FILE_PATH = os.getenv("TRACING_FILE_PATH", "/tmp/cleeroute_traces.jsonl")
+# Fraction des traces conservées (1.0 = toutes)
+TRACING_SAMPLE_RATIO = float(os.getenv("TRACING_SAMPLE_RATIO", 1.0))
+
+tracer = trace.get_tracer("cleeroute")
+
+_provider = None
+_setup_lock = threading.Lock()
+
+
+class JsonLinesFileExporter:
+    """Exporteur minimal : un span JSON par ligne (lisible sans collecteur)."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def export(self, spans):
+        from opentelemetry.sdk.trace.export import SpanExportResult
+        try:
+            lines = [json.dumps(json.loads(span.to_json())) for span in spans]
+            with self._lock, open(self.path, "a", encoding="utf-8") as f:
+                f.write("\n".join(lines) + "\n")
+            return SpanExportResult.SUCCESS
+        except OSError as e:
+            logger.warning(f"Trace export to {self.path} failed: {e}")
+            return SpanExportResult.FAILURE
+
+    def shutdown(self):
+        pass
+
+    def force_flush(self, timeout_millis: int = 30000) -> bool:
+        return True
+
+
+def _build_exporter():
+    if TRACING_EXPORTER == "file":
+        return JsonLinesFileExporter(TRACING_FILE_PATH)
+    if TRACING_EXPORTER == "console":
+        from opentelemetry.sdk.trace.export import ConsoleSpanExporter
+        return ConsoleSpanExporter()
+    # Endpoint / headers lus par l'exporteur dans OTEL_EXPORTER_OTLP_* (défaut http://localhost:4318)
+    from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+    return OTLPSpanExporter()
+
+
+def setup_tracing(service_name: str):
+    """Installe le TracerProvider du process (API ou worker). Idempotent."""
+    global _provider
+    if not TRACING_ENABLED:
+        return
+    with _setup_lock:
+        if _provider is not None:
+            return
+        # Import local : le SDK n'est chargé que si le tracing est activé
+        from opentelemetry.sdk.resources import Resource
+        from opentelemetry.sdk.trace import TracerProvider
+        from opentelemetry.sdk.trace.export import BatchSpanProcessor
+        from opentelemetry.sdk.trace.sampling import ParentBased, TraceIdRatioBased
+
+        _provider = TracerProvider(
+            resource=Resource.create({"service.name": os.getenv("OTEL_SERVICE_NAME", service_name)}),
+            sampler=ParentBased(TraceIdRatioBased(TRACING_SAMPLE_RATIO)),
+        )
+        _provider.add_span_processor(BatchSpanProcessor(_build_exporter()))
+        trace.set_tracer_provider(_provider)
+        print(f"--- [TRACING] {service_name}: exporting spans via '{TRACING_EXPORTER}' ---")
+
+
+def shutdown_tracing():
+    """Vide les spans en attente (arrêt de l'API ou du worker)."""
+    if _provider is not None:
+        try:
+            _provider.shutdown()
+        except Exception as e:
+            logger.warning(f"Tracing shutdown failed: {e}")
+
+
+@contextmanager
+def stage_span(stage: str, name: str):
+    """Span d'une étape instrumentée (utilisé par metrics.track)."""
+    if not TRACING_ENABLED:
+        yield None
+        return
+    with tracer.start_as_current_span(f"{stage} {name}".strip(), attributes={"cleeroute.stage": stage, "cleeroute.name": name}) as span:
+        yield span
+
+
+# --- Propagation (headers HTTP / Celery) ---
+
+def inject_context(carrier: Dict[str, str]) -> Dict[str, str]:
+    propagate.inject(carrier)
+    return carrier
+
+
+def extract_context(carrier: Dict[str, str]):
+    return propagate.extract(carrier)
+
+
+@contextmanager
+def server_span(name: str, headers: Dict[str, str], attributes: Optional[Dict] = None):
+    """Span d'entrée (requête HTTP) rattaché au contexte de l'appelant s'il en fournit un."""
+    if not TRACING_ENABLED:
+        yield None
+        return
+    with tracer.start_as_current_span(name, context=extract_context(headers), kind=SpanKind.SERVER,
+                                      attributes=attributes or {}) as span:
+        yield span
+
+
+# --- Celery ---
+_TRACE_HEADERS = ("traceparent", "tracestate")
+# task_id -> (span, token de contexte) : prerun et postrun s'exécutent dans le même thread
+_task_spans: Dict[str, tuple] = {}
+
+
+def instrument_celery():
+    """Branche la propagation sur les signaux Celery (à appeler une fois, côté tasks.py)."""
+    from celery.signals import before_task_publish, task_prerun, task_postrun, task_failure
+
+    @before_task_publish.connect(weak=False)
+    def _inject(headers=None, **kwargs):
+        if TRACING_ENABLED and headers is not None:
+            headers.update(inject_context({}))
+
+    @task_prerun.connect(weak=False)
+    def _start(task_id=None, task=None, **kwargs):
+        if not TRACING_ENABLED or task is None:
+            return
+        request = task.request
+        carrier = {}
+        for key in _TRACE_HEADERS:
+            value = getattr(request, key, None) or (request.headers or {}).get(key)
+            if value:
+                carrier[key] = value
+        span = tracer.start_span(f"celery.task {task.name}", context=extract_context(carrier), kind=SpanKind.CONSUMER,
+                                 attributes={"celery.task_id": task_id or "", "celery.task_name": task.name})
+        token = otel_context.attach(trace.set_span_in_context(span))
+        _task_spans[task_id] = (span, token)
+
+    @task_failure.connect(weak=False)
+    def _failed(task_id=None, exception=None, **kwargs):
+        entry = _task_spans.get(task_id)
+        if entry and exception is not None:
+            entry[0].record_exception(exception)
+            entry[0].set_status(Status(StatusCode.ERROR, str(exception)))
+
+    @task_postrun.connect(weak=False)
+    def _end(task_id=None, state=None, **kwargs):
+        entry = _task_spans.pop(task_id, None)
+        if entry is None:
+            return
+        span, token = entry
+        if state:
+            span.set_attribute("celery.state", state)
+        span.end()
+        otel_context.detach(token)
@@ -0,0 +1,165 @@
+# Fichier: src/cleeroute/worker_runtime.py
+
+import os
+import asyncio
+import threading
+import logging
+import concurrent.futures
+from typing import Optional, Any, Coroutine
+import psycopg
+from psycopg_pool import AsyncConnectionPool
+from langgraph.checkpoint.postgres.aio import AsyncPostgresSaver
+from dotenv import load_dotenv
+
+from src.cleeroute.db.checkpointer import PickleSerde
+from src.cleeroute.db import app_db
+from src.cleeroute.db.pools import create_pool, open_pool, close_pool
+from src.cleeroute.db.user_cache import start_invalidation_listener
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+WORKER_DB_POOL_MAX_SIZE = int(os.getenv("WORKER_DB_POOL_MAX_SIZE", 10))
+WORKER_TASK_TIMEOUT = float(os.getenv("WORKER_TASK_TIMEOUT", 1800))
+
+
+def _conn_kwargs(db_url: str) -> dict:
+    # Même config que les anciens pools éphémères des tâches
+    kwargs = {"autocommit": True}
+    if "azure.com" in db_url or "52." in db_url:
+        kwargs["sslmode"] = "require"
+    return kwargs
+
+
+class WorkerRuntime:
+    """
+    Runtime asynchrone d'un process worker Celery :
+        - UNE boucle asyncio persistante (dans un thread dédié),
+        - les pools DB et le checkpointer LangGraph ouverts une seule fois,
+        - les tâches Celery (threads) y soumettent leurs coroutines, qui s'exécutent en concurrence.
+
+    Remplace le couple `asyncio.run(...)` + pool jetable par tâche.
+    """
+
+    def __init__(self):
+        self.pid = os.getpid()
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.thread: Optional[threading.Thread] = None
+        self.checkpoint_pool: Optional[AsyncConnectionPool] = None
+        self.app_pool: Optional[AsyncConnectionPool] = None
+        self.checkpointer: Optional[AsyncPostgresSaver] = None
+        self.user_cache_listener: Optional[asyncio.Task] = None
+
+    def start(self):
+        print(f"--- [WORKER RUNTIME] Starting persistent event loop (pid {self.pid}) ---")
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self._run_loop, name="worker-async-runtime", daemon=True)
+        self.thread.start()
+        asyncio.run_coroutine_threadsafe(self._open(), self.loop).result(timeout=120)
+
+    def _run_loop(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    async def _open(self):
+        checkpoint_url = os.getenv("DATABASE_URL")
+        # Tailles par défaut surchargeables par DB_POOL_WORKER_CHECKPOINT_* / DB_POOL_WORKER_APP_* (db/pools.py)
+        self.checkpoint_pool = create_pool(
+            "worker-checkpoint",
+            checkpoint_url,
+            min_size=1,
+            max_size=WORKER_DB_POOL_MAX_SIZE,
+            timeout=30.0,
+            kwargs=_conn_kwargs(checkpoint_url),
+        )
+        await open_pool(self.checkpoint_pool)
+
+        self.checkpointer = AsyncPostgresSaver(conn=self.checkpoint_pool, serde=PickleSerde)
+        # Setup résilient, une seule fois par process
+        try:
+            await self.checkpointer.setup()
+        except (psycopg.errors.DuplicateColumn, psycopg.errors.DuplicateTable, psycopg.errors.UniqueViolation):
+            pass
+        except Exception as e:
+            logger.warning(f"Note setup DB: {e}")
+
+        app_url = os.getenv("APP_DATABASE_URL")
+        if app_url:
+            self.app_pool = create_pool(
+                "worker-app",
+                app_url,
+                min_size=1,
+                max_size=WORKER_DB_POOL_MAX_SIZE,
+                timeout=30.0,
+                kwargs=_conn_kwargs(app_url),
+            )
+            await open_pool(self.app_pool)
+            # Les services partagés (ex: statut premium) passent par get_active_pool() / get_app_pool() :
+            # ce pool sert de pool applicatif unique du worker
+            app_db.app_db_pool = self.app_pool
+            # Invalidations du cache profil / premium (db/user_cache.py) émises par l'API ou les autres workers
+            self.user_cache_listener = start_invalidation_listener(_conn_kwargs(app_url))
+
+        print("--- [WORKER RUNTIME] Pools and checkpointer ready ---")
+
+    def run(self, coro: Coroutine, timeout: Optional[float] = WORKER_TASK_TIMEOUT) -> Any:
+        """Exécute une coroutine sur la boucle partagée et bloque le thread Celery appelant jusqu'au résultat."""
+        future = asyncio.run_coroutine_threadsafe(coro, self.loop)
+        try:
+            return future.result(timeout=timeout)
+        except concurrent.futures.TimeoutError:
+            # On n'abandonne pas une coroutine orpheline sur la boucle partagée
+            future.cancel()
+            raise
+
+    async def _close(self):
+        if self.user_cache_listener:
+            self.user_cache_listener.cancel()
+        if app_db.app_db_pool is self.app_pool:
+            app_db.app_db_pool = None
+        for pool in (self.app_pool, self.checkpoint_pool):
+            await close_pool(pool)
+
+    def stop(self):
+        if self.loop is None or not self.loop.is_running():
+            return
+        print("--- [WORKER RUNTIME] Closing pools and stopping event loop ---")
+        try:
+            asyncio.run_coroutine_threadsafe(self._close(), self.loop).result(timeout=30)
+        except Exception as e:
+            print(f"Error closing worker pools: {e}")
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join(timeout=10)
+
+
+_runtime: Optional[WorkerRuntime] = None
+_runtime_lock = threading.Lock()
+
+
+def get_runtime() -> WorkerRuntime:
+    """
+    Retourne le runtime du process courant (créé au premier appel).
+    Le contrôle du pid couvre le pool 'prefork' : un enfant forké ne réutilise pas la boucle du parent.
+    """
+    global _runtime
+    if _runtime is not None and _runtime.pid == os.getpid():
+        return _runtime
+    with _runtime_lock:
+        if _runtime is None or _runtime.pid != os.getpid():
+            runtime = WorkerRuntime()
+            runtime.start()
+            _runtime = runtime
+    return _runtime
+
+
+def run_in_worker(coro: Coroutine, timeout: Optional[float] = WORKER_TASK_TIMEOUT) -> Any:
+    """Raccourci utilisé par les tâches Celery."""
+    return get_runtime().run(coro, timeout=timeout)
+
+
+def shutdown_runtime():
+    global _runtime
+    if _runtime is not None and _runtime.pid == os.getpid():
+        _runtime.stop()
+        _runtime = None